@@ -1,30 +1,69 @@
 from airflow import DAG
-from airflow.operators.python import PythonOperator
+from airflow.operators.python import PythonOperator, ShortCircuitOperator
 from airflow.providers.snowflake.operators.snowflake import SnowflakeOperator
 from airflow.operators.bash import BashOperator
-from datetime import datetime
+from datetime import date, datetime
 
 # Import your existing class logic (make sure your script is in a shared folder)
-from scripts.ingest_stock_data import StockExtractor
+from scripts.data_quality import DataQualityEngine, DataQualityError
+from scripts.ingest_last7days_stock_data import StockExtractor
+from scripts.ingestion_state import IngestionWatermarks
+from scripts.spool import new_run_id
+from scripts.trading_calendar import TradingCalendar
+
+
+def is_trading_day(data_interval_end: datetime, **_) -> bool:
+    # Weekends and NYSE holidays never produce a new bar, so skip the whole run
+    # (ingestion, COPY INTO and dbt) instead of burning API quota on no-op calls
+    return TradingCalendar().is_trading_day(data_interval_end.date())
 
 
 def run_ingestion():
     # We move your "MAIN EXECUTION FLOW" logic here
     # Access your credentials via Airflow Variables or Environment variables
     extractor = StockExtractor(...)
+    s3_bucket = "your-bucket"
+
+    trading_calendar = TradingCalendar()
+    expected_latest = trading_calendar.expected_latest_session()
+    expected_window = [
+        d.astype(date) for d in trading_calendar.last_n_sessions(7, expected_latest)
+    ]
+    watermarks = IngestionWatermarks(extractor.s3_client, s3_bucket)
+
+    quality_engine = DataQualityEngine()
+    run_id = new_run_id()
+
     tickers = ["AAPL", "MSFT", "GOOGL", "TSLA"]
+    failed_tickers = []
     for ticker in tickers:
-        raw_json = extractor.fetch_past_7_days_daily_data(symbol=ticker)
-        validated = extractor.validate_and_process_7_days(ticker, raw_json)
-        extractor.upload_7_days_to_s3(validated, s3_bucket="your-bucket")
+        # watermark skip, fetch, quarantine, data quality, upload, watermark
+        report = extractor.ingest_ticker(
+            ticker,
+            s3_bucket,
+            run_id=run_id,
+            expected_dates=expected_window,
+            quality_engine=quality_engine,
+            watermarks=watermarks,
+        )
+        if report is not None and report.has_errors:
+            failed_tickers.append(ticker)
+    if failed_tickers:
+        raise DataQualityError(f"Tickers failed data quality checks: {failed_tickers}")
 
 
 with DAG(
     "stock_market_pipeline",
     start_date=datetime(2026, 1, 1),
-    schedule_interval="@daily",
+    # weekdays at 21:30 UTC (after the 4 p.m. ET close), holidays are skipped below
+    schedule_interval="30 21 * * 1-5",
     catchup=False,
 ) as dag:
+    # Task 0: Skip non-trading days (NYSE trading calendar)
+    trading_day_check = ShortCircuitOperator(
+        task_id="is_trading_day", python_callable=is_trading_day
+    )
+
     # Task 1: Python Ingestion (API -> S3)
     ingest_task = PythonOperator(
         task_id="ingest_api_to_s3", python_callable=run_ingestion
@@ -51,4 +90,4 @@ with DAG(
     )
 
     # Define Dependencies
-    ingest_task >> load_snowflake_task >> dbt_task
+    trading_day_check >> ingest_task >> load_snowflake_task >> dbt_task
@@ -0,0 +1,66 @@
+{{
+    config(
+        materialized='incremental',
+        incremental_strategy='microbatch',
+        event_time='trade_date',
+        begin='2026-01-01',
+        batch_size='month',
+        lookback=1
+    )
+}}
+
+/*
+    Tables -
+*/
+
+WITH daily_returns AS (
+    -- filtered to the batch automatically (event_time = trade_date upstream)
+    SELECT *
+    FROM {{ ref('int_stock_daily_returns') }}
+),
+
+company_details AS (
+    -- small seed-backed dimension without event_time, always read in full
+    SELECT *
+    FROM {{ ref('stg_f50_company_details') }}
+),
+
+/*
+    Formatted
+*/
+
+joined AS (
+
+    SELECT
+        -- PK
+        daily_returns._surrogate_key,
+
+        -- Details
+        daily_returns.stock_ticker,
+        company_details.company_name,
+        company_details.company_industry,
+        company_details.current_f50_rank,
+
+        -- Measures
+        daily_returns.open_price,
+        daily_returns.high_price,
+        daily_returns.low_price,
+        daily_returns.close_price,
+        daily_returns.volume, -- noqa: RF04
+        daily_returns.previous_close_price,
+        daily_returns.daily_return,
+        daily_returns.daily_log_return,
+        daily_returns.intraday_range_pct,
+        daily_returns.close_price * daily_returns.volume AS traded_value,
+
+        -- Metadata
+        daily_returns.trade_date,
+        daily_returns.ingested_at
+    FROM
+        daily_returns
+    LEFT JOIN company_details
+        ON daily_returns.stock_ticker = company_details.stock_ticker
+
+)
+
+SELECT * FROM joined
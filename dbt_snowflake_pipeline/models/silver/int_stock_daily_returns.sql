@@ -0,0 +1,98 @@
+{{
+    config(
+        materialized='incremental',
+        incremental_strategy='microbatch',
+        event_time='trade_date',
+        begin='2026-01-01',
+        batch_size='month',
+        lookback=1
+    )
+}}
+
+/*
+    Tables -
+*/
+
+{% if model.batch %}
+    {% set batch_start = model.batch.event_time_start.strftime("%Y-%m-%d") %}
+    {% set batch_end = model.batch.event_time_end.strftime("%Y-%m-%d") %}
+{% endif %}
+
+WITH source AS (
+    -- .render() opts out of the automatic microbatch filter: the first trading day of
+    -- a batch needs the previous close, so read the batch plus each ticker's last row
+    -- before it, however long the gap, and a batch matches a full refresh
+    SELECT *
+    FROM {{ ref('stg_stock_prices').render() }}
+    {% if model.batch %}
+        WHERE
+            trade_date >= '{{ batch_start }}'::DATE
+            AND trade_date < '{{ batch_end }}'::DATE
+
+        UNION ALL
+
+        SELECT *
+        FROM {{ ref('stg_stock_prices').render() }}
+        WHERE trade_date < '{{ batch_start }}'::DATE
+        QUALIFY
+            ROW_NUMBER() OVER (
+                PARTITION BY stock_ticker
+                ORDER BY trade_date DESC
+            ) = 1
+    {% endif %}
+),
+
+/*
+    Previous close per ticker
+*/
+
+with_previous AS (
+
+    SELECT
+        *,
+        LAG(close_price) OVER (
+            PARTITION BY stock_ticker
+            ORDER BY trade_date
+        ) AS previous_close_price
+    FROM
+        source
+
+),
+
+/*
+    Formatted
+*/
+
+returns AS (
+
+    SELECT
+        -- PK
+        _surrogate_key,
+
+        -- Details
+        stock_ticker,
+
+        -- Measures
+        open_price,
+        high_price,
+        low_price,
+        close_price,
+        volume, -- noqa: RF04
+        previous_close_price,
+        close_price / NULLIF(previous_close_price, 0) - 1 AS daily_return,
+        LN(close_price / NULLIF(previous_close_price, 0)) AS daily_log_return,
+        (high_price - low_price) / NULLIF(open_price, 0) AS intraday_range_pct,
+
+        -- Metadata
+        trade_date,
+        ingested_at
+    FROM
+        with_previous
+
+)
+
+SELECT * FROM returns
+{% if model.batch %}
+    -- drop the lead-in rows, they belong to earlier batches
+    WHERE trade_date >= '{{ batch_start }}'::DATE
+{% endif %}
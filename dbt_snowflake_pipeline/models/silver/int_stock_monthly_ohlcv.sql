@@ -0,0 +1,58 @@
+{{
+    config(
+        materialized='incremental',
+        incremental_strategy='microbatch',
+        event_time='month_start_date',
+        begin='2026-01-01',
+        batch_size='month',
+        lookback=1
+    )
+}}
+
+/*
+    Tables -
+*/
+
+WITH source AS (
+    -- months line up with the batches, so the automatic microbatch filter on
+    -- trade_date reads exactly one month of stg_stock_prices per batch
+    SELECT *
+    FROM {{ ref('stg_stock_prices') }}
+),
+
+/*
+    Formatted
+*/
+
+monthly AS (
+
+    SELECT
+        -- PK
+        {{ dbt_utils.generate_surrogate_key(['stock_ticker', 'DATE_TRUNC(\'MONTH\', trade_date)']) }}
+            AS _surrogate_key,
+
+        -- Details
+        stock_ticker,
+
+        -- Measures
+        MIN_BY(open_price, trade_date) AS open_price,
+        MAX(high_price) AS high_price,
+        MIN(low_price) AS low_price,
+        MAX_BY(close_price, trade_date) AS close_price,
+        SUM(volume) AS total_volume,
+        AVG(volume) AS average_daily_volume,
+        COUNT(*) AS trading_days,
+
+        -- Metadata
+        CAST(DATE_TRUNC('MONTH', trade_date) AS DATE) AS month_start_date,
+        MAX(trade_date) AS last_trade_date,
+        MAX(ingested_at) AS ingested_at
+    FROM
+        source
+    GROUP BY
+        stock_ticker,
+        DATE_TRUNC('MONTH', trade_date)
+
+)
+
+SELECT * FROM monthly
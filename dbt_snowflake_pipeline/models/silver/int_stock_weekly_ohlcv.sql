@@ -0,0 +1,68 @@
+{{
+    config(
+        materialized='incremental',
+        incremental_strategy='microbatch',
+        event_time='week_start_date',
+        begin='2026-01-01',
+        batch_size='month',
+        lookback=1
+    )
+}}
+
+/*
+    Tables -
+*/
+
+WITH source AS (
+    -- A batch owns the weeks that start inside it, and those weeks can end in the
+    -- next month, so opt out of the automatic filter and widen the range by a week
+    SELECT *
+    FROM {{ ref('stg_stock_prices').render() }}
+    {% if model.batch %}
+        WHERE
+            trade_date >= '{{ model.batch.event_time_start.strftime("%Y-%m-%d") }}'::DATE
+            AND trade_date < DATEADD(
+                DAY, 7, '{{ model.batch.event_time_end.strftime("%Y-%m-%d") }}'::DATE
+            )
+            AND DATE_TRUNC('WEEK', trade_date)
+            >= '{{ model.batch.event_time_start.strftime("%Y-%m-%d") }}'::DATE
+            AND DATE_TRUNC('WEEK', trade_date)
+            < '{{ model.batch.event_time_end.strftime("%Y-%m-%d") }}'::DATE
+    {% endif %}
+),
+
+/*
+    Formatted
+*/
+
+weekly AS (
+
+    SELECT
+        -- PK
+        {{ dbt_utils.generate_surrogate_key(['stock_ticker', 'DATE_TRUNC(\'WEEK\', trade_date)']) }}
+            AS _surrogate_key,
+
+        -- Details
+        stock_ticker,
+
+        -- Measures
+        MIN_BY(open_price, trade_date) AS open_price,
+        MAX(high_price) AS high_price,
+        MIN(low_price) AS low_price,
+        MAX_BY(close_price, trade_date) AS close_price,
+        SUM(volume) AS total_volume,
+        COUNT(*) AS trading_days,
+
+        -- Metadata
+        CAST(DATE_TRUNC('WEEK', trade_date) AS DATE) AS week_start_date,
+        MAX(trade_date) AS last_trade_date,
+        MAX(ingested_at) AS ingested_at
+    FROM
+        source
+    GROUP BY
+        stock_ticker,
+        DATE_TRUNC('WEEK', trade_date)
+
+)
+
+SELECT * FROM weekly
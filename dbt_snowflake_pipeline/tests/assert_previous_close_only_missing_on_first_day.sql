@@ -0,0 +1,15 @@
+-- A return is only missing its previous close on the ticker's first trading day,
+-- however long the gap before the microbatch the row was built in
+SELECT
+    r.stock_ticker,
+    r.trade_date
+FROM {{ ref('int_stock_daily_returns') }} AS r
+WHERE
+    r.previous_close_price IS NULL
+    AND EXISTS (
+        SELECT 1
+        FROM {{ ref('stg_stock_prices') }} AS p
+        WHERE
+            p.stock_ticker = r.stock_ticker
+            AND p.trade_date < r.trade_date
+    )
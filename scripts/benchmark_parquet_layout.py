@@ -0,0 +1,147 @@
+import argparse
+import io
+from datetime import date
+from typing import Dict, List
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from scripts.parquet_layout import ParquetLayout, encode_parquet
+
+
+class CountingReader(io.RawIOBase):
+    """In-memory file that counts the bytes a Parquet reader actually fetches."""
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self.position = 0
+        self.bytes_read = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            self.position = offset
+        elif whence == io.SEEK_CUR:
+            self.position += offset
+        else:
+            self.position = len(self.data) + offset
+        return self.position
+
+    def tell(self) -> int:
+        return self.position
+
+    def readinto(self, buffer) -> int:
+        chunk = self.data[self.position : self.position + len(buffer)]
+        buffer[: len(chunk)] = chunk
+        self.position += len(chunk)
+        self.bytes_read += len(chunk)
+        return len(chunk)
+
+
+def make_dataset(
+    num_symbols: int = 50,
+    start: str = "2006-01-01",
+    end: str = "2025-12-31",
+    seed: int = 0,
+) -> pa.Table:
+    """
+    Daily bars (random walks) for num_symbols tickers, in the order the pipeline
+    receives them: ticker by ticker, newest date first.
+    """
+    rng = np.random.default_rng(seed)
+    days = np.arange(
+        np.datetime64(start),
+        np.datetime64(end) + np.timedelta64(1, "D"),
+        dtype="datetime64[D]",
+    )
+    days = days[np.is_busday(days)][::-1]
+    symbols = [f"T{i:03d}" for i in range(num_symbols)]
+
+    n = len(days)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, (num_symbols, n)), axis=1))
+    spread = close * rng.uniform(0.005, 0.03, (num_symbols, n))
+    return pa.table(
+        {
+            "symbol": np.repeat(symbols, n),
+            "date": pa.array(np.tile(days, num_symbols)),
+            "open_price": (
+                close + spread * rng.uniform(-0.5, 0.5, close.shape)
+            ).ravel(),
+            "high_price": (close + spread).ravel(),
+            "low_price": (close - spread).ravel(),
+            "close_price": close.ravel(),
+            "volume": rng.integers(10**5, 10**8, num_symbols * n),
+        }
+    )
+
+
+def bytes_read(parquet_file: bytes, filters: List[tuple]) -> tuple[int, int]:
+    """Bytes fetched and rows returned by a filtered pyarrow read of the file."""
+    reader = CountingReader(parquet_file)
+    result = pq.read_table(pa.PythonFile(reader, mode="r"), filters=filters)
+    return reader.bytes_read, result.num_rows
+
+
+def run_benchmark(
+    table: pa.Table, layout: ParquetLayout | None = None
+) -> Dict[str, Dict[str, int]]:
+    """
+    Compares the previous writer (pq.write_table defaults: unsorted, one row group,
+    no page index) with encode_parquet on a point-date and a single-symbol query.
+    """
+    baseline = io.BytesIO()
+    pq.write_table(table, baseline)
+    # a single file, so both layouts are compared on the same amount of data
+    layout = (layout or ParquetLayout()).model_copy(update={"target_file_bytes": 2**62})
+    layouts = {
+        "baseline": baseline.getvalue(),
+        "optimized": encode_parquet(table, layout)[0],
+    }
+
+    dates = table["date"].to_numpy()
+    point_date = dates[len(dates) // 3].astype(date)
+    symbol = table["symbol"][table.num_rows // 2].as_py()
+    queries = {
+        f"date = {point_date}": [("date", "=", point_date)],
+        f"symbol = {symbol}": [("symbol", "=", symbol)],
+    }
+
+    results = {}
+    for name, parquet_file in layouts.items():
+        results[name] = {"file_bytes": len(parquet_file)}
+        for query, filters in queries.items():
+            results[name][query], results[name][f"{query} rows"] = bytes_read(
+                parquet_file, filters
+            )
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Bytes read by selective queries, previous vs optimized layout."
+    )
+    parser.add_argument("--symbols", type=int, default=50)
+    parser.add_argument("--start", default="2006-01-01")
+    parser.add_argument("--end", default="2025-12-31")
+    parser.add_argument(
+        "--row-group-size", type=int, default=ParquetLayout().row_group_size
+    )
+    args = parser.parse_args()
+
+    table = make_dataset(args.symbols, args.start, args.end)
+    results = run_benchmark(table, ParquetLayout(row_group_size=args.row_group_size))
+
+    print(f"{table.num_rows} rows, {args.symbols} symbols, {args.start} to {args.end}")
+    metrics = [m for m in results["baseline"] if not m.endswith(" rows")]
+    print(f"{'':24}{'baseline':>14}{'optimized':>14}{'ratio':>9}")
+    for metric in metrics:
+        before = results["baseline"][metric]
+        after = results["optimized"][metric]
+        label = metric if metric == "file_bytes" else f"read {metric}"
+        print(f"{label:24}{before:>14,}{after:>14,}{before / after:>8.1f}x")
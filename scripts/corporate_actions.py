@@ -0,0 +1,393 @@
+import argparse
+import io
+import logging
+import os
+import time
+from datetime import date
+from typing import List, Tuple
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from botocore.exceptions import ClientError
+
+from scripts.parquet_layout import ParquetLayout, encode_parquet
+from scripts.providers import TIME_SERIES_KEY
+
+logger = logging.getLogger(__name__)
+
+# Compact per-symbol list of splits and dividends (a few rows per year), kept
+# outside of raw/ so the price COPY INTO never loads it
+ACTIONS_PREFIX = "corporate_actions"
+# Split/dividend adjusted prices, one partition per symbol and year
+ADJUSTED_PREFIX = "adjusted/stocks"
+
+PRICE_COLUMNS = ["open_price", "high_price", "low_price", "close_price"]
+RAW_COLUMNS = ["symbol", "date", *PRICE_COLUMNS, "volume"]
+
+ACTIONS_SCHEMA = pa.schema(
+    [
+        ("symbol", pa.string()),
+        ("ex_date", pa.date32()),
+        ("split_coefficient", pa.float64()),
+        ("dividend_amount", pa.float64()),
+        # raw close of the session before the ex-date, needed for the dividend factor
+        ("prev_close", pa.float64()),
+    ]
+)
+
+# TIME_SERIES_DAILY_ADJUSTED fields (volume moves to "6." on this endpoint)
+ADJUSTED_FIELDS = {
+    "open_price": "1. open",
+    "high_price": "2. high",
+    "low_price": "3. low",
+    "close_price": "4. close",
+    "volume": "6. volume",
+    "dividend_amount": "7. dividend amount",
+    "split_coefficient": "8. split coefficient",
+}
+
+
+def parse_adjusted_payload(symbol: str, payload: dict) -> Tuple[pa.Table, pa.Table]:
+    """
+    Splits a TIME_SERIES_DAILY_ADJUSTED response into raw bars and corporate actions.
+
+    Returns:
+        Tuple[pa.Table, pa.Table]: Raw bars with the DailyStockData columns (rows
+            with a non-positive price are dropped, same contract as DailyStockData),
+            and the sessions with a split or a dividend in ACTIONS_SCHEMA.
+    """
+    time_series = payload.get(TIME_SERIES_KEY, {})
+    day_keys = sorted(time_series)
+    rows = [time_series[d] for d in day_keys]
+    dates = np.array(day_keys, dtype="datetime64[D]")
+
+    def column(field: str, default: str) -> np.ndarray:
+        alias = ADJUSTED_FIELDS[field]
+        return np.array([row.get(alias, default) for row in rows], dtype=np.float64)
+
+    prices = {field: column(field, "nan") for field in PRICE_COLUMNS}
+    volume = column("volume", "0")
+    split = column("split_coefficient", "1")
+    dividend = column("dividend_amount", "0")
+
+    # the session before each ex-date is the previous row of the sorted series
+    prev_close = np.full(len(dates), np.nan)
+    prev_close[1:] = prices["close_price"][:-1]
+
+    is_action = (split != 1.0) | (dividend != 0.0)
+    actions = pa.table(
+        {
+            "symbol": pa.array([symbol] * int(is_action.sum()), pa.string()),
+            "ex_date": pa.array(dates[is_action]),
+            "split_coefficient": split[is_action],
+            "dividend_amount": dividend[is_action],
+            "prev_close": pa.array(prev_close[is_action], from_pandas=True),
+        },
+        schema=ACTIONS_SCHEMA,
+    )
+
+    valid = np.logical_and.reduce([prices[f] > 0 for f in PRICE_COLUMNS])
+    if not valid.all():
+        logger.warning(
+            f"⚠️ Dropped {int((~valid).sum())} adjusted-endpoint bar(s) of {symbol} "
+            f"with a non-positive price"
+        )
+    bars = pa.table(
+        {
+            "symbol": pa.array([symbol] * int(valid.sum()), pa.string()),
+            "date": pa.array(dates[valid]),
+            **{field: prices[field][valid] for field in PRICE_COLUMNS},
+            "volume": volume[valid].astype(np.int64),
+        }
+    )
+    return bars, actions
+
+
+def action_price_factors(actions: pa.Table) -> np.ndarray:
+    """
+    Price factor of each action (row order kept): 1 / split coefficient, scaled by
+    (1 - dividend / previous close) when the previous close is known.
+    """
+    split = actions["split_coefficient"].to_numpy()
+    dividend = actions["dividend_amount"].to_numpy()
+    prev_close = actions["prev_close"].to_numpy(zero_copy_only=False).astype(float)
+
+    # the dividend is paid on post-split shares when both fall on the same day
+    prev_close = prev_close / split
+    with np.errstate(divide="ignore", invalid="ignore"):
+        dividend_factor = np.where(
+            np.isfinite(prev_close) & (prev_close > 0), 1.0 - dividend / prev_close, 1.0
+        )
+    return dividend_factor / split
+
+
+def adjustment_factors(
+    dates: np.ndarray, actions: pa.Table
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Cumulative backward adjustment factors for every row date.
+
+    An action with ex-date e applies to every row before e: prices are multiplied
+    by its action_price_factors entry, volume is multiplied by the split
+    coefficient. A row's factor is the product over every later action, i.e. a
+    reversed cumulative product looked up with searchsorted.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: (price factor, volume factor) per row.
+    """
+    if actions.num_rows == 0:
+        return np.ones(len(dates)), np.ones(len(dates))
+
+    actions = actions.sort_by("ex_date")
+    ex_dates = actions["ex_date"].to_numpy().astype("datetime64[D]")
+    split = actions["split_coefficient"].to_numpy()
+    price_factor = action_price_factors(actions)
+
+    # suffix[i] = product of the factors of actions i..n-1, suffix[n] = 1
+    price_suffix = np.append(np.cumprod(price_factor[::-1])[::-1], 1.0)
+    volume_suffix = np.append(np.cumprod(split[::-1])[::-1], 1.0)
+    # first action strictly after the row date
+    index = np.searchsorted(ex_dates, dates.astype("datetime64[D]"), side="right")
+    return price_suffix[index], volume_suffix[index]
+
+
+def adjust_prices(bars: pa.Table, actions: pa.Table) -> pa.Table:
+    """Raw bars plus adjusted_* columns and the price adjustment_factor."""
+    bars = bars.select(RAW_COLUMNS).sort_by("date")
+    dates = bars["date"].to_numpy().astype("datetime64[D]")
+    price_factor, volume_factor = adjustment_factors(dates, actions)
+
+    for field in PRICE_COLUMNS:
+        bars = bars.append_column(
+            f"adjusted_{field}", pa.array(bars[field].to_numpy() * price_factor)
+        )
+    adjusted_volume = np.rint(bars["volume"].to_numpy() * volume_factor)
+    bars = bars.append_column(
+        "adjusted_volume", pa.array(adjusted_volume.astype(np.int64))
+    )
+    return bars.append_column("adjustment_factor", pa.array(price_factor))
+
+
+class CorporateActionStore:
+    """The actions dataset: corporate_actions/{symbol}/actions.parquet."""
+
+    def __init__(self, s3_client, s3_bucket: str):
+        self.s3_client = s3_client
+        self.s3_bucket = s3_bucket
+
+    def _key(self, symbol: str) -> str:
+        return f"{ACTIONS_PREFIX}/{symbol}/actions.parquet"
+
+    def load(self, symbol: str) -> pa.Table:
+        try:
+            response = self.s3_client.get_object(
+                Bucket=self.s3_bucket, Key=self._key(symbol)
+            )
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("NoSuchKey", "404"):
+                return ACTIONS_SCHEMA.empty_table()
+            raise
+        return pq.read_table(io.BytesIO(response["Body"].read())).cast(ACTIONS_SCHEMA)
+
+    def merge(self, symbol: str, incoming: pa.Table) -> Tuple[pa.Table, pa.Table]:
+        """
+        Merges newly fetched actions into the stored ones.
+
+        Actions are matched on (ex_date, split_coefficient, dividend_amount). The
+        prev_close of an action is missing when its ex-date is the oldest session
+        of the fetched window, so a missing prev_close never replaces a stored one
+        (the stored value is carried over instead), and an action only counts as
+        changed when its split or dividend differ or a missing prev_close is filled.
+
+        Returns:
+            Tuple[pa.Table, pa.Table]: Every action of the symbol, and the actions
+                that are new or changed (empty when nothing has to be re-adjusted).
+        """
+        existing = self.load(symbol)
+        stored = {row["ex_date"]: row for row in existing.to_pylist()}
+
+        changed_rows = []
+        for row in incoming.cast(ACTIONS_SCHEMA).to_pylist():
+            known = stored.get(row["ex_date"])
+            if known is None:
+                changed_rows.append(row)
+                continue
+            if row["prev_close"] is None:
+                row["prev_close"] = known["prev_close"]
+            same_action = (row["split_coefficient"], row["dividend_amount"]) == (
+                known["split_coefficient"],
+                known["dividend_amount"],
+            )
+            if not same_action or row["prev_close"] != known["prev_close"]:
+                changed_rows.append(row)
+        changed = pa.Table.from_pylist(changed_rows, schema=ACTIONS_SCHEMA)
+        if changed.num_rows == 0:
+            return existing, changed
+
+        kept = existing.filter(
+            pc.invert(pc.is_in(existing["ex_date"], value_set=changed["ex_date"]))
+        )
+        merged = pa.concat_tables([kept, changed]).sort_by("ex_date")
+        parquet_buffer = io.BytesIO()
+        pq.write_table(merged, parquet_buffer)
+        self.s3_client.put_object(
+            Bucket=self.s3_bucket,
+            Key=self._key(symbol),
+            Body=parquet_buffer.getvalue(),
+        )
+        logger.info(f"🧾 {symbol}: {changed.num_rows} new corporate action(s)")
+        return merged, changed
+
+
+class AdjustedPriceStore:
+    """
+    The adjusted dataset: adjusted/stocks/{symbol}/{year}.parquet.
+
+    Partitions keep the raw columns next to the adjusted ones, so a new action is
+    applied by re-reading only the affected partitions of that one symbol (the
+    years up to the ex-date), never by re-pulling or rescanning the history.
+    """
+
+    def __init__(self, s3_client, s3_bucket: str, layout: ParquetLayout | None = None):
+        self.s3_client = s3_client
+        self.s3_bucket = s3_bucket
+        self.layout = layout or ParquetLayout()
+
+    def _key(self, symbol: str, year: int) -> str:
+        return f"{ADJUSTED_PREFIX}/{symbol}/{year}.parquet"
+
+    def years(self, symbol: str) -> List[int]:
+        paginator = self.s3_client.get_paginator("list_objects_v2")
+        years = []
+        for page in paginator.paginate(
+            Bucket=self.s3_bucket, Prefix=f"{ADJUSTED_PREFIX}/{symbol}/"
+        ):
+            for obj in page.get("Contents", []):
+                years.append(
+                    int(obj["Key"].rsplit("/", 1)[-1].removesuffix(".parquet"))
+                )
+        return sorted(years)
+
+    def read(self, symbol: str, year: int) -> pa.Table:
+        response = self.s3_client.get_object(
+            Bucket=self.s3_bucket, Key=self._key(symbol, year)
+        )
+        return pq.read_table(io.BytesIO(response["Body"].read()))
+
+    def _write(self, symbol: str, year: int, table: pa.Table) -> None:
+        # one small file per symbol-year, never split
+        layout = self.layout.model_copy(update={"target_file_bytes": 2**62})
+        self.s3_client.put_object(
+            Bucket=self.s3_bucket,
+            Key=self._key(symbol, year),
+            Body=encode_parquet(table, layout)[0],
+        )
+
+    def upsert(self, symbol: str, bars: pa.Table, actions: pa.Table) -> List[int]:
+        """Merges raw bars into their year partitions (new bars win per date)."""
+        bar_years = bars["date"].to_numpy().astype("datetime64[Y]").astype(int) + 1970
+        stored_years = set(self.years(symbol))
+
+        written = []
+        for year in np.unique(bar_years):
+            year = int(year)
+            incoming = bars.filter(pa.array(bar_years == year)).select(RAW_COLUMNS)
+            if year in stored_years:
+                stored = self.read(symbol, year).select(RAW_COLUMNS)
+                combined = pa.concat_tables([incoming, stored.cast(incoming.schema)])
+                # np.unique keeps the first occurrence, i.e. the incoming bar
+                _, first = np.unique(
+                    combined["date"].to_numpy().astype("datetime64[D]"),
+                    return_index=True,
+                )
+                incoming = combined.take(pa.array(first))
+            self._write(symbol, year, adjust_prices(incoming, actions))
+            written.append(year)
+        return written
+
+    def readjust(
+        self,
+        symbol: str,
+        actions: pa.Table,
+        since: date,
+        skip_years: List[int] | None = None,
+    ) -> List[int]:
+        """
+        Recomputes the partitions touched by actions with an ex-date of `since` or
+        later, i.e. every stored year up to since.year. Later years keep their files.
+        """
+        rewritten = []
+        for year in self.years(symbol):
+            if year > since.year or year in (skip_years or []):
+                continue
+            bars = self.read(symbol, year).select(RAW_COLUMNS)
+            self._write(symbol, year, adjust_prices(bars, actions))
+            rewritten.append(year)
+        return rewritten
+
+
+def update_symbol(
+    symbol: str,
+    payload: dict,
+    action_store: CorporateActionStore,
+    price_store: AdjustedPriceStore,
+) -> dict:
+    """
+    Ingests one TIME_SERIES_DAILY_ADJUSTED response: stores new corporate actions,
+    upserts the bars, and re-adjusts the older partitions of this symbol only when
+    a new action arrived.
+
+    Returns:
+        dict: new_actions count, and the years upserted / re-adjusted.
+    """
+    bars, fetched_actions = parse_adjusted_payload(symbol, payload)
+    actions, new_actions = action_store.merge(symbol, fetched_actions)
+
+    upserted = price_store.upsert(symbol, bars, actions) if bars.num_rows else []
+    readjusted = []
+    if new_actions.num_rows:
+        since = pc.min(new_actions["ex_date"]).as_py()
+        readjusted = price_store.readjust(symbol, actions, since, skip_years=upserted)
+        logger.info(
+            f"🔧 {symbol}: re-adjusted {readjusted or 'no older'} partition(s) "
+            f"for actions since {since}"
+        )
+    return {
+        "new_actions": new_actions.num_rows,
+        "upserted_years": upserted,
+        "readjusted_years": readjusted,
+    }
+
+
+# --- MAIN EXECUTION FLOW ---
+if __name__ == "__main__":
+    from scripts.ingest_last7days_stock_data import StockExtractor
+
+    parser = argparse.ArgumentParser(
+        description="Ingest splits/dividends and maintain the adjusted price dataset."
+    )
+    parser.add_argument("symbols", nargs="*", default=["AAPL", "MSFT", "GOOGL", "TSLA"])
+    args = parser.parse_args()
+
+    S3_BUCKET_DESTINATION = os.getenv("STOCK_DATA_AWS_S3_BUCKET_NAME")
+    extractor = StockExtractor(
+        api_key=os.getenv("ALPHA_VANTAGE_API_KEY"),
+        aws_access_key=os.getenv("STOCK_DATA_AWS_S3_ACCESS_KEY_ID"),
+        aws_secret_key=os.getenv("STOCK_DATA_AWS_S3_SECRET_ACCESS_KEY"),
+        region=os.getenv("AWS_REGION", "us-east-1"),
+    )
+    action_store = CorporateActionStore(extractor.s3_client, S3_BUCKET_DESTINATION)
+    price_store = AdjustedPriceStore(
+        extractor.s3_client, S3_BUCKET_DESTINATION, extractor.parquet_layout
+    )
+
+    for symbol in args.symbols:
+        if symbol != args.symbols[0]:
+            # pause between tickers to prevent throttle and API pull failure
+            time.sleep(15)
+        payload = extractor.fetch_corporate_actions(symbol)
+        summary = update_symbol(symbol, payload, action_store, price_store)
+        logger.info(f"✅ {symbol}: {summary}")
+        print(f"✅ {symbol}: {summary}")  # for development
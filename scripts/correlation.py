@@ -0,0 +1,550 @@
+import argparse
+import logging
+import os
+import time
+from datetime import date
+from pathlib import Path
+from typing import Dict, List, Set, Tuple
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from scripts.corporate_actions import ACTIONS_SCHEMA, action_price_factors
+
+logger = logging.getLogger(__name__)
+
+# Persisted engine state, override with STOCK_DATA_CORRELATION_STATE
+DEFAULT_STATE_PATH = Path(
+    os.getenv(
+        "STOCK_DATA_CORRELATION_STATE",
+        Path.home() / ".cache" / "stock_data_pipeline" / "correlation_state.npz",
+    )
+)
+
+# symmetric statistics are persisted as their upper triangle only
+SYMMETRIC = ("count", "weight", "cross")
+ASYMMETRIC = ("sum", "sum_sq")
+
+# closes of days that are not folded into the statistics yet
+PENDING_SCHEMA = pa.schema(
+    [
+        ("symbol", pa.string()),
+        ("date", pa.date32()),
+        ("close_price", pa.float64()),
+        ("factor", pa.float64()),
+    ]
+)
+
+
+class PairwiseMoments:
+    """
+    Masked sufficient statistics for every symbol pair (i, j), over the days on
+    which both symbols have a return:
+
+        count[i, j]   number of such days
+        weight[i, j]  sum of the day weights
+        sum[i, j]     weighted sum of x_i        (sum.T is the sum of x_j)
+        sum_sq[i, j]  weighted sum of x_i ** 2   (sum_sq.T for x_j)
+        cross[i, j]   weighted sum of x_i * x_j
+
+    A day is added (or removed) with a handful of outer products, O(symbols ** 2),
+    independent of how much history the statistics cover.
+    """
+
+    def __init__(self, n: int = 0):
+        for name in SYMMETRIC + ASYMMETRIC:
+            setattr(self, name, np.zeros((n, n)))
+
+    @property
+    def n(self) -> int:
+        return self.count.shape[0]
+
+    def grow(self, n: int) -> None:
+        """Adds empty rows/columns for symbols that joined the universe."""
+        pad = n - self.n
+        for name in SYMMETRIC + ASYMMETRIC:
+            setattr(self, name, np.pad(getattr(self, name), ((0, pad), (0, pad))))
+
+    def add(self, returns: np.ndarray, weight: float = 1.0) -> None:
+        """Adds one day of returns (NaN = no return), a negative weight removes it."""
+        present = ~np.isnan(returns)
+        mask = present.astype(float)
+        x = np.where(present, returns, 0.0)
+        pair = np.outer(mask, mask)
+
+        self.count += np.sign(weight) * pair
+        self.weight += weight * pair
+        self.sum += weight * np.outer(x, mask)
+        self.sum_sq += weight * np.outer(x * x, mask)
+        self.cross += weight * np.outer(x, x)
+
+    def decay(self, factor: float) -> None:
+        # counts stay raw day counts, only the weighted statistics decay
+        for name in ("weight",) + ASYMMETRIC + ("cross",):
+            getattr(self, name)[...] *= factor
+
+    def covariance(self, min_periods: int = 2, unbiased: bool = True) -> np.ndarray:
+        """Pairwise-complete covariance matrix, NaN where fewer than min_periods days."""
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mean_i = self.sum / self.weight
+            cov = self.cross / self.weight - mean_i * mean_i.T
+            if unbiased:
+                cov = cov * self.count / (self.count - 1)
+        cov[self.count < max(min_periods, 2)] = np.nan
+        return cov
+
+    def correlation(self, min_periods: int = 2) -> np.ndarray:
+        """Pairwise-complete correlation matrix, NaN where fewer than min_periods days."""
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mean_i = self.sum / self.weight
+            mean_j = mean_i.T
+            cov = self.cross / self.weight - mean_i * mean_j
+            var_i = self.sum_sq / self.weight - mean_i * mean_i
+            var_j = var_i.T
+            corr = cov / np.sqrt(var_i * var_j)
+        corr = np.clip(corr, -1.0, 1.0)
+        corr[self.count < max(min_periods, 2)] = np.nan
+        return corr
+
+    def to_arrays(self, prefix: str) -> Dict[str, np.ndarray]:
+        upper = np.triu_indices(self.n)
+        arrays = {f"{prefix}{name}": getattr(self, name)[upper] for name in SYMMETRIC}
+        arrays.update({f"{prefix}{name}": getattr(self, name) for name in ASYMMETRIC})
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays, prefix: str, n: int) -> "PairwiseMoments":
+        moments = cls(n)
+        upper = np.triu_indices(n)
+        for name in SYMMETRIC:
+            matrix = np.zeros((n, n))
+            matrix[upper] = arrays[f"{prefix}{name}"]
+            setattr(moments, name, matrix + np.triu(matrix, 1).T)
+        for name in ASYMMETRIC:
+            setattr(moments, name, np.array(arrays[f"{prefix}{name}"]))
+        return moments
+
+
+class ExponentialWindow:
+    """Exponentially weighted statistics, a day's weight halves every `halflife` days."""
+
+    def __init__(self, halflife: float = 63.0, n: int = 0):
+        self.halflife = halflife
+        self.decay_factor = 0.5 ** (1.0 / halflife)
+        self.moments = PairwiseMoments(n)
+
+    def grow(self, n: int) -> None:
+        self.moments.grow(n)
+
+    def update(self, returns: np.ndarray) -> None:
+        self.moments.decay(self.decay_factor)
+        self.moments.add(returns)
+
+
+class FixedWindow:
+    """
+    Equally weighted statistics over the last `window` trading days.
+
+    The returns of the window are kept in a ring buffer, so the day falling out is
+    subtracted when a new one comes in. The moments are rebuilt from the buffer
+    once per lap to stop floating point drift from the add/subtract.
+    """
+
+    def __init__(self, window: int = 63, n: int = 0):
+        self.window = window
+        self.buffer = np.full((window, n), np.nan)
+        self.position = 0
+        self.filled = 0
+        self.moments = PairwiseMoments(n)
+
+    def grow(self, n: int) -> None:
+        pad = n - self.buffer.shape[1]
+        self.buffer = np.pad(self.buffer, ((0, 0), (0, pad)), constant_values=np.nan)
+        self.moments.grow(n)
+
+    def update(self, returns: np.ndarray) -> None:
+        if self.filled == self.window:
+            self.moments.add(self.buffer[self.position], weight=-1.0)
+        self.buffer[self.position] = returns
+        self.moments.add(returns)
+        self.position = (self.position + 1) % self.window
+        self.filled = min(self.filled + 1, self.window)
+
+        if self.position == 0:
+            self.rebuild()
+
+    def rebuild(self) -> None:
+        moments = PairwiseMoments(self.buffer.shape[1])
+        for returns in self.buffer[: self.filled]:
+            moments.add(returns)
+        self.moments = moments
+
+
+def ex_date_factors(table: pa.Table, actions: pa.Table) -> np.ndarray:
+    """
+    Price factor of the corporate action of each (symbol, date) row of the table
+    whose date is the action's ex-date, 1.0 for rows without an action.
+    """
+    factors = np.ones(table.num_rows)
+    if actions.num_rows == 0:
+        return factors
+    keys = pa.table(
+        {
+            "symbol": actions["symbol"],
+            "date": actions["ex_date"].cast(table.schema.field("date").type),
+            "factor": action_price_factors(actions),
+        }
+    )
+    rows = pa.table(
+        {
+            "symbol": table["symbol"],
+            "date": table["date"],
+            "row": np.arange(table.num_rows),
+        }
+    )
+    matched = rows.join(keys, keys=["symbol", "date"], join_type="inner")
+    factors[matched["row"].to_numpy()] = matched["factor"].to_numpy()
+    return factors
+
+
+class CorrelationEngine:
+    """
+    Incremental cross-symbol covariance / correlation of daily close-to-close returns.
+
+    Closes are raw; the price factor of a split or dividend going ex on a day
+    scales the previous close, so returns are total returns and a split never
+    enters the statistics as a price jump.
+
+    Feed it one trading day of closes at a time (update) or a batch of ingested
+    rows (update_from_table). Each day is folded into the exponentially weighted
+    and fixed window statistics with a few vectorized outer products, and the
+    matrices are produced from those statistics alone, so the daily cost does not
+    depend on the length of the history. State round-trips through a compressed
+    .npz file.
+    """
+
+    def __init__(
+        self, halflife: float = 63.0, window: int = 63, max_pending_days: int = 5
+    ):
+        self.symbols: List[str] = []
+        self.index: Dict[str, int] = {}
+        self.last_close = np.zeros(0)
+        # date of each symbol's last close, a return needs the previous session
+        self.last_close_date = np.zeros(0, dtype="datetime64[D]")
+        self.last_date: np.datetime64 | None = None
+        # rows of days still missing an expected symbol (see update_from_table)
+        self.max_pending_days = max_pending_days
+        self.pending = PENDING_SCHEMA.empty_table()
+        # symbols that stopped reporting, not waited for until they have a close
+        self.inactive: Set[str] = set()
+        self.windows = {
+            "ew": ExponentialWindow(halflife),
+            "fixed": FixedWindow(window),
+        }
+
+    def _register(self, symbols: List[str]) -> np.ndarray:
+        new = [s for s in dict.fromkeys(symbols) if s not in self.index]
+        if new:
+            for symbol in new:
+                self.index[symbol] = len(self.symbols)
+                self.symbols.append(symbol)
+            pad = len(new)
+            self.last_close = np.pad(self.last_close, (0, pad), constant_values=np.nan)
+            self.last_close_date = np.concatenate(
+                [self.last_close_date, np.full(pad, "NaT", dtype="datetime64[D]")]
+            )
+            for window in self.windows.values():
+                window.grow(len(self.symbols))
+        return np.array([self.index[s] for s in symbols], dtype=np.int64)
+
+    def update(
+        self,
+        day: date,
+        symbols: List[str],
+        closes: np.ndarray,
+        factors: np.ndarray | None = None,
+    ) -> np.ndarray:
+        """
+        Folds one trading day of closes into every window.
+
+        Args:
+            day (date): The trading day, days at or before the last one are ignored
+                so replaying the same batch is harmless.
+            symbols (List[str]): Symbols with a close on that day.
+            closes (np.ndarray): Their raw closes, same order as symbols.
+            factors (np.ndarray | None): Price factor of the corporate actions
+                going ex on that day (see action_price_factors), 1.0 = no action.
+
+        Returns:
+            np.ndarray: The day's returns in engine symbol order (NaN = no return).
+        """
+        day = np.datetime64(day, "D")
+        if self.last_date is not None and day <= self.last_date:
+            logger.info(f"⏭️ {day} is already in the correlation state")
+            return np.full(len(self.symbols), np.nan)
+
+        positions = self._register(symbols)
+        closes = np.asarray(closes, dtype=float)
+        factors = np.ones(len(positions)) if factors is None else factors
+
+        returns = np.full(len(self.symbols), np.nan)
+        # only symbols that also closed on the previous session get a return
+        if self.last_date is None:
+            has_previous = np.zeros(len(positions), dtype=bool)
+        else:
+            has_previous = self.last_close_date[positions] == self.last_date
+        with np.errstate(divide="ignore", invalid="ignore"):
+            returns[positions] = np.where(
+                has_previous,
+                closes / (self.last_close[positions] * factors) - 1.0,
+                np.nan,
+            )
+
+        if self.last_date is not None:
+            for window in self.windows.values():
+                window.update(returns)
+
+        self.last_close[positions] = closes
+        self.last_close_date[positions] = day
+        self.last_date = day
+        return returns
+
+    def update_from_table(
+        self,
+        table: pa.Table,
+        actions: pa.Table | None = None,
+        expected: List[str] | None = None,
+    ) -> int:
+        """
+        Folds ingested rows (symbol, date, close_price), e.g. a run's spool or an
+        Iceberg delta, into the state one trading day at a time.
+
+        A day is only folded once every expected symbol has a close on it, since a
+        folded day is never revisited: a ticker that failed, or was cut off by a
+        fetch error, would otherwise lose that day and its next return for good.
+        Incomplete days wait in `pending` (persisted with the state) until a later
+        run brings the missing closes, or until `max_pending_days` newer days have
+        arrived, then they are folded with whatever symbols they have.
+
+        Args:
+            table (pa.Table): Raw closes.
+            actions (pa.Table | None): Corporate actions of the symbols (see
+                CorporateActionStore), without them splits show up as returns.
+            expected (List[str] | None): Symbols every day should have, e.g. the
+                ticker universe of the run. Defaults to the active symbols of the
+                state plus those of the rows; a symbol that is still missing after
+                max_pending_days newer days is dropped from that default (until
+                it has a close again), so a delisted ticker stalls the engine once
+                instead of on every later day.
+
+        Returns:
+            int: Number of trading days added.
+        """
+        table = table.select(["symbol", "date", "close_price"])
+        factors = ex_date_factors(
+            table, actions if actions is not None else ACTIONS_SCHEMA.empty_table()
+        )
+        incoming = pa.table(
+            {
+                "symbol": table["symbol"],
+                "date": table["date"],
+                "close_price": table["close_price"],
+                "factor": factors,
+            }
+        ).cast(PENDING_SCHEMA)
+        if self.last_date is not None:
+            last_date = pa.scalar(self.last_date.astype(date), pa.date32())
+            late = pc.less_equal(incoming["date"], last_date)
+            if pc.any(late).as_py():
+                logger.info(
+                    f"⏭️ {pc.sum(late).as_py()} row(s) at or before "
+                    f"{self.last_date} are already in the correlation state"
+                )
+            incoming = incoming.filter(pc.invert(late))
+
+        # newly ingested rows win over pending ones of the same (symbol, date)
+        combined = pa.concat_tables([incoming, self.pending])
+        first = {}
+        for i, key in enumerate(
+            zip(combined["symbol"].to_pylist(), combined["date"].to_pylist())
+        ):
+            first.setdefault(key, i)
+        keep = pa.array(sorted(first.values()), pa.int64())
+        combined = combined.take(keep).sort_by("date")
+
+        dates = combined["date"].to_numpy().astype("datetime64[D]")
+        symbols = np.array(combined["symbol"].to_pylist(), dtype=object)
+        closes = combined["close_price"].to_numpy()
+        factors = combined["factor"].to_numpy()
+        if expected is None:
+            expected = set(self.symbols) - self.inactive
+        expected = set(expected) | set(symbols)
+
+        days, starts = np.unique(dates, return_index=True)
+        bounds = np.append(starts, len(dates))
+        added = 0
+        for i, day in enumerate(days):
+            rows = slice(bounds[i], bounds[i + 1])
+            missing = expected - set(symbols[rows])
+            newer_days = len(days) - 1 - i
+            if missing and newer_days < self.max_pending_days:
+                break
+            if missing:
+                logger.warning(
+                    f"⚠️ Folding {day} without {sorted(missing)}, no close after "
+                    f"{newer_days} newer day(s), no longer expecting them"
+                )
+                self.inactive |= missing
+                expected -= missing
+            self.update(
+                day.astype(date), list(symbols[rows]), closes[rows], factors[rows]
+            )
+            self.inactive -= set(symbols[rows])
+            added += 1
+
+        self.pending = combined.slice(bounds[added]) if added else combined
+        if self.pending.num_rows:
+            logger.info(
+                f"⏳ {len(days) - added} incomplete day(s) pending from "
+                f"{self.pending['date'][0]}"
+            )
+        return added
+
+    def correlation(
+        self, window: str = "ew", min_periods: int = 20
+    ) -> Tuple[List[str], np.ndarray]:
+        """(symbols, correlation matrix) of the "ew" or "fixed" window."""
+        return self.symbols, self.windows[window].moments.correlation(min_periods)
+
+    def covariance(
+        self, window: str = "ew", min_periods: int = 20
+    ) -> Tuple[List[str], np.ndarray]:
+        """(symbols, covariance matrix of daily returns) of the "ew" or "fixed" window."""
+        # exponentially weighted covariance is the weighted (population) estimate
+        unbiased = window == "fixed"
+        return self.symbols, self.windows[window].moments.covariance(
+            min_periods, unbiased=unbiased
+        )
+
+    def save(self, path: Path | str = DEFAULT_STATE_PATH) -> None:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        ew, fixed = self.windows["ew"], self.windows["fixed"]
+        tmp_path = path.with_suffix(".tmp.npz")
+        np.savez_compressed(
+            tmp_path,
+            symbols=np.array(self.symbols, dtype=str),
+            last_close=self.last_close,
+            last_close_date=self.last_close_date,
+            last_date=np.array(
+                [self.last_date if self.last_date is not None else "NaT"],
+                dtype="datetime64[D]",
+            ),
+            pending_symbol=np.array(self.pending["symbol"].to_pylist(), dtype=str),
+            pending_date=self.pending["date"].to_numpy().astype("datetime64[D]"),
+            pending_close=self.pending["close_price"].to_numpy(),
+            pending_factor=self.pending["factor"].to_numpy(),
+            max_pending_days=self.max_pending_days,
+            inactive=np.array(sorted(self.inactive), dtype=str),
+            halflife=ew.halflife,
+            window=fixed.window,
+            buffer=fixed.buffer,
+            position=fixed.position,
+            filled=fixed.filled,
+            **ew.moments.to_arrays("ew_"),
+            **fixed.moments.to_arrays("fixed_"),
+        )
+        # atomic rename, a crash never leaves a half written state
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: Path | str = DEFAULT_STATE_PATH) -> "CorrelationEngine":
+        with np.load(path) as arrays:
+            engine = cls(
+                halflife=float(arrays["halflife"]),
+                window=int(arrays["window"]),
+                max_pending_days=int(arrays["max_pending_days"]),
+            )
+            engine.symbols = [str(s) for s in arrays["symbols"]]
+            engine.index = {s: i for i, s in enumerate(engine.symbols)}
+            n = len(engine.symbols)
+            engine.last_close = arrays["last_close"]
+            engine.last_close_date = arrays["last_close_date"]
+            last_date = arrays["last_date"][0]
+            engine.last_date = None if np.isnat(last_date) else last_date
+            engine.inactive = {str(s) for s in arrays["inactive"]}
+            engine.pending = pa.table(
+                {
+                    "symbol": arrays["pending_symbol"].astype(object),
+                    "date": arrays["pending_date"],
+                    "close_price": arrays["pending_close"],
+                    "factor": arrays["pending_factor"],
+                }
+            ).cast(PENDING_SCHEMA)
+
+            ew, fixed = engine.windows["ew"], engine.windows["fixed"]
+            ew.moments = PairwiseMoments.from_arrays(arrays, "ew_", n)
+            fixed.moments = PairwiseMoments.from_arrays(arrays, "fixed_", n)
+            fixed.buffer = arrays["buffer"]
+            fixed.position = int(arrays["position"])
+            fixed.filled = int(arrays["filled"])
+        return engine
+
+
+# --- MAIN EXECUTION FLOW ---
+if __name__ == "__main__":
+    from scripts.corporate_actions import CorporateActionStore
+    from scripts.ingest_last7days_stock_data import StockExtractor
+    from scripts.spool import ArrowSpool
+
+    parser = argparse.ArgumentParser(
+        description="Fold an ingestion run's closes into the correlation state."
+    )
+    parser.add_argument("run_id", help="Run whose spool holds the validated closes.")
+    parser.add_argument("--state", default=str(DEFAULT_STATE_PATH))
+    parser.add_argument("--window", choices=["ew", "fixed"], default="ew")
+    parser.add_argument(
+        "--symbols",
+        nargs="*",
+        help="Ticker universe every day should have, defaults to the active "
+        "symbols of the state.",
+    )
+    args = parser.parse_args()
+
+    state_path = Path(args.state)
+    engine = (
+        CorrelationEngine.load(state_path)
+        if state_path.exists()
+        else CorrelationEngine()
+    )
+    table = ArrowSpool.open_existing(args.run_id).read()
+    # splits and dividends from the corporate action dataset, so they are not returns
+    extractor = StockExtractor(
+        api_key=os.getenv("ALPHA_VANTAGE_API_KEY"),
+        aws_access_key=os.getenv("STOCK_DATA_AWS_S3_ACCESS_KEY_ID"),
+        aws_secret_key=os.getenv("STOCK_DATA_AWS_S3_SECRET_ACCESS_KEY"),
+        region=os.getenv("AWS_REGION", "us-east-1"),
+    )
+    action_store = CorporateActionStore(
+        extractor.s3_client, os.getenv("STOCK_DATA_AWS_S3_BUCKET_NAME")
+    )
+    actions = pa.concat_tables(
+        [action_store.load(s) for s in pc.unique(table["symbol"]).to_pylist()]
+        or [ACTIONS_SCHEMA.empty_table()]
+    )
+    added = engine.update_from_table(table, actions, expected=args.symbols)
+    engine.save(state_path)
+
+    start = time.perf_counter()
+    symbols, matrix = engine.correlation(args.window)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    latest = pc.max(table["date"]).as_py() if table.num_rows else None
+    logger.info(
+        f"✅ Added {added} day(s) up to {latest}, {len(symbols)}x{len(symbols)} "
+        f"{args.window} correlation matrix in {elapsed_ms:.1f} ms"
+    )
+    print(
+        f"✅ Added {added} day(s) up to {latest}, {len(symbols)}x{len(symbols)} "
+        f"{args.window} correlation matrix in {elapsed_ms:.1f} ms"
+    )  # for development
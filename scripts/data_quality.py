@@ -0,0 +1,251 @@
+import logging
+import time
+from typing import Dict, List
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+from pydantic import BaseModel, Field
+
+logger = logging.getLogger(__name__)
+
+# Severity levels used by the checks below. "error" blocks the upload of a ticker,
+# "warn" is only surfaced in the run report (e.g. a legit split looks like a price jump)
+ERROR = "error"
+WARN = "warn"
+
+
+class DataQualityError(Exception):
+    """Raised when a ticker batch fails one or more blocking data quality checks."""
+
+
+class DataQualityThresholds(BaseModel):
+    """Tunable limits for the ingestion-time data quality checks."""
+
+    # max absolute close-to-close move before a row is flagged (0.5 = 50%)
+    max_daily_move: float = 0.5
+    # severity of the checks that can legitimately trip on real market data
+    price_jump_severity: str = WARN
+    missing_days_severity: str = WARN
+    # share of a ticker's rows that may fail row validation (and be quarantined)
+    # before the whole ticker is failed (0.2 = 20%)
+    max_quarantine_rate: float = 0.2
+
+
+class CheckResult(BaseModel):
+    """Outcome of a single check on a single ticker batch."""
+
+    check: str
+    severity: str
+    failed_rows: int
+    # a few offending dates to make the log message actionable
+    sample_dates: List[str] = Field(default_factory=list)
+
+    @property
+    def passed(self) -> bool:
+        return self.failed_rows == 0
+
+
+class TickerQualityReport(BaseModel):
+    """All check results for one ticker batch."""
+
+    symbol: str
+    row_count: int
+    elapsed_ms: float
+    results: List[CheckResult] = Field(default_factory=list)
+
+    @property
+    def errors(self) -> List[CheckResult]:
+        return [r for r in self.results if not r.passed and r.severity == ERROR]
+
+    @property
+    def warnings(self) -> List[CheckResult]:
+        return [r for r in self.results if not r.passed and r.severity == WARN]
+
+    @property
+    def has_errors(self) -> bool:
+        return len(self.errors) > 0
+
+
+class RunQualityReport(BaseModel):
+    """Per-run summary collecting every ticker report of an ingestion run."""
+
+    tickers: Dict[str, TickerQualityReport] = Field(default_factory=dict)
+
+    def add(self, report: TickerQualityReport) -> None:
+        self.tickers[report.symbol] = report
+
+    def summary(self) -> str:
+        """Renders a short human readable summary for the logs."""
+        lines = [f"📋 Data quality summary for {len(self.tickers)} ticker(s):"]
+        for symbol, report in self.tickers.items():
+            status = "❌" if report.has_errors else ("⚠️" if report.warnings else "✅")
+            failed = [
+                f"{r.check}={r.failed_rows}" for r in report.errors + report.warnings
+            ]
+            lines.append(
+                f"  {status} {symbol}: {report.row_count} rows in "
+                f"{report.elapsed_ms:.2f} ms"
+                + (f" ({', '.join(failed)})" if failed else "")
+            )
+        return "\n".join(lines)
+
+
+def records_to_table(records: List[BaseModel]) -> pa.Table:
+    """Converts a list of validated Pydantic records into a columnar Arrow table."""
+    return pa.Table.from_pylist([r.model_dump() for r in records])
+
+
+def _result(
+    check: str, severity: str, mask: np.ndarray, dates: np.ndarray
+) -> CheckResult:
+    # mask is a boolean array, True marks an offending row
+    bad_dates = dates[mask]
+    return CheckResult(
+        check=check,
+        severity=severity,
+        failed_rows=int(mask.sum()),
+        sample_dates=[str(d) for d in bad_dates[:5]],
+    )
+
+
+def expected_trading_days(
+    start: np.datetime64, end: np.datetime64, holidays: List[str] | None = None
+) -> np.ndarray:
+    """Returns every weekday between start and end (inclusive), minus holidays."""
+    days = np.arange(start, end + np.timedelta64(1, "D"), dtype="datetime64[D]")
+    return days[np.is_busday(days, holidays=holidays or [])]
+
+
+class DataQualityEngine:
+    """
+    Runs vectorized OHLCV checks on one ticker's columnar data before upload.
+
+    Every check is a single NumPy/Arrow expression over the whole batch, so a
+    ticker is checked in milliseconds on the worker instead of by warehouse
+    queries after the load.
+    """
+
+    def __init__(self, thresholds: DataQualityThresholds | None = None):
+        self.thresholds = thresholds or DataQualityThresholds()
+
+    def check_ohlc_bounds(self, table: pa.Table, dates: np.ndarray) -> CheckResult:
+        """low <= open/close <= high for every row."""
+        low = pc.min_element_wise(
+            table["low_price"], table["open_price"], table["close_price"]
+        )
+        high = pc.max_element_wise(
+            table["high_price"], table["open_price"], table["close_price"]
+        )
+        mask = pc.or_(
+            pc.not_equal(low, table["low_price"]),
+            pc.not_equal(high, table["high_price"]),
+        )
+        return _result("ohlc_bounds", ERROR, mask.to_numpy(zero_copy_only=False), dates)
+
+    def check_non_negative_volume(
+        self, table: pa.Table, dates: np.ndarray
+    ) -> CheckResult:
+        mask = pc.less(table["volume"], 0).to_numpy(zero_copy_only=False)
+        return _result("non_negative_volume", ERROR, mask, dates)
+
+    def check_price_jumps(self, close: np.ndarray, dates: np.ndarray) -> CheckResult:
+        """Flags day-over-day close moves larger than the configured threshold."""
+        mask = np.zeros(len(close), dtype=bool)
+        if len(close) > 1:
+            moves = np.abs(close[1:] / close[:-1] - 1.0)
+            mask[1:] = moves > self.thresholds.max_daily_move
+        return _result("price_jump", self.thresholds.price_jump_severity, mask, dates)
+
+    def check_duplicate_dates(self, dates: np.ndarray) -> CheckResult:
+        # dates are sorted, so duplicates are always adjacent
+        mask = np.zeros(len(dates), dtype=bool)
+        if len(dates) > 1:
+            mask[1:] = dates[1:] == dates[:-1]
+        return _result("duplicate_dates", ERROR, mask, dates)
+
+    def check_missing_trading_days(
+        self, dates: np.ndarray, expected: np.ndarray | None = None
+    ) -> CheckResult:
+        """Compares the batch dates with the trading days expected in its range."""
+        if expected is None:
+            if len(dates) == 0:
+                expected = dates
+            else:
+                expected = expected_trading_days(dates[0], dates[-1])
+        missing = expected[~np.isin(expected, dates)]
+        return _result(
+            "missing_trading_days",
+            self.thresholds.missing_days_severity,
+            np.ones(len(missing), dtype=bool),
+            missing,
+        )
+
+    def check_quarantined_rows(
+        self, quarantined_dates: List[str], valid_rows: int
+    ) -> CheckResult:
+        """Rows rejected by row validation, an error once their share is too high."""
+        total_rows = valid_rows + len(quarantined_dates)
+        rate = len(quarantined_dates) / total_rows if total_rows else 0.0
+        severity = ERROR if rate > self.thresholds.max_quarantine_rate else WARN
+        return CheckResult(
+            check="quarantined_rows",
+            severity=severity,
+            failed_rows=len(quarantined_dates),
+            sample_dates=quarantined_dates[:5],
+        )
+
+    def run(
+        self,
+        symbol: str,
+        table: pa.Table,
+        expected_dates: np.ndarray | None = None,
+        quarantined_dates: List[str] | None = None,
+    ) -> TickerQualityReport:
+        """
+        Runs every check on one ticker batch.
+
+        Args:
+            symbol (str): The stock ticker the batch belongs to.
+            table (pa.Table): Columnar batch with the DailyStockData columns.
+            expected_dates (np.ndarray | None): Trading days the batch should cover,
+                defaults to every weekday between the first and last date.
+            quarantined_dates (List[str] | None): Dates of the rows that failed row
+                validation and were quarantined instead of loaded.
+
+        Returns:
+            TickerQualityReport: One CheckResult per check.
+        """
+        start = time.perf_counter()
+        results = []
+        if quarantined_dates:
+            results.append(
+                self.check_quarantined_rows(quarantined_dates, table.num_rows)
+            )
+
+        if table.num_rows > 0:
+            # sort once so the day-over-day checks can use shifted arrays
+            table = table.sort_by("date")
+            dates = table["date"].to_numpy().astype("datetime64[D]")
+            close = table["close_price"].to_numpy()
+
+            results += [
+                self.check_ohlc_bounds(table, dates),
+                self.check_non_negative_volume(table, dates),
+                self.check_price_jumps(close, dates),
+                self.check_duplicate_dates(dates),
+                self.check_missing_trading_days(dates, expected_dates),
+            ]
+
+        report = TickerQualityReport(
+            symbol=symbol,
+            row_count=table.num_rows,
+            elapsed_ms=(time.perf_counter() - start) * 1000,
+            results=results,
+        )
+        for result in report.errors + report.warnings:
+            logger.warning(
+                f"⚠️ {symbol} failed {result.check} ({result.severity}) on "
+                f"{result.failed_rows} row(s), e.g. {result.sample_dates}"
+            )
+        return report
@@ -0,0 +1,205 @@
+import logging
+from typing import Iterable, List
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+try:
+    from pyiceberg.catalog import Catalog, load_catalog
+    from pyiceberg.exceptions import NamespaceAlreadyExistsError
+    from pyiceberg.manifest import ManifestEntryStatus
+    from pyiceberg.partitioning import PartitionField, PartitionSpec
+    from pyiceberg.schema import Schema
+    from pyiceberg.table import Table
+    from pyiceberg.table.snapshots import ancestors_of
+    from pyiceberg.table.sorting import SortField, SortOrder
+    from pyiceberg.transforms import IdentityTransform, MonthTransform
+    from pyiceberg.types import (
+        DateType,
+        DoubleType,
+        LongType,
+        NestedField,
+        StringType,
+    )
+except ImportError:  # optional dependency: pip install "stock-data-project[iceberg]"
+    load_catalog = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TABLE_NAME = "bronze.stock_prices"
+
+# snapshot summary property that ties a commit to its ingestion run
+RUN_ID_PROPERTY = "stock-data.run-id"
+
+
+def stock_prices_schema() -> "Schema":
+    """Iceberg schema of the validated batches (DailyStockData + ingested_at)."""
+    return Schema(
+        NestedField(1, "symbol", StringType(), required=False),
+        NestedField(2, "date", DateType(), required=False),
+        NestedField(3, "open_price", DoubleType(), required=False),
+        NestedField(4, "high_price", DoubleType(), required=False),
+        NestedField(5, "low_price", DoubleType(), required=False),
+        NestedField(6, "close_price", DoubleType(), required=False),
+        NestedField(7, "volume", LongType(), required=False),
+        NestedField(8, "ingested_at", StringType(), required=False),
+    )
+
+
+class IcebergSink:
+    """
+    Appends the validated batches of an ingestion run to an Iceberg table.
+
+    Each run is a single atomic append (one snapshot, tagged with the run id), so
+    downstream readers see either all tickers of a run or none, and a replayed
+    run is never committed twice. The table is partitioned by month of `date`.
+    Consumers keep the last snapshot id they processed and read only the data
+    files added after it, instead of listing raw/ and reloading history.
+
+    The catalog comes from pyiceberg's own configuration (.pyiceberg.yaml or
+    PYICEBERG_CATALOG__<NAME>__* environment variables), e.g. a SQL catalog on
+    SQLite with a file:// warehouse locally, or Glue/REST with an s3:// warehouse.
+    """
+
+    def __init__(self, catalog: "Catalog", table_name: str = DEFAULT_TABLE_NAME):
+        if load_catalog is None:
+            raise ImportError(
+                "pyiceberg is not installed, install the 'iceberg' extra to use "
+                "the Iceberg sink"
+            )
+        self.catalog = catalog
+        self.table_name = table_name
+        self.table = self._load_or_create_table()
+
+    @classmethod
+    def from_config(
+        cls, catalog_name: str = "default", table_name: str = DEFAULT_TABLE_NAME
+    ) -> "IcebergSink":
+        if load_catalog is None:
+            raise ImportError(
+                "pyiceberg is not installed, install the 'iceberg' extra to use "
+                "the Iceberg sink"
+            )
+        return cls(load_catalog(catalog_name), table_name)
+
+    def _load_or_create_table(self) -> "Table":
+        namespace = self.table_name.rsplit(".", 1)[0]
+        try:
+            self.catalog.create_namespace(namespace)
+        except NamespaceAlreadyExistsError:
+            pass
+
+        schema = stock_prices_schema()
+        date_field = schema.find_field("date")
+        return self.catalog.create_table_if_not_exists(
+            self.table_name,
+            schema=schema,
+            partition_spec=PartitionSpec(
+                PartitionField(
+                    source_id=date_field.field_id,
+                    field_id=1000,
+                    transform=MonthTransform(),
+                    name="date_month",
+                )
+            ),
+            sort_order=SortOrder(
+                SortField(
+                    source_id=schema.find_field("symbol").field_id,
+                    transform=IdentityTransform(),
+                ),
+                SortField(source_id=date_field.field_id, transform=IdentityTransform()),
+            ),
+        )
+
+    def current_snapshot_id(self) -> int | None:
+        self.table.refresh()
+        snapshot = self.table.current_snapshot()
+        return snapshot.snapshot_id if snapshot else None
+
+    def committed_snapshot_id(self, run_id: str) -> int | None:
+        """Snapshot of an earlier commit of the run, None if it was never committed."""
+        self.table.refresh()
+        for snapshot in self.table.snapshots():
+            if snapshot.summary and snapshot.summary.get(RUN_ID_PROPERTY) == run_id:
+                return snapshot.snapshot_id
+        return None
+
+    def append_run(self, run_id: str, tables: Iterable[pa.Table]) -> int | None:
+        """
+        Commits every batch of the run in one atomic append.
+
+        Args:
+            run_id (str): Ingestion run id, recorded in the snapshot summary.
+            tables (Iterable[pa.Table]): Validated ticker batches with ingested_at.
+
+        Returns:
+            int | None: The snapshot id of the run, None if there was nothing to add.
+        """
+        existing = self.committed_snapshot_id(run_id)
+        if existing is not None:
+            logger.info(f"⏭️ Run {run_id} is already in {self.table_name}")
+            return existing
+
+        tables = [t for t in tables if t.num_rows]
+        if not tables:
+            return None
+        batch = pa.concat_tables(tables).cast(self.table.schema().as_arrow())
+
+        self.table.append(batch, snapshot_properties={RUN_ID_PROPERTY: run_id})
+        snapshot_id = self.current_snapshot_id()
+        logger.info(
+            f"🧊 Appended {batch.num_rows} rows of run {run_id} to "
+            f"{self.table_name} (snapshot {snapshot_id})"
+        )
+        return snapshot_id
+
+    def files_added_since(self, snapshot_id: int | None = None) -> List[str]:
+        """
+        Data files appended after `snapshot_id`, oldest commit first.
+
+        Args:
+            snapshot_id (int | None): Last snapshot the consumer processed, None for
+                every file of the current table.
+
+        Raises:
+            ValueError: If the snapshot is not an ancestor of the current snapshot
+                (e.g. it was expired), the consumer has to do a full reload then.
+        """
+        self.table.refresh()
+        current = self.table.current_snapshot()
+        if current is None:
+            return []
+
+        snapshots = []
+        for snapshot in ancestors_of(current, self.table.metadata):
+            if snapshot.snapshot_id == snapshot_id:
+                break
+            snapshots.append(snapshot)
+        else:
+            if snapshot_id is not None:
+                raise ValueError(
+                    f"Snapshot {snapshot_id} is not an ancestor of the current "
+                    f"snapshot of {self.table_name}"
+                )
+
+        files = []
+        for snapshot in reversed(snapshots):
+            for manifest in snapshot.manifests(self.table.io):
+                # manifests written by this snapshot hold exactly the files it added
+                if manifest.added_snapshot_id != snapshot.snapshot_id:
+                    continue
+                for entry in manifest.fetch_manifest_entry(self.table.io):
+                    if entry.status == ManifestEntryStatus.ADDED:
+                        files.append(entry.data_file.file_path)
+        return files
+
+    def read_since(self, snapshot_id: int | None = None) -> pa.Table:
+        """Reads only the rows appended after `snapshot_id` (see files_added_since)."""
+        schema = self.table.schema().as_arrow()
+        tables = []
+        for path in self.files_added_since(snapshot_id):
+            with self.table.io.new_input(path).open() as f:
+                tables.append(pq.read_table(f).select(schema.names).cast(schema))
+        if not tables:
+            return schema.empty_table()
+        return pa.concat_tables(tables)
@@ -1,19 +1,44 @@
+import argparse
+import atexit
 import os
-import io
 import logging
 import time
 from dotenv import load_dotenv
-import requests
 import boto3
-import pandas as pd
+import pyarrow as pa
 from pydantic import (
     BaseModel,
     Field,
     field_validator,
     ConfigDict,
+    ValidationError,
 )  # import pydantic for data validation and cleaning
 from typing import List
-from datetime import date, datetime
+from datetime import date
+
+from scripts.data_quality import (
+    DataQualityEngine,
+    RunQualityReport,
+    records_to_table,
+)
+from scripts.providers import (
+    AlphaVantageProvider,
+    HedgedFetcher,
+    LocalDropProvider,
+    StockDataProvider,
+)
+from scripts.iceberg_sink import IcebergSink
+from scripts.parquet_layout import ParquetLayout, encode_parquet
+from scripts.profiling import NullProfiler, RunProfiler
+from scripts.quarantine import RowQuarantine
+from scripts.spool import (
+    ArrowSpool,
+    new_run_id,
+    prune_completed_spools,
+    with_ingested_at,
+)
+from scripts.ticker_ingestion import TickerIngestion
+from scripts.trading_calendar import TradingCalendar
 
 logger = logging.getLogger(__name__)
 
@@ -49,13 +74,28 @@ class DailyStockData(BaseModel):
         return v
 
 
-class StockExtractor:
+class StockExtractor(TickerIngestion):
     def __init__(
-        self, api_key: str, aws_access_key: str, aws_secret_key: str, region: str
+        self,
+        api_key: str,
+        aws_access_key: str,
+        aws_secret_key: str,
+        region: str,
+        provider: StockDataProvider | None = None,
+        parquet_layout: ParquetLayout | None = None,
     ):
         self.api_key = api_key
         self.base_url = "https://www.alphavantage.co/query"
 
+        # Data source behind the fetch methods, Alpha Vantage unless a (hedged)
+        # multi-provider fetcher is passed in
+        self.provider = provider or AlphaVantageProvider(
+            api_key=api_key, base_url=self.base_url, timeout=20
+        )
+
+        # Sort order, row groups, page index and bloom filters of the uploaded files
+        self.parquet_layout = parquet_layout or ParquetLayout()
+
         # Initialize the S3 Client using the credentials from the .env
         try:
             self.s3_client = boto3.client(
@@ -72,24 +112,42 @@ class StockExtractor:
             raise
 
     def fetch_year_to_date_history(self, symbol: str) -> dict:
-        """Fetches the FULL history (starting 2026-01-01) from Alpha Vantage."""
-        params = {
-            "function": "TIME_SERIES_DAILY",
-            "symbol": symbol,
-            "outputsize": "compact",  # <--- compact only pull latest 100 days of data which is enough for the project, but change to "full" for past 20 years (NOT RECOMMENDED)
-            "apikey": self.api_key,
-        }
-        headers = {"User-Agent": "Mozilla/5.0"}
-        response = requests.get(
-            self.base_url, params=params, headers=headers, timeout=20
+        """Fetches the FULL history (starting 2026-01-01) from the data provider."""
+        # compact only pull latest 100 days of data which is enough for the project, but change to "full" for past 20 years (NOT RECOMMENDED)
+        return self.provider.fetch_daily(symbol, outputsize="compact")
+
+    def fetch_window(self, symbol: str) -> dict:
+        return self.fetch_year_to_date_history(symbol)
+
+    def validate_window(
+        self,
+        symbol: str,
+        raw_data: dict,
+        expected_dates: List[date],
+        quarantine: RowQuarantine,
+    ) -> List[DailyStockData]:
+        return self.validate_year_to_date_history(
+            symbol,
+            start_date=expected_dates[0].isoformat(),
+            end_date=expected_dates[-1].isoformat(),
+            raw_data=raw_data,
+            quarantine=quarantine,
         )
-        response.raise_for_status()
-        return response.json()
 
     def validate_year_to_date_history(
-        self, symbol: str, start_date: str, end_date: str, raw_data: dict
+        self,
+        symbol: str,
+        start_date: str,
+        end_date: str,
+        raw_data: dict,
+        quarantine: RowQuarantine | None = None,
     ) -> List[DailyStockData]:
-        """Processes daily data from beginning of the year"""
+        """
+        Processes daily data from beginning of the year.
+
+        Rows that fail validation are collected in `quarantine` when one is given
+        (the good rows go on), otherwise the first bad row raises.
+        """
         time_series = raw_data.get("Time Series (Daily)", {})
         validated_records = []
 
@@ -98,18 +156,26 @@ class StockExtractor:
         end_date = date.fromisoformat(end_date)
 
         for date_str, metrics in time_series.items():
-            # Alpha Vantage date strings are 'YYYY-MM-DD'
-            # Convert string to date object for comparison
-            current_date = date.fromisoformat(date_str)
-
-            # only process date between start_date and end_date
-            if start_date <= current_date <= end_date:
+            try:
+                # Alpha Vantage date strings are 'YYYY-MM-DD'
+                # Convert string to date object for comparison
+                current_date = date.fromisoformat(date_str)
+
+                # only process date between start_date and end_date
+                if not start_date <= current_date <= end_date:
+                    continue
                 record = DailyStockData(
                     symbol=symbol,
                     date=date_str,  # Pydantic will still validate this
                     **metrics,
                 )
-                validated_records.append(record)
+            except (ValidationError, ValueError) as e:
+                # a malformed date key is quarantined like any other bad row
+                if quarantine is None:
+                    raise
+                quarantine.add(date_str, metrics, e)
+                continue
+            validated_records.append(record)
 
         logger.info(
             f"✅ Processed {len(validated_records)} historical rows for {symbol}"
@@ -122,34 +188,61 @@ class StockExtractor:
     def upload_year_to_date_history_to_s3(
         self, records: List[DailyStockData], s3_bucket: str | None = None
     ) -> None:
-        # Convert list of Pydantic models to a list of dicts for Pandas
-        df = pd.DataFrame([r.model_dump() for r in records])
-        df["ingested_at"] = datetime.now()
-        # convert created_at to varchar and do the timestamp transformation in snowflake
-        df["ingested_at"] = df["ingested_at"].astype(str)
+        # Convert list of Pydantic models to a columnar Arrow table
+        table = with_ingested_at(records_to_table(records))
+        self.upload_table_to_s3(table, s3_bucket=s3_bucket)
+
+    def upload_table_to_s3(
+        self,
+        table: pa.Table,
+        s3_bucket: str | None = None,
+        run_date: date | None = None,
+    ) -> None:
+        """
+        Writes one ticker's Arrow table (e.g. straight from the spool) to S3.
 
-        # df.to_csv('final_data_test.csv')
+        Args:
+            table (pa.Table): Validated rows of a single symbol, with ingested_at.
+            s3_bucket (str | None): Destination bucket.
+            run_date (date | None): Date of the run, so a replay writes the same key.
+        """
+        # Use the run's year in the filename for tracking and proper s3 bucket folder structure
+        current_year = (run_date or date.today()).year
+        symbol = table["symbol"][0].as_py()
 
-        # Use today's date in the filename for tracking and proper s3 bucket folder structure
-        current_date = date.today()
-        current_year = current_date.year
+        file_key = f"raw/stocks/{symbol}/{current_year}_full_historical.parquet"
 
-        file_key = (
-            f"raw/stocks/{records[0].symbol}/{current_year}_full_historical.parquet"
-        )
+        # encode the Arrow table to parquet directly, no pandas round trip, sorted by
+        # (symbol, date) so readers can skip row groups; split at the target file size
+        parquet_files = encode_parquet(table, self.parquet_layout)
 
-        # creates an in-memory file-like object that handles binary data (bytes)
-        parquet_buffer = io.BytesIO()
-        # convert dataframe to parquet before load
-        df.to_parquet(parquet_buffer, index=False, engine="pyarrow")
-
-        self.s3_client.put_object(
-            Bucket=s3_bucket, Key=file_key, Body=parquet_buffer.getvalue()
-        )
+        for part, body in enumerate(parquet_files):
+            key = file_key
+            if len(parquet_files) > 1:
+                key = file_key.replace(".parquet", f"_part{part}.parquet")
+            self.s3_client.put_object(Bucket=s3_bucket, Key=key, Body=body)
 
 
 # --- MAIN EXECUTION FLOW ---
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest the historical window.")
+    parser.add_argument(
+        "--replay-run",
+        metavar="RUN_ID",
+        help="Upload the spooled batches of a failed run, without any API calls.",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Sample CPU stacks per stage into profiles/{run_id}/.",
+    )
+    parser.add_argument(
+        "--profile-allocations",
+        action="store_true",
+        help="With --profile, also trace allocation sites (tracemalloc, slower).",
+    )
+    args = parser.parse_args()
+
     # 1. LOAD ENVIRONMENT VARIABLES
     # We pull these from the .env file. If a variable is missing, os.getenv returns None.
     ALPHA_VANTAGE_API_KEY = os.getenv("ALPHA_VANTAGE_API_KEY")
@@ -167,11 +260,13 @@ if __name__ == "__main__":
     # 2. SYSTEM HEALTH CHECK (Fail Fast)
     # Check if any critical credentials are missing before starting the expensive API calls.
     required_vars = {
-        "API_KEY": ALPHA_VANTAGE_API_KEY,
         "S3_BUCKET": S3_BUCKET_DESTINATION,
         "AWS_KEY": AWS_ACCESS_KEY_ID,
         "AWS_SECRET": AWS_SECRET_ACCESS_KEY,
     }
+    if not args.replay_run:
+        # a replay only uploads, it never calls the API
+        required_vars["API_KEY"] = ALPHA_VANTAGE_API_KEY
 
     for var_name, value in required_vars.items():
         if not value:
@@ -182,55 +277,174 @@ if __name__ == "__main__":
 
     # 3. INITIALIZE EXTRACTOR
     # This sets up our S3 connection and API base URL.
+    # Optional backup source: a drop directory of {symbol}.parquet/.csv files that
+    # is hedged against Alpha Vantage when it throttles or is slow.
+    provider = None
+    BACKUP_DROP_DIR = os.getenv("STOCK_DATA_BACKUP_DROP_DIR")
+    if BACKUP_DROP_DIR:
+        provider = HedgedFetcher(
+            [
+                AlphaVantageProvider(api_key=ALPHA_VANTAGE_API_KEY, timeout=20),
+                LocalDropProvider(BACKUP_DROP_DIR),
+            ]
+        )
+
     extractor = StockExtractor(
         api_key=ALPHA_VANTAGE_API_KEY,
         aws_access_key=AWS_ACCESS_KEY_ID,
         aws_secret_key=AWS_SECRET_ACCESS_KEY,
         region=REGION_NAME,
+        provider=provider,
     )
 
-    # 4. EXECUTE PIPELINE
-    # We wrap the logic in a try-except block to handle errors gracefully.
-
-    # Expand additional tickers below
-    tickers = ["TSLA"]
-
-    # iterate over each ticker in the array
-    for ticker in tickers:
-        try:
-            logger.info(f"🚀 Starting ingestion pipeline for {ticker}...")
-            print(f"🚀 Starting ingestion pipeline for {ticker}...")  # for development
-
-            # Step A: Fetch Data
-            raw_json = extractor.fetch_year_to_date_history(symbol=ticker)
-
-            # Step B: Validate & Clean (7-day window)
-            # This converts messy API JSON into a list of clean Pydantic objects.
-            validated_records = extractor.validate_year_to_date_history(
-                symbol=ticker,
-                raw_data=raw_json,
-                start_date=start_date,
-                end_date=end_date,
-            )
-
-            # Step C: Upload to Bronze Layer (S3)
-            # This converts the list to Parquet and ships it to AWS.
-            extractor.upload_year_to_date_history_to_s3(
-                records=validated_records, s3_bucket=S3_BUCKET_DESTINATION
-            )
+    # Vectorized data quality checks run on every ticker before it leaves the worker
+    quality_engine = DataQualityEngine()
+    run_quality_report = RunQualityReport()
+
+    # Optional profiling: sampled stacks per stage (fetch, validate, upload...) and
+    # top allocation sites, written when the process exits (also on exit(1))
+    run_id = args.replay_run or new_run_id()
+    profiler = (
+        RunProfiler(run_id, trace_allocations=args.profile_allocations)
+        if args.profile
+        else NullProfiler()
+    )
+    profiler.start()
+    atexit.register(profiler.stop)
+
+    # Validated batches are spooled to a local Arrow IPC file before upload, so a
+    # failed upload can be resumed with --replay-run instead of re-spending API quota
+    fetch_failed = False
+    # tickers rejected by the data quality checks (too many quarantined rows, OHLC
+    # violations...), the other tickers of the run still go through
+    failed_tickers = []
+    if args.replay_run:
+        spool = ArrowSpool.open_existing(args.replay_run)
+        logger.info(f"🔁 Replaying uploads of run {spool.run_id}")
+        print(f"🔁 Replaying uploads of run {spool.run_id}")  # for development
+    else:
+        prune_completed_spools()
+        spool = ArrowSpool(run_id=run_id)
+
+        # Exact trading days of the window, capped at the latest session with a bar
+        trading_calendar = TradingCalendar()
+        window_end = min(
+            date.fromisoformat(end_date), trading_calendar.expected_latest_session()
+        )
+        expected_sessions = trading_calendar.sessions_in_range(
+            date.fromisoformat(start_date), window_end
+        )
+        expected_window = [d.astype(date) for d in expected_sessions]
+        if len(expected_sessions) == 0:
+            logger.info(f"⏭️ No trading days between {start_date} and {end_date}.")
+            print(f"⏭️ No trading days between {start_date} and {end_date}.")
+            exit(0)
+
+        # 4. EXECUTE PIPELINE
+        # We wrap the logic in a try-except block to handle errors gracefully.
+
+        # Expand additional tickers below
+        tickers = ["TSLA"]
+
+        # iterate over each ticker in the array
+        for ticker in tickers:
+            try:
+                logger.info(f"🚀 Starting ingestion pipeline for {ticker}...")
+                print(
+                    f"🚀 Starting ingestion pipeline for {ticker}..."
+                )  # for development
+
+                # fetch -> validate / quarantine -> data quality -> spool, no
+                # watermark check: a backfill re-ingests its whole window
+                report = extractor.ingest_ticker(
+                    ticker,
+                    S3_BUCKET_DESTINATION,
+                    run_id=spool.run_id,
+                    expected_dates=expected_window,
+                    quality_engine=quality_engine,
+                    spool=spool,
+                    profiler=profiler,
+                )
+                if report is not None:
+                    run_quality_report.add(report)
+                    if report.has_errors:
+                        failed_tickers.append(ticker)
+
+                if ticker != tickers[-1]:
+                    # pause for 15 sec before processing the next ticker to prevent throttle and API pull failure
+                    with profiler.stage("throttle_pause"):
+                        time.sleep(15)
+
+            except Exception as e:
+                logger.error(f"💥 Pipeline failed: {str(e)}")
+                print(f"💥 Pipeline failed: {str(e)}")  # for development
+                # stop fetching, but still upload what was already validated
+                fetch_failed = True
+                break
+
+        spool.close()
+        logger.info(run_quality_report.summary())
+        print(run_quality_report.summary())  # for development
+
+    # 5. UPLOAD TO BRONZE LAYER (S3)
+    # Replays the spool: each ticker's table comes straight from the memory map
+    # and is encoded to Parquet and shipped to AWS.
+    if spool.path.exists():
+        for ticker, table in spool.pending_batches():
+            try:
+                with profiler.stage("upload"):
+                    extractor.upload_table_to_s3(
+                        table, s3_bucket=S3_BUCKET_DESTINATION, run_date=spool.run_date
+                    )
+                spool.mark_uploaded(ticker)
+            except Exception as e:
+                logger.error(
+                    f"💥 Upload failed for {ticker}: {str(e)}. "
+                    f"Resume with --replay-run {spool.run_id}"
+                )
+                print(
+                    f"💥 Upload failed for {ticker}: {str(e)}. "
+                    f"Resume with --replay-run {spool.run_id}"
+                )  # for development
+                exit(1)
 
             logger.info(f"✅ Pipeline complete. Data for {ticker} is now in S3.")
             print(
                 f"✅ Pipeline complete. Data for {ticker} is now in S3."
             )  # for development
 
-            if ticker != tickers[-1]:
-                # pause for 15 sec before processing the next ticker to prevent throttle and API pull failure
-                time.sleep(15)
-            else:
-                print("✅ Finish processing all tickers")
-
+    # 6. OPTIONAL ICEBERG SINK
+    # The whole run is appended to an Iceberg table in one atomic commit, so
+    # downstream jobs read only the files added since their last snapshot instead
+    # of listing raw/. Catalog settings come from .pyiceberg.yaml / PYICEBERG_* vars.
+    ICEBERG_TABLE = os.getenv("STOCK_DATA_ICEBERG_TABLE")
+    if ICEBERG_TABLE and spool.path.exists():
+        try:
+            with profiler.stage("iceberg"):
+                sink = IcebergSink.from_config(
+                    os.getenv("STOCK_DATA_ICEBERG_CATALOG", "default"), ICEBERG_TABLE
+                )
+                sink.append_run(spool.run_id, (table for _, table in spool.batches()))
         except Exception as e:
-            logger.error(f"💥 Pipeline failed: {str(e)}")
-            print(f"💥 Pipeline failed: {str(e)}")  # for development
+            logger.error(
+                f"💥 Iceberg commit failed: {str(e)}. "
+                f"Resume with --replay-run {spool.run_id}"
+            )
+            print(
+                f"💥 Iceberg commit failed: {str(e)}. "
+                f"Resume with --replay-run {spool.run_id}"
+            )  # for development
             exit(1)
+
+    # Everything spooled is in S3 (and Iceberg), the spool is pruned by a later run
+    if spool.path.exists():
+        spool.mark_complete()
+
+    if failed_tickers:
+        logger.error(f"💥 Tickers failed data quality checks: {failed_tickers}")
+        print(
+            f"💥 Tickers failed data quality checks: {failed_tickers}"
+        )  # for development
+    if fetch_failed or failed_tickers:
+        exit(1)
+    print("✅ Finish processing all tickers")
@@ -1,19 +1,46 @@
+import argparse
+import atexit
 import os
-import io
 import logging
 import time
 from dotenv import load_dotenv
-import requests
 import boto3
-import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
 from pydantic import (
     BaseModel,
     Field,
     field_validator,
     ConfigDict,
+    ValidationError,
 )  # import pydantic for data validation and cleaning
 from typing import List
-from datetime import date, datetime
+from datetime import date
+
+from scripts.data_quality import (
+    DataQualityEngine,
+    RunQualityReport,
+    records_to_table,
+)
+from scripts.providers import (
+    AlphaVantageProvider,
+    HedgedFetcher,
+    LocalDropProvider,
+    StockDataProvider,
+)
+from scripts.ingestion_state import IngestionWatermarks
+from scripts.iceberg_sink import IcebergSink
+from scripts.parquet_layout import ParquetLayout, encode_parquet
+from scripts.profiling import NullProfiler, RunProfiler
+from scripts.quarantine import RowQuarantine
+from scripts.spool import (
+    ArrowSpool,
+    new_run_id,
+    prune_completed_spools,
+    with_ingested_at,
+)
+from scripts.ticker_ingestion import TickerIngestion
+from scripts.trading_calendar import TradingCalendar
 
 logger = logging.getLogger(__name__)
 
@@ -43,13 +70,28 @@ class DailyStockData(BaseModel):
         return v
 
 
-class StockExtractor:
+class StockExtractor(TickerIngestion):
     def __init__(
-        self, api_key: str, aws_access_key: str, aws_secret_key: str, region: str
+        self,
+        api_key: str,
+        aws_access_key: str,
+        aws_secret_key: str,
+        region: str,
+        provider: StockDataProvider | None = None,
+        parquet_layout: ParquetLayout | None = None,
     ):
         self.api_key = api_key
         self.base_url = "https://www.alphavantage.co/query"
 
+        # Data source behind the fetch methods, Alpha Vantage unless a (hedged)
+        # multi-provider fetcher is passed in
+        self.provider = provider or AlphaVantageProvider(
+            api_key=api_key, base_url=self.base_url, timeout=15
+        )
+
+        # Sort order, row groups, page index and bloom filters of the uploaded files
+        self.parquet_layout = parquet_layout or ParquetLayout()
+
         # Initialize the S3 Client using the credentials from the .env
         try:
             self.s3_client = boto3.client(
@@ -67,56 +109,79 @@ class StockExtractor:
 
     def fetch_past_7_days_daily_data(self, symbol: str) -> dict:
         """
-        Fetches raw daily stock data from the Alpha Vantage API.
+        Fetches raw daily stock data from the data provider (Alpha Vantage by default).
 
         Args:
             symbol (str): The stock ticker (e.g., 'AAPL').
 
         Returns:
-            dict: The raw JSON response from the API.
+            dict: The normalized "Time Series (Daily)" payload.
 
         Raises:
-            HTTPError: If the API returns a non-200 status code.
-            RemoteDisconnected: Handled via the custom headers and timeout.
+            ProviderError: If no provider could return data (HTTP errors, throttling,
+                timeouts or every circuit breaker open).
         """
-        params = {
-            "function": "TIME_SERIES_DAILY",
-            "symbol": symbol,
-            "outputsize": "compact",
-            "apikey": self.api_key,
-        }
-
-        # Industry Standard: Disguise the script as a browser to prevent
-        # the API server from dropping the connection.
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/91.0.4472.124"
-        }
-
-        # Timeout added to prevent the script from hanging if the server is slow
-        response = requests.get(
-            self.base_url, params=params, headers=headers, timeout=15
-        )
-        response.raise_for_status()
-        return response.json()
+        return self.provider.fetch_daily(symbol, outputsize="compact")
+
+    def fetch_window(self, symbol: str) -> dict:
+        return self.fetch_past_7_days_daily_data(symbol)
+
+    def fetch_corporate_actions(self, symbol: str) -> dict:
+        """
+        Fetches TIME_SERIES_DAILY_ADJUSTED (latest 100 sessions), the source of the
+        split coefficients and dividend amounts in scripts/corporate_actions.py.
+
+        Raises:
+            ProviderError: If no provider serves adjusted data for the symbol.
+        """
+        return self.provider.fetch_daily_adjusted(symbol, outputsize="compact")
 
     def validate_and_process_7_days(
-        self, symbol: str, raw_data: dict
+        self,
+        symbol: str,
+        raw_data: dict,
+        expected_dates: List[date] | None = None,
+        quarantine: RowQuarantine | None = None,
     ) -> List[DailyStockData]:
-        """Parses the last 7 available days from the API response."""
+        """
+        Parses the last 7 trading days from the API response.
+
+        Args:
+            symbol (str): The stock ticker (e.g., 'AAPL').
+            raw_data (dict): The raw JSON response from the API.
+            expected_dates (List[date] | None): Exact trading days of the window from
+                the trading calendar. Defaults to the 7 newest dates in the response.
+            quarantine (RowQuarantine | None): Collects rows that fail validation so
+                the good rows go on. Without it the first bad row raises.
+        """
         time_series = raw_data.get("Time Series (Daily)", {})
 
-        # 1. Get the sorted dates (newest first)
-        all_dates = sorted(time_series.keys(), reverse=True)
+        if expected_dates is not None:
+            # Keep only the calendar's trading days, missing ones are reported by
+            # the data quality checks instead of silently pulling in older bars
+            expected = {d.isoformat() for d in expected_dates}
+            latest_7_dates = sorted(
+                (d for d in time_series if d in expected), reverse=True
+            )
+        else:
+            # 1. Get the sorted dates (newest first)
+            all_dates = sorted(time_series.keys(), reverse=True)
 
-        # 2. Slice the first 7 dates
-        latest_7_dates = all_dates[:7]
+            # 2. Slice the first 7 dates
+            latest_7_dates = all_dates[:7]
 
         validated_records = []
 
         for date_str in latest_7_dates:
             metrics = time_series[date_str]
             # Validate each day using your Pydantic model
-            record = DailyStockData(symbol=symbol, date=date_str, **metrics)
+            try:
+                record = DailyStockData(symbol=symbol, date=date_str, **metrics)
+            except ValidationError as e:
+                if quarantine is None:
+                    raise
+                quarantine.add(date_str, metrics, e)
+                continue
             validated_records.append(record)
 
         logger.info(
@@ -127,38 +192,79 @@ class StockExtractor:
         )  # for development
         return validated_records
 
+    def validate_window(
+        self,
+        symbol: str,
+        raw_data: dict,
+        expected_dates: List[date],
+        quarantine: RowQuarantine,
+    ) -> List[DailyStockData]:
+        return self.validate_and_process_7_days(
+            symbol, raw_data, expected_dates=expected_dates, quarantine=quarantine
+        )
+
     def upload_7_days_to_s3(
         self, records: List[DailyStockData], s3_bucket: str | None = None
     ) -> None:
         """Converts the list of 7 records into a single Parquet file."""
 
-        # Convert list of Pydantic models to a list of dicts for Pandas
-        df = pd.DataFrame([r.model_dump() for r in records])
-        df["ingested_at"] = datetime.now()
-        # convert created_at to varchar and do the timestamp transformation in snowflake
-        df["ingested_at"] = df["ingested_at"].astype(str)
+        # Convert list of Pydantic models to a columnar Arrow table
+        table = with_ingested_at(records_to_table(records))
+        self.upload_table_to_s3(table, s3_bucket=s3_bucket)
 
-        # df.to_csv('final_data_test.csv')
+    def upload_table_to_s3(
+        self,
+        table: pa.Table,
+        s3_bucket: str | None = None,
+        run_date: date | None = None,
+    ) -> None:
+        """
+        Writes one ticker's Arrow table (e.g. straight from the spool) to S3.
 
-        # Use today's date in the filename for tracking and proper s3 bucket folder structure
-        current_date = date.today()
+        Args:
+            table (pa.Table): Validated rows of a single symbol, with ingested_at.
+            s3_bucket (str | None): Destination bucket.
+            run_date (date | None): Date of the run, so a replay writes the same key.
+        """
+        # Use the run's date in the filename for tracking and proper s3 bucket folder structure
+        current_date = run_date or date.today()
         current_year = current_date.year
         current_month = current_date.month
+        symbol = table["symbol"][0].as_py()
 
-        file_key = f"raw/stocks/{records[0].symbol}/{current_year}/{current_month}/{current_date}_7day_window.parquet"
+        file_key = f"raw/stocks/{symbol}/{current_year}/{current_month}/{current_date}_7day_window.parquet"
 
-        # creates an in-memory file-like object that handles binary data (bytes)
-        parquet_buffer = io.BytesIO()
-        # convert dataframe to parquet before load
-        df.to_parquet(parquet_buffer, index=False, engine="pyarrow")
+        # encode the Arrow table to parquet directly, no pandas round trip, sorted by
+        # (symbol, date) so readers can skip row groups; split at the target file size
+        parquet_files = encode_parquet(table, self.parquet_layout)
 
-        self.s3_client.put_object(
-            Bucket=s3_bucket, Key=file_key, Body=parquet_buffer.getvalue()
-        )
+        for part, body in enumerate(parquet_files):
+            key = file_key
+            if len(parquet_files) > 1:
+                key = file_key.replace(".parquet", f"_part{part}.parquet")
+            self.s3_client.put_object(Bucket=s3_bucket, Key=key, Body=body)
 
 
 # --- MAIN EXECUTION FLOW ---
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest the last 7 trading days.")
+    parser.add_argument(
+        "--replay-run",
+        metavar="RUN_ID",
+        help="Upload the spooled batches of a failed run, without any API calls.",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Sample CPU stacks per stage into profiles/{run_id}/.",
+    )
+    parser.add_argument(
+        "--profile-allocations",
+        action="store_true",
+        help="With --profile, also trace allocation sites (tracemalloc, slower).",
+    )
+    args = parser.parse_args()
+
     # 1. LOAD ENVIRONMENT VARIABLES
     # We pull these from the .env file. If a variable is missing, os.getenv returns None.
     ALPHA_VANTAGE_API_KEY = os.getenv("ALPHA_VANTAGE_API_KEY")
@@ -176,11 +282,13 @@ if __name__ == "__main__":
     # 2. SYSTEM HEALTH CHECK (Fail Fast)
     # Check if any critical credentials are missing before starting the expensive API calls.
     required_vars = {
-        "API_KEY": ALPHA_VANTAGE_API_KEY,
         "S3_BUCKET": S3_BUCKET_DESTINATION,
         "AWS_KEY": AWS_ACCESS_KEY_ID,
         "AWS_SECRET": AWS_SECRET_ACCESS_KEY,
     }
+    if not args.replay_run:
+        # a replay only uploads, it never calls the API
+        required_vars["API_KEY"] = ALPHA_VANTAGE_API_KEY
 
     for var_name, value in required_vars.items():
         if not value:
@@ -191,52 +299,172 @@ if __name__ == "__main__":
 
     # 3. INITIALIZE EXTRACTOR
     # This sets up our S3 connection and API base URL.
+    # Optional backup source: a drop directory of {symbol}.parquet/.csv files that
+    # is hedged against Alpha Vantage when it throttles or is slow.
+    provider = None
+    BACKUP_DROP_DIR = os.getenv("STOCK_DATA_BACKUP_DROP_DIR")
+    if BACKUP_DROP_DIR:
+        provider = HedgedFetcher(
+            [
+                AlphaVantageProvider(api_key=ALPHA_VANTAGE_API_KEY, timeout=15),
+                LocalDropProvider(BACKUP_DROP_DIR),
+            ]
+        )
+
     extractor = StockExtractor(
         api_key=ALPHA_VANTAGE_API_KEY,
         aws_access_key=AWS_ACCESS_KEY_ID,
         aws_secret_key=AWS_SECRET_ACCESS_KEY,
         region=REGION_NAME,
+        provider=provider,
     )
-
-    # 4. EXECUTE PIPELINE
-    # We wrap the logic in a try-except block to handle errors gracefully.
-
-    # Expand additional tickers below
-    tickers = ["AAPL", "MSFT", "GOOGL", "TSLA"]
-
-    # iterate over each ticker in the array
-    for ticker in tickers:
-        try:
-            logger.info(f"🚀 Starting ingestion pipeline for {ticker}...")
-            print(f"🚀 Starting ingestion pipeline for {ticker}...")  # for development
-
-            # Step A: Fetch Data
-            raw_json = extractor.fetch_past_7_days_daily_data(symbol=ticker)
-
-            # Step B: Validate & Clean (7-day window)
-            # This converts messy API JSON into a list of clean Pydantic objects.
-            validated_records = extractor.validate_and_process_7_days(
-                symbol=ticker, raw_data=raw_json
-            )
-
-            # Step C: Upload to Bronze Layer (S3)
-            # This converts the list to Parquet and ships it to AWS.
-            extractor.upload_7_days_to_s3(
-                records=validated_records, s3_bucket=S3_BUCKET_DESTINATION
-            )
+    watermarks = IngestionWatermarks(extractor.s3_client, S3_BUCKET_DESTINATION)
+
+    # Vectorized data quality checks run on every ticker before it leaves the worker
+    quality_engine = DataQualityEngine()
+    run_quality_report = RunQualityReport()
+
+    # Optional profiling: sampled stacks per stage (fetch, validate, upload...) and
+    # top allocation sites, written when the process exits (also on exit(1))
+    run_id = args.replay_run or new_run_id()
+    profiler = (
+        RunProfiler(run_id, trace_allocations=args.profile_allocations)
+        if args.profile
+        else NullProfiler()
+    )
+    profiler.start()
+    atexit.register(profiler.stop)
+
+    # Validated batches are spooled to a local Arrow IPC file before upload, so a
+    # failed upload can be resumed with --replay-run instead of re-spending API quota
+    fetch_failed = False
+    # tickers rejected by the data quality checks (too many quarantined rows, OHLC
+    # violations...), the other tickers of the run still go through
+    failed_tickers = []
+    if args.replay_run:
+        spool = ArrowSpool.open_existing(args.replay_run)
+        logger.info(f"🔁 Replaying uploads of run {spool.run_id}")
+        print(f"🔁 Replaying uploads of run {spool.run_id}")  # for development
+    else:
+        prune_completed_spools()
+        spool = ArrowSpool(run_id=run_id)
+
+        # Trading calendar: the exact 7 sessions we expect, and the latest one that
+        # should already have a bar (weekends and NYSE holidays never produce one)
+        trading_calendar = TradingCalendar()
+        expected_latest = trading_calendar.expected_latest_session()
+        expected_window = [
+            d.astype(date) for d in trading_calendar.last_n_sessions(7, expected_latest)
+        ]
+
+        # 4. EXECUTE PIPELINE
+        # We wrap the logic in a try-except block to handle errors gracefully.
+
+        # Expand additional tickers below
+        tickers = ["AAPL", "MSFT", "GOOGL", "TSLA"]
+
+        # iterate over each ticker in the array
+        for ticker in tickers:
+            try:
+                logger.info(f"🚀 Starting ingestion pipeline for {ticker}...")
+                print(
+                    f"🚀 Starting ingestion pipeline for {ticker}..."
+                )  # for development
+
+                # fetch -> validate / quarantine -> data quality -> spool
+                report = extractor.ingest_ticker(
+                    ticker,
+                    S3_BUCKET_DESTINATION,
+                    run_id=spool.run_id,
+                    expected_dates=expected_window,
+                    quality_engine=quality_engine,
+                    watermarks=watermarks,
+                    spool=spool,
+                    profiler=profiler,
+                )
+                if report is None:
+                    # up to date or no bars yet, no API call to pace
+                    continue
+                run_quality_report.add(report)
+                if report.has_errors:
+                    failed_tickers.append(ticker)
+
+                if ticker != tickers[-1]:
+                    # pause for 15 sec before processing the next ticker to prevent throttle and API pull failure
+                    with profiler.stage("throttle_pause"):
+                        time.sleep(15)
+
+            except Exception as e:
+                logger.error(f"💥 Pipeline failed: {str(e)}")
+                print(f"💥 Pipeline failed: {str(e)}")  # for development purposes
+                # stop fetching, but still upload what was already validated
+                fetch_failed = True
+                break
+
+        spool.close()
+        logger.info(run_quality_report.summary())
+        print(run_quality_report.summary())  # for development
+
+    # 5. UPLOAD TO BRONZE LAYER (S3)
+    # Replays the spool: each ticker's table comes straight from the memory map
+    # and is encoded to Parquet and shipped to AWS.
+    if spool.path.exists():
+        for ticker, table in spool.pending_batches():
+            try:
+                with profiler.stage("upload"):
+                    extractor.upload_table_to_s3(
+                        table, s3_bucket=S3_BUCKET_DESTINATION, run_date=spool.run_date
+                    )
+                spool.mark_uploaded(ticker)
+                watermarks.set(ticker, pc.max(table["date"]).as_py())
+            except Exception as e:
+                logger.error(
+                    f"💥 Upload failed for {ticker}: {str(e)}. "
+                    f"Resume with --replay-run {spool.run_id}"
+                )
+                print(
+                    f"💥 Upload failed for {ticker}: {str(e)}. "
+                    f"Resume with --replay-run {spool.run_id}"
+                )  # for development purposes
+                exit(1)
 
             logger.info(f"✅ Pipeline complete. Data for {ticker} is now in S3.")
             print(
                 f"✅ Pipeline complete. Data for {ticker} is now in S3."
             )  # for development
 
-            if ticker != tickers[-1]:
-                # pause for 15 sec before processing the next ticker to prevent throttle and API pull failure
-                time.sleep(15)
-            else:
-                print("✅ Finish processing all tickers")
-
+    # 6. OPTIONAL ICEBERG SINK
+    # The whole run is appended to an Iceberg table in one atomic commit, so
+    # downstream jobs read only the files added since their last snapshot instead
+    # of listing raw/. Catalog settings come from .pyiceberg.yaml / PYICEBERG_* vars.
+    ICEBERG_TABLE = os.getenv("STOCK_DATA_ICEBERG_TABLE")
+    if ICEBERG_TABLE and spool.path.exists():
+        try:
+            with profiler.stage("iceberg"):
+                sink = IcebergSink.from_config(
+                    os.getenv("STOCK_DATA_ICEBERG_CATALOG", "default"), ICEBERG_TABLE
+                )
+                sink.append_run(spool.run_id, (table for _, table in spool.batches()))
         except Exception as e:
-            logger.error(f"💥 Pipeline failed: {str(e)}")
-            print(f"💥 Pipeline failed: {str(e)}")  # for development purposes
+            logger.error(
+                f"💥 Iceberg commit failed: {str(e)}. "
+                f"Resume with --replay-run {spool.run_id}"
+            )
+            print(
+                f"💥 Iceberg commit failed: {str(e)}. "
+                f"Resume with --replay-run {spool.run_id}"
+            )  # for development
             exit(1)
+
+    # Everything spooled is in S3 (and Iceberg), the spool is pruned by a later run
+    if spool.path.exists():
+        spool.mark_complete()
+
+    if failed_tickers:
+        logger.error(f"💥 Tickers failed data quality checks: {failed_tickers}")
+        print(
+            f"💥 Tickers failed data quality checks: {failed_tickers}"
+        )  # for development
+    if fetch_failed or failed_tickers:
+        exit(1)
+    print("✅ Finish processing all tickers")
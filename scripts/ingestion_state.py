@@ -0,0 +1,53 @@
+import json
+import logging
+from datetime import date
+
+from botocore.exceptions import ClientError
+
+logger = logging.getLogger(__name__)
+
+# Kept outside of raw/ so the external stage never picks these files up
+WATERMARK_PREFIX = "state/watermarks"
+
+
+class IngestionWatermarks:
+    """
+    Tracks the latest trading day ingested per symbol in the S3 bucket.
+
+    The extractors compare the watermark with the trading calendar's expected latest
+    session and skip the API call entirely when nothing new can exist.
+    """
+
+    def __init__(self, s3_client, s3_bucket: str):
+        self.s3_client = s3_client
+        self.s3_bucket = s3_bucket
+
+    def _key(self, symbol: str) -> str:
+        return f"{WATERMARK_PREFIX}/{symbol}.json"
+
+    def get(self, symbol: str) -> date | None:
+        """Returns the latest ingested trading day for a symbol, None if never ingested."""
+        try:
+            response = self.s3_client.get_object(
+                Bucket=self.s3_bucket, Key=self._key(symbol)
+            )
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("NoSuchKey", "404"):
+                return None
+            raise
+        payload = json.loads(response["Body"].read())
+        return date.fromisoformat(payload["latest_trading_day"])
+
+    def set(self, symbol: str, latest_trading_day: date) -> None:
+        self.s3_client.put_object(
+            Bucket=self.s3_bucket,
+            Key=self._key(symbol),
+            Body=json.dumps(
+                {"symbol": symbol, "latest_trading_day": latest_trading_day.isoformat()}
+            ),
+        )
+
+    def is_up_to_date(self, symbol: str, expected_latest: date) -> bool:
+        """True when the symbol already holds the expected latest trading day."""
+        latest = self.get(symbol)
+        return latest is not None and latest >= expected_latest
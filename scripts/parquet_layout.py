@@ -0,0 +1,102 @@
+import inspect
+import io
+import logging
+from typing import List
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from pydantic import BaseModel, Field
+
+logger = logging.getLogger(__name__)
+
+# Physical sort order of every file, readers prune row groups on these columns
+SORT_KEYS = [("symbol", "ascending"), ("date", "ascending")]
+
+
+class ParquetLayout(BaseModel):
+    """Physical layout of the Parquet files written to S3."""
+
+    # rows per row group: ~4 years of one symbol's daily bars, so the min/max
+    # statistics of a row group are narrow enough to skip it on symbol or date
+    row_group_size: int = 1024
+    # a new file is started once the current one reaches this size
+    target_file_bytes: int = 128 * 1024 * 1024
+    compression: str = "snappy"
+    # column index / offset index per page, used by engines that prune pages
+    write_page_index: bool = True
+    # split block bloom filters for equality lookups (e.g. ["symbol"]), only
+    # written by pyarrow versions that support bloom_filter_options
+    bloom_filter_columns: List[str] = Field(default_factory=list)
+    bloom_filter_fpp: float = 0.01
+
+
+def supports_bloom_filters() -> bool:
+    return "bloom_filter_options" in inspect.signature(pq.write_table).parameters
+
+
+def _writer_options(table: pa.Table, layout: ParquetLayout) -> dict:
+    sort_keys = [key for key in SORT_KEYS if key[0] in table.column_names]
+    options = {
+        "compression": layout.compression,
+        "write_statistics": True,
+        "write_page_index": layout.write_page_index,
+        "sorting_columns": pq.SortingColumn.from_ordering(table.schema, sort_keys),
+    }
+    if layout.bloom_filter_columns:
+        if supports_bloom_filters():
+            options["bloom_filter_options"] = {
+                column: {
+                    "ndv": max(1, pc.count_distinct(table[column]).as_py()),
+                    "fpp": layout.bloom_filter_fpp,
+                }
+                for column in layout.bloom_filter_columns
+            }
+        else:
+            logger.warning(
+                f"⚠️ pyarrow {pa.__version__} cannot write bloom filters, "
+                f"skipping them for {layout.bloom_filter_columns}"
+            )
+    return options
+
+
+def encode_parquet(table: pa.Table, layout: ParquetLayout | None = None) -> List[bytes]:
+    """
+    Encodes a table into one or more Parquet files with the query-friendly layout.
+
+    Rows are sorted by (symbol, date) and written in bounded row groups with column
+    statistics, page index and optional bloom filters, so selective readers only
+    fetch the row groups (or pages) that can match. A new file is started whenever
+    the current one reaches `target_file_bytes`.
+
+    Args:
+        table (pa.Table): Rows to encode, e.g. one ticker batch from the spool.
+        layout (ParquetLayout | None): Layout settings, defaults to ParquetLayout().
+
+    Returns:
+        List[bytes]: The encoded files, at least one (even for an empty table).
+    """
+    layout = layout or ParquetLayout()
+    table = table.sort_by([key for key in SORT_KEYS if key[0] in table.column_names])
+    options = _writer_options(table, layout)
+
+    files = []
+    sink = None
+    writer = None
+    for offset in range(0, max(table.num_rows, 1), layout.row_group_size):
+        if writer is None:
+            sink = io.BytesIO()
+            writer = pq.ParquetWriter(sink, table.schema, **options)
+        # one write per row group, so the file size is known after each of them
+        writer.write_table(
+            table.slice(offset, layout.row_group_size),
+            row_group_size=layout.row_group_size,
+        )
+        if sink.tell() >= layout.target_file_bytes:
+            writer.close()
+            files.append(sink.getvalue())
+            writer = None
+    if writer is not None:
+        writer.close()
+        files.append(sink.getvalue())
+    return files
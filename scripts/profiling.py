@@ -0,0 +1,211 @@
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator
+
+logger = logging.getLogger(__name__)
+
+# Where --profile writes its output, override with STOCK_DATA_PROFILE_DIR
+DEFAULT_PROFILE_DIR = Path(os.getenv("STOCK_DATA_PROFILE_DIR", "profiles"))
+
+# Samples taken before the first stage starts are attributed to this stage
+DEFAULT_STAGE = "setup"
+
+
+class NullProfiler:
+    """Stand-in used when --profile is off, every stage is a no-op."""
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        yield
+
+    def start(self) -> None:
+        pass
+
+    def stop(self) -> None:
+        pass
+
+
+class RunProfiler:
+    """
+    Sampling CPU profiler plus optional tracemalloc allocation tracking for one run.
+
+    A daemon thread wakes up every `interval` seconds and records the stack of every
+    other thread that used CPU since the previous sample (per-thread CPU clocks),
+    attributed to the stage the run is in (fetch, validate, upload...). Threads
+    blocked in a sleep, a lock or a socket read (the idle hedged-fetch pool, the
+    throttle pause) are not sampled; stage wall time is in stages.json. With
+    `wall_clock=True`, or where per-thread CPU clocks are unavailable, every thread
+    is sampled, i.e. the folded stacks are wall-clock samples.
+
+    Nothing is hooked into the profiled code, so the CPU overhead is the sampling
+    rate; tracemalloc is the expensive part and is off unless trace_allocations.
+
+    Output in `{profile_dir}/{run_id}/`:
+        {stage}.folded    collapsed stacks, feed to flamegraph.pl or speedscope
+        all.folded        every stage, with the stage as the root frame
+        allocations.txt   top allocation sites (file:line) still alive at the end
+        stages.json       wall time, samples and net allocated bytes per stage
+    """
+
+    def __init__(
+        self,
+        run_id: str,
+        profile_dir: Path | str = DEFAULT_PROFILE_DIR,
+        interval: float = 0.01,
+        trace_allocations: bool = True,
+        top_allocations: int = 25,
+        wall_clock: bool = False,
+    ):
+        self.run_dir = Path(profile_dir) / run_id
+        self.interval = interval
+        self.trace_allocations = trace_allocations
+        self.cpu_only = not wall_clock and hasattr(time, "pthread_getcpuclockid")
+        self.top_allocations = top_allocations
+
+        self.current_stage = DEFAULT_STAGE
+        self.samples: Dict[str, Counter] = defaultdict(Counter)
+        self.stage_stats: Dict[str, dict] = defaultdict(
+            lambda: {"calls": 0, "wall_seconds": 0.0, "allocated_bytes": 0}
+        )
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @staticmethod
+    def _thread_cpu_seconds(thread_id: int) -> float | None:
+        try:
+            return time.clock_gettime(time.pthread_getcpuclockid(thread_id))
+        except OSError:
+            # the thread exited since the frames were taken
+            return None
+
+    def _sample_loop(self) -> None:
+        own_id = threading.get_ident()
+        names = {}
+        cpu_seen: Dict[int, float] = {}
+        while not self._stop.wait(self.interval):
+            stage = self.current_stage
+            frames = sys._current_frames()
+            if len(names) != threading.active_count():
+                names = {t.ident: t.name for t in threading.enumerate()}
+            for thread_id, frame in frames.items():
+                if thread_id == own_id:
+                    continue
+                if self.cpu_only:
+                    cpu = self._thread_cpu_seconds(thread_id)
+                    previous = cpu_seen.get(thread_id, cpu)
+                    cpu_seen[thread_id] = cpu
+                    # idle since the last sample: waiting, not working
+                    if cpu is None or previous is None or cpu <= previous:
+                        continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(
+                        f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})"
+                    )
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                with self._lock:
+                    self.samples[stage][";".join(reversed(stack))] += 1
+
+    def start(self) -> None:
+        if self.trace_allocations:
+            # one frame per allocation keeps tracemalloc's overhead as low as it gets
+            tracemalloc.start(1)
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._sample_loop, name="run-profiler", daemon=True
+        )
+        self._thread.start()
+        logger.info(f"🔬 Profiling run into {self.run_dir}")
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        snapshot = tracemalloc.take_snapshot() if tracemalloc.is_tracing() else None
+        if self.trace_allocations:
+            tracemalloc.stop()
+        self._write(snapshot)
+
+    def __enter__(self) -> "RunProfiler":
+        self.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Attributes the samples and allocations of the block to a named stage."""
+        previous = self.current_stage
+        self.current_stage = name
+        allocated_before = (
+            tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else 0
+        )
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            stats = self.stage_stats[name]
+            stats["calls"] += 1
+            stats["wall_seconds"] += time.perf_counter() - start
+            if tracemalloc.is_tracing():
+                stats["allocated_bytes"] += (
+                    tracemalloc.get_traced_memory()[0] - allocated_before
+                )
+            self.current_stage = previous
+
+    def _write(self, snapshot: tracemalloc.Snapshot | None) -> None:
+        self.run_dir.mkdir(parents=True, exist_ok=True)
+
+        with self._lock:
+            samples = {stage: dict(stacks) for stage, stacks in self.samples.items()}
+
+        with open(self.run_dir / "all.folded", "w") as all_folded:
+            for stage, stacks in samples.items():
+                with open(self.run_dir / f"{stage}.folded", "w") as folded:
+                    for stack, count in stacks.items():
+                        folded.write(f"{stack} {count}\n")
+                        all_folded.write(f"{stage};{stack} {count}\n")
+
+        summary = {
+            stage: {**self.stage_stats.get(stage, {}), "samples": 0}
+            for stage in set(samples) | set(self.stage_stats)
+        }
+        for stage, stacks in samples.items():
+            summary[stage]["samples"] = sum(stacks.values())
+        with open(self.run_dir / "stages.json", "w") as f:
+            json.dump(
+                {
+                    "interval_seconds": self.interval,
+                    "sampling": "cpu" if self.cpu_only else "wall_clock",
+                    "stages": summary,
+                },
+                f,
+                indent=2,
+            )
+
+        if snapshot is not None:
+            snapshot = snapshot.filter_traces(
+                [tracemalloc.Filter(False, tracemalloc.__file__)]
+            )
+            with open(self.run_dir / "allocations.txt", "w") as f:
+                for stat in snapshot.statistics("lineno")[: self.top_allocations]:
+                    frame = stat.traceback[0]
+                    f.write(
+                        f"{stat.size / 1024:10.1f} KiB {stat.count:8d} blocks  "
+                        f"{frame.filename}:{frame.lineno}\n"
+                    )
+
+        logger.info(f"🔬 Profile written to {self.run_dir}")
+        print(f"🔬 Profile written to {self.run_dir}")  # for development
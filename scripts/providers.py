@@ -0,0 +1,360 @@
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+import requests
+
+logger = logging.getLogger(__name__)
+
+# Every provider normalizes into the Alpha Vantage daily layout, which is exactly
+# what DailyStockData validates (the "1. open" ... "5. volume" aliases)
+TIME_SERIES_KEY = "Time Series (Daily)"
+FIELD_ALIASES = {
+    "open_price": "1. open",
+    "high_price": "2. high",
+    "low_price": "3. low",
+    "close_price": "4. close",
+    "volume": "5. volume",
+}
+
+
+class ProviderError(Exception):
+    """Raised when a provider cannot return data for a symbol."""
+
+
+class ProviderThrottledError(ProviderError):
+    """Raised when a provider rejects the call because of rate limits."""
+
+
+class CircuitOpenError(ProviderError):
+    """Raised when every provider's circuit breaker is open."""
+
+
+class StockDataProvider(ABC):
+    """
+    Base class for a daily OHLCV source.
+
+    Implementations return the normalized payload:
+        {"Time Series (Daily)": {"2026-01-10": {"1. open": ..., "5. volume": ...}}}
+    """
+
+    name = "provider"
+
+    @abstractmethod
+    def fetch_daily(self, symbol: str, outputsize: str = "compact") -> dict:
+        """Daily bars of the symbol in the normalized payload."""
+
+    def fetch_daily_adjusted(self, symbol: str, outputsize: str = "compact") -> dict:
+        """
+        Daily bars with the corporate-action columns of TIME_SERIES_DAILY_ADJUSTED
+        ("5. adjusted close", "6. volume", "7. dividend amount", "8. split coefficient").
+        """
+        raise ProviderError(f"{self.name} does not serve adjusted data")
+
+
+class AlphaVantageProvider(StockDataProvider):
+    """TIME_SERIES_DAILY from Alpha Vantage (or any server speaking its API)."""
+
+    def __init__(
+        self,
+        api_key: str,
+        base_url: str = "https://www.alphavantage.co/query",
+        timeout: float = 15,
+        name: str = "alpha_vantage",
+    ):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.timeout = timeout
+        self.name = name
+
+    def fetch_daily(self, symbol: str, outputsize: str = "compact") -> dict:
+        return self._query("TIME_SERIES_DAILY", symbol, outputsize)
+
+    def fetch_daily_adjusted(self, symbol: str, outputsize: str = "compact") -> dict:
+        return self._query("TIME_SERIES_DAILY_ADJUSTED", symbol, outputsize)
+
+    def _query(self, function: str, symbol: str, outputsize: str) -> dict:
+        params = {
+            "function": function,
+            "symbol": symbol,
+            "outputsize": outputsize,
+            "apikey": self.api_key,
+        }
+
+        # Industry Standard: Disguise the script as a browser to prevent
+        # the API server from dropping the connection.
+        headers = {
+            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/91.0.4472.124"
+        }
+
+        try:
+            response = requests.get(
+                self.base_url, params=params, headers=headers, timeout=self.timeout
+            )
+            response.raise_for_status()
+            payload = response.json()
+        except (requests.RequestException, ValueError) as e:
+            raise ProviderError(f"{self.name} failed for {symbol}: {e}") from e
+
+        # Alpha Vantage answers throttled calls with HTTP 200 and a "Note"/"Information"
+        if TIME_SERIES_KEY not in payload:
+            message = payload.get("Note") or payload.get("Information") or payload
+            raise ProviderThrottledError(f"{self.name} returned no data: {message}")
+        return payload
+
+
+class LocalDropProvider(StockDataProvider):
+    """
+    Reads `{symbol}.parquet` or `{symbol}.csv` files from a drop directory.
+
+    Columns may use the DailyStockData names (open_price, ...) or the plain vendor
+    names (open, high, low, close, volume) next to a `date` column.
+    """
+
+    def __init__(self, drop_dir: Path | str, name: str = "local_drop"):
+        self.drop_dir = Path(drop_dir)
+        self.name = name
+
+    def fetch_daily(self, symbol: str, outputsize: str = "compact") -> dict:
+        parquet_path = self.drop_dir / f"{symbol}.parquet"
+        csv_path = self.drop_dir / f"{symbol}.csv"
+        try:
+            if parquet_path.exists():
+                table = pq.read_table(parquet_path)
+            elif csv_path.exists():
+                table = pacsv.read_csv(csv_path)
+            else:
+                raise ProviderError(f"{self.name} has no file for {symbol}")
+        except (pa.ArrowException, OSError) as e:
+            raise ProviderError(f"{self.name} cannot read {symbol}: {e}") from e
+
+        if "date" not in table.column_names:
+            raise ProviderError(f"{self.name} file for {symbol} misses date")
+        columns = {}
+        for field, alias in FIELD_ALIASES.items():
+            plain = field.removesuffix("_price")
+            source = field if field in table.column_names else plain
+            if source not in table.column_names:
+                raise ProviderError(f"{self.name} file for {symbol} misses {field}")
+            columns[alias] = table[source].to_pylist()
+
+        dates = [str(d) for d in table["date"].to_pylist()]
+        time_series = {
+            d: {alias: str(values[i]) for alias, values in columns.items()}
+            for i, d in enumerate(dates)
+        }
+        if outputsize == "compact":
+            # same contract as Alpha Vantage: latest 100 data points
+            time_series = dict(sorted(time_series.items(), reverse=True)[:100])
+        return {TIME_SERIES_KEY: time_series}
+
+
+class CircuitBreaker:
+    """
+    Stops calling a provider after consecutive failures.
+
+    closed -> open after `failure_threshold` failures; once `reset_seconds` passed a
+    single trial call is let through (half-open) and its outcome closes or re-opens.
+    Every call let through by allow() must report record_success / record_failure.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = 3,
+        reset_seconds: float = 60,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.clock = clock
+        self.failures = 0
+        self.opened_at: float | None = None
+        # the half-open trial call is out, further calls wait for its outcome
+        self.trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if self.clock() - self.opened_at >= self.reset_seconds:
+            return "half-open"
+        return "open"
+
+    def available(self) -> bool:
+        """Whether allow() could let a call through now, without claiming it."""
+        state = self.state
+        return state == "closed" or (state == "half-open" and not self.trial_in_flight)
+
+    def allow(self) -> bool:
+        """Lets a call through; when half-open, only the first one until it reports."""
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "open" or self.trial_in_flight:
+                return False
+            self.trial_in_flight = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.trial_in_flight = False
+            self.failures += 1
+            if self.failures >= self.failure_threshold or self.opened_at is not None:
+                self.opened_at = self.clock()
+
+
+class LatencyTracker:
+    """Rolling window of successful call latencies, used for the hedge deadline."""
+
+    def __init__(
+        self, window: int = 100, min_samples: int = 20, default_deadline: float = 5.0
+    ):
+        self.samples: deque = deque(maxlen=window)
+        self.min_samples = min_samples
+        self.default_deadline = default_deadline
+
+    def record(self, seconds: float) -> None:
+        self.samples.append(seconds)
+
+    def p95(self) -> float:
+        """95th percentile latency, the default deadline until enough samples exist."""
+        if len(self.samples) < self.min_samples:
+            return self.default_deadline
+        return float(np.percentile(self.samples, 95))
+
+
+class HedgedFetcher(StockDataProvider):
+    """
+    Fetches from an ordered list of providers with hedging and failover.
+
+    The first healthy provider is called; if it has not answered by its p95 latency,
+    the next provider is fired as a hedge and the first answer wins. Failures move on
+    to the next provider immediately, and each provider has its own circuit breaker.
+    """
+
+    name = "hedged"
+
+    def __init__(
+        self,
+        providers: List[StockDataProvider],
+        hedge_after: float = 5.0,
+        min_samples: int = 20,
+        failure_threshold: int = 3,
+        reset_seconds: float = 60,
+    ):
+        self.providers = providers
+        self.breakers: Dict[str, CircuitBreaker] = {
+            p.name: CircuitBreaker(failure_threshold, reset_seconds) for p in providers
+        }
+        self.latencies: Dict[str, LatencyTracker] = {
+            p.name: LatencyTracker(
+                min_samples=min_samples, default_deadline=hedge_after
+            )
+            for p in providers
+        }
+        # losing hedges keep running in the background, leave room for them
+        self.executor = ThreadPoolExecutor(
+            max_workers=2 * len(providers), thread_name_prefix="hedged-fetch"
+        )
+
+    def _call(self, provider: StockDataProvider, symbol: str, outputsize: str) -> dict:
+        start = time.perf_counter()
+        try:
+            payload = provider.fetch_daily(symbol, outputsize)
+        except Exception as e:
+            # any failure counts against the breaker and fails over, not just the
+            # ProviderErrors a well-behaved provider raises
+            self.breakers[provider.name].record_failure()
+            if isinstance(e, ProviderError):
+                raise
+            raise ProviderError(f"{provider.name} failed for {symbol}: {e!r}") from e
+        self.latencies[provider.name].record(time.perf_counter() - start)
+        self.breakers[provider.name].record_success()
+        return payload
+
+    def fetch_daily(self, symbol: str, outputsize: str = "compact") -> dict:
+        remaining = [p for p in self.providers if self.breakers[p.name].available()]
+
+        errors: List[ProviderError] = []
+        in_flight = {}
+
+        def launch_next() -> StockDataProvider | None:
+            # the breaker is asked at launch time, so a half-open provider only
+            # gets its single trial call when it is actually called
+            while remaining:
+                provider = remaining.pop(0)
+                if self.breakers[provider.name].allow():
+                    future = self.executor.submit(
+                        self._call, provider, symbol, outputsize
+                    )
+                    in_flight[future] = provider
+                    return provider
+            return None
+
+        first = last_launched = launch_next()
+        if first is None:
+            raise CircuitOpenError(f"Every provider circuit is open for {symbol}")
+
+        while in_flight:
+            # wait for an answer, but only up to the hedge deadline if a backup is left
+            timeout = self.latencies[last_launched.name].p95() if remaining else None
+            done, _ = wait(
+                list(in_flight), timeout=timeout, return_when=FIRST_COMPLETED
+            )
+
+            if not done:
+                hedge = launch_next()
+                if hedge is not None:
+                    last_launched = hedge
+                    logger.info(f"⏱️ Hedging {symbol} to {hedge.name}")
+                continue
+
+            for future in done:
+                provider = in_flight.pop(future)
+                try:
+                    payload = future.result()
+                except ProviderError as e:
+                    logger.warning(f"⚠️ {provider.name} failed for {symbol}: {e}")
+                    errors.append(e)
+                    continue
+                if provider is not first:
+                    logger.info(f"🔀 {symbol} served by {provider.name}")
+                return payload
+
+            # every in-flight call failed: fail over right away
+            if not in_flight:
+                last_launched = launch_next() or last_launched
+
+        raise ProviderError(f"All providers failed for {symbol}: {errors}")
+
+    def fetch_daily_adjusted(self, symbol: str, outputsize: str = "compact") -> dict:
+        # corporate actions are not latency critical: plain failover, no hedging,
+        # and no breaker accounting (so no half-open trial is claimed here)
+        errors: List[ProviderError] = []
+        for provider in self.providers:
+            if not self.breakers[provider.name].available():
+                continue
+            try:
+                return provider.fetch_daily_adjusted(symbol, outputsize)
+            except ProviderError as e:
+                errors.append(e)
+        raise ProviderError(
+            f"No provider returned adjusted data for {symbol}: {errors}"
+        )
@@ -0,0 +1,107 @@
+import io
+import json
+import logging
+from datetime import date, datetime
+from typing import List
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from pydantic import BaseModel, ValidationError
+
+logger = logging.getLogger(__name__)
+
+# Rejected rows live next to raw/ but outside of it, so the external stage and
+# COPY INTO never pick them up
+QUARANTINE_PREFIX = "quarantine/stocks"
+
+
+class QuarantinedRow(BaseModel):
+    """One API row that failed DailyStockData validation, kept as received."""
+
+    symbol: str
+    date: str
+    # the row exactly as the provider sent it, JSON encoded
+    raw_payload: str
+    error: str
+
+
+def format_error(error: Exception) -> str:
+    """Short one-line reason, e.g. "1. open: Value error, Stock prices must be ..."."""
+    if isinstance(error, ValidationError):
+        return "; ".join(
+            f"{'.'.join(str(part) for part in e['loc'])}: {e['msg']}"
+            for e in error.errors()
+        )
+    return str(error)
+
+
+class RowQuarantine:
+    """
+    Collects the rows of one ticker that failed validation, so the good rows of
+    the batch can still be loaded. Whether the ticker as a whole is still usable
+    is decided by the data quality engine from the quarantined share of rows.
+    """
+
+    def __init__(self, symbol: str):
+        self.symbol = symbol
+        self.rows: List[QuarantinedRow] = []
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    @property
+    def dates(self) -> List[str]:
+        return [row.date for row in self.rows]
+
+    def add(self, date_str: str, payload: dict, error: Exception) -> None:
+        row = QuarantinedRow(
+            symbol=self.symbol,
+            date=date_str,
+            raw_payload=json.dumps(payload, default=str),
+            error=format_error(error),
+        )
+        self.rows.append(row)
+        logger.warning(f"⚠️ Quarantined {self.symbol} {date_str}: {row.error}")
+
+    def to_table(self, quarantined_at: datetime | None = None) -> pa.Table:
+        quarantined_at = str(quarantined_at or datetime.now())
+        table = pa.Table.from_pylist(
+            [row.model_dump() for row in self.rows],
+            schema=pa.schema(
+                [(name, pa.string()) for name in QuarantinedRow.model_fields]
+            ),
+        )
+        return table.append_column(
+            "quarantined_at", pa.array([quarantined_at] * len(self.rows), pa.string())
+        )
+
+    def upload_to_s3(
+        self,
+        s3_client,
+        s3_bucket: str,
+        run_id: str,
+        run_date: date | None = None,
+    ) -> str | None:
+        """
+        Writes the quarantined rows as one Parquet file per ticker and run.
+
+        Returns:
+            str | None: The S3 key, None when nothing was quarantined.
+        """
+        if not self.rows:
+            return None
+        run_date = run_date or date.today()
+        file_key = (
+            f"{QUARANTINE_PREFIX}/{self.symbol}/{run_date.year}/{run_date.month}/"
+            f"{run_date}_{run_id}.parquet"
+        )
+
+        parquet_buffer = io.BytesIO()
+        pq.write_table(self.to_table(), parquet_buffer)
+        s3_client.put_object(
+            Bucket=s3_bucket, Key=file_key, Body=parquet_buffer.getvalue()
+        )
+        logger.info(
+            f"🧪 Quarantined {len(self.rows)} row(s) of {self.symbol} to {file_key}"
+        )
+        return file_key
@@ -0,0 +1,367 @@
+import argparse
+import json
+import logging
+import os
+import socket
+import time
+import uuid
+from datetime import date
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import pandas as pd
+from botocore.exceptions import ClientError
+from pydantic import BaseModel, Field
+
+logger = logging.getLogger(__name__)
+
+# The Fortune 50 dbt seed doubles as the default ticker universe
+DEFAULT_UNIVERSE_CSV = (
+    Path(__file__).resolve().parent.parent
+    / "dbt_snowflake_pipeline"
+    / "seeds"
+    / "fortune_50_companies_jan_2026.csv"
+)
+
+# Run coordination objects live outside of raw/ so the external stage ignores them
+RUNS_PREFIX = "state/runs"
+
+
+class LeaseLostError(Exception):
+    """Raised when a worker no longer owns the shard it is processing."""
+
+
+class Lease(BaseModel):
+    """A worker's claim on one shard, stored as a JSON object in S3."""
+
+    shard_id: int
+    worker_id: str
+    expires_at: float
+    # tickers already processed, so a takeover resumes instead of starting over
+    completed: List[str] = Field(default_factory=list)
+    # tickers whose processing raised, with the error, skipped by a takeover too
+    failed: Dict[str, str] = Field(default_factory=dict)
+    # S3 ETag of the lease object, used for the conditional writes
+    etag: str | None = Field(default=None, exclude=True)
+
+
+def load_ticker_universe(csv_path: Path | str = DEFAULT_UNIVERSE_CSV) -> List[str]:
+    """Reads the ticker universe from the seed CSV (skips private companies)."""
+    df = pd.read_csv(csv_path)
+    tickers = df["stock_ticker"].dropna().astype(str).str.strip()
+    return sorted(t for t in tickers.unique() if t and t != "N/A")
+
+
+def make_shards(tickers: List[str], num_shards: int) -> List[List[str]]:
+    """Splits the tickers into num_shards deterministic, roughly even shards."""
+    ordered = sorted(set(tickers))
+    num_shards = max(1, min(num_shards, len(ordered)))
+    return [ordered[i::num_shards] for i in range(num_shards)]
+
+
+class ShardLeaseManager:
+    """
+    Claims shards of a run through conditional-write lease objects in S3.
+
+    Every write is guarded by `If-None-Match: *` (create only) or `If-Match: <etag>`
+    (replace only what we last saw), so S3 arbitrates between workers on different
+    nodes without any other coordination service:
+
+        state/runs/{run_id}/plan.json             shard -> tickers, first writer wins
+        state/runs/{run_id}/leases/shard-N.json   current owner and expiry
+        state/runs/{run_id}/done/shard-N.json     shard finished, never re-claimed
+    """
+
+    def __init__(
+        self,
+        s3_client,
+        s3_bucket: str,
+        run_id: str,
+        worker_id: str,
+        lease_seconds: float = 300,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.s3_client = s3_client
+        self.s3_bucket = s3_bucket
+        self.prefix = f"{RUNS_PREFIX}/{run_id}"
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+        self.clock = clock
+
+    def _lease_key(self, shard_id: int) -> str:
+        return f"{self.prefix}/leases/shard-{shard_id}.json"
+
+    def _done_key(self, shard_id: int) -> str:
+        return f"{self.prefix}/done/shard-{shard_id}.json"
+
+    def _conditional_put(self, key: str, body: dict, **condition) -> str | None:
+        """Writes the object if the condition holds, returns the new ETag or None."""
+        try:
+            response = self.s3_client.put_object(
+                Bucket=self.s3_bucket, Key=key, Body=json.dumps(body), **condition
+            )
+        except ClientError as e:
+            # NoSuchKey: an If-Match write on a lease that was already released
+            if e.response["Error"]["Code"] in (
+                "PreconditionFailed",
+                "ConditionalRequestConflict",
+                "NoSuchKey",
+            ):
+                return None
+            raise
+        return response["ETag"]
+
+    def _get(self, key: str) -> tuple[dict, str] | None:
+        try:
+            response = self.s3_client.get_object(Bucket=self.s3_bucket, Key=key)
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("NoSuchKey", "404"):
+                return None
+            raise
+        return json.loads(response["Body"].read()), response["ETag"]
+
+    def publish_plan(self, shards: List[List[str]]) -> List[List[str]]:
+        """
+        Stores the shard plan for the run, or returns the plan another worker
+        already stored, so every worker agrees on which ticker is in which shard.
+        """
+        key = f"{self.prefix}/plan.json"
+        self._conditional_put(key, {"shards": shards}, IfNoneMatch="*")
+        plan, _ = self._get(key)
+        return plan["shards"]
+
+    def is_done(self, shard_id: int) -> bool:
+        return self._get(self._done_key(shard_id)) is not None
+
+    def try_acquire(self, shard_id: int) -> Lease | None:
+        """Claims a free shard or takes over an expired lease, None if not possible."""
+        if self.is_done(shard_id):
+            return None
+
+        lease = Lease(
+            shard_id=shard_id,
+            worker_id=self.worker_id,
+            expires_at=self.clock() + self.lease_seconds,
+        )
+        etag = self._conditional_put(
+            self._lease_key(shard_id), lease.model_dump(), IfNoneMatch="*"
+        )
+        if etag is None:
+            current = self._get(self._lease_key(shard_id))
+            if current is None:
+                # the owner just completed and deleted its lease
+                return None
+            body, current_etag = current
+            previous = Lease(**body)
+            if previous.expires_at > self.clock():
+                return None
+            # expired: take it over, keeping track of what the dead worker finished
+            lease.completed = previous.completed
+            lease.failed = previous.failed
+            etag = self._conditional_put(
+                self._lease_key(shard_id), lease.model_dump(), IfMatch=current_etag
+            )
+            if etag is None:
+                return None
+            logger.warning(
+                f"⚠️ {self.worker_id} took over shard {shard_id} from "
+                f"{previous.worker_id} (lease expired)"
+            )
+
+        lease.etag = etag
+
+        # the previous owner may have finished and released the lease between our
+        # first done check and the create, its done marker is written before release
+        if self.is_done(shard_id):
+            self.s3_client.delete_object(
+                Bucket=self.s3_bucket, Key=self._lease_key(shard_id)
+            )
+            return None
+        return lease
+
+    def renew(self, lease: Lease) -> Lease:
+        """Extends the lease (and records progress), raises if it was taken over."""
+        lease.expires_at = self.clock() + self.lease_seconds
+        etag = self._conditional_put(
+            self._lease_key(lease.shard_id), lease.model_dump(), IfMatch=lease.etag
+        )
+        if etag is None:
+            raise LeaseLostError(
+                f"{self.worker_id} lost the lease on shard {lease.shard_id}"
+            )
+        lease.etag = etag
+        return lease
+
+    def complete(self, lease: Lease) -> None:
+        """Marks the shard as done and releases the lease."""
+        self.renew(lease)
+        self._conditional_put(
+            self._done_key(lease.shard_id), lease.model_dump(), IfNoneMatch="*"
+        )
+        self.s3_client.delete_object(
+            Bucket=self.s3_bucket, Key=self._lease_key(lease.shard_id)
+        )
+
+
+class ShardedRunner:
+    """
+    Processes the shards of a run on one worker; start as many workers as needed.
+
+    Each worker walks the shard list starting at its own offset, claims whatever is
+    free, and renews its lease before every ticker. A worker that stalls past its
+    lease loses the shard at the next renewal, so a symbol is only processed by the
+    current lease owner. Lease time must therefore exceed the time of one ticker.
+
+    A ticker whose processing raises is recorded in the lease (and so in the done
+    marker) and the shard moves on, so one bad symbol cannot keep a shard leased
+    and kill every worker that takes it over.
+    """
+
+    def __init__(
+        self,
+        lease_manager: ShardLeaseManager,
+        shards: List[List[str]],
+        process_ticker: Callable[[str], None],
+        poll_seconds: float = 30,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.lease_manager = lease_manager
+        self.shards = lease_manager.publish_plan(shards)
+        self.process_ticker = process_ticker
+        self.poll_seconds = poll_seconds
+        self.sleep = sleep
+        # tickers this worker failed on, with the error
+        self.failed: Dict[str, str] = {}
+
+    def _process_shard(self, lease: Lease) -> List[str]:
+        processed = []
+        for ticker in self.shards[lease.shard_id]:
+            if ticker in lease.completed or ticker in lease.failed:
+                continue
+            self.lease_manager.renew(lease)
+            try:
+                self.process_ticker(ticker)
+            except Exception as e:
+                logger.error(f"💥 {ticker} failed on shard {lease.shard_id}: {e}")
+                lease.failed[ticker] = str(e)
+                self.failed[ticker] = str(e)
+                continue
+            lease.completed.append(ticker)
+            processed.append(ticker)
+        self.lease_manager.complete(lease)
+        return processed
+
+    def run(self, wait_for_stragglers: bool = True) -> List[str]:
+        """
+        Claims and processes shards until every shard is done.
+
+        Args:
+            wait_for_stragglers (bool): Keep polling shards held by other workers so
+                their leases can be taken over if those workers die.
+
+        Returns:
+            List[str]: The tickers this worker processed, failures are in self.failed.
+        """
+        worker_id = self.lease_manager.worker_id
+        num_shards = len(self.shards)
+        # spread workers over the shard list to reduce contention on the first shards
+        offset = uuid.uuid5(uuid.NAMESPACE_OID, worker_id).int % num_shards
+        order = [(offset + i) % num_shards for i in range(num_shards)]
+
+        processed: List[str] = []
+        while True:
+            pending = [s for s in order if not self.lease_manager.is_done(s)]
+            if not pending:
+                break
+
+            claimed_any = False
+            for shard_id in pending:
+                lease = self.lease_manager.try_acquire(shard_id)
+                if lease is None:
+                    continue
+                claimed_any = True
+                logger.info(f"🔒 {worker_id} claimed shard {shard_id}")
+                try:
+                    processed.extend(self._process_shard(lease))
+                except LeaseLostError as e:
+                    logger.warning(f"⚠️ {e}")
+
+            if not claimed_any:
+                if not wait_for_stragglers:
+                    break
+                self.sleep(self.poll_seconds)
+
+        logger.info(f"✅ {worker_id} finished, processed {len(processed)} tickers")
+        return processed
+
+
+# --- MAIN EXECUTION FLOW ---
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    from scripts.data_quality import DataQualityEngine, DataQualityError
+    from scripts.ingest_last7days_stock_data import StockExtractor
+    from scripts.ingestion_state import IngestionWatermarks
+    from scripts.trading_calendar import TradingCalendar
+
+    load_dotenv("../.env")
+
+    parser = argparse.ArgumentParser(
+        description="Sharded 7-day ingestion worker, run one per node."
+    )
+    parser.add_argument("--run-id", default=date.today().isoformat())
+    parser.add_argument("--worker-id", default=f"{socket.gethostname()}-{os.getpid()}")
+    parser.add_argument("--num-shards", type=int, default=10)
+    parser.add_argument("--lease-seconds", type=float, default=300)
+    parser.add_argument("--universe-csv", default=str(DEFAULT_UNIVERSE_CSV))
+    args = parser.parse_args()
+
+    S3_BUCKET_DESTINATION = os.getenv("STOCK_DATA_AWS_S3_BUCKET_NAME")
+    extractor = StockExtractor(
+        api_key=os.getenv("ALPHA_VANTAGE_API_KEY"),
+        aws_access_key=os.getenv("STOCK_DATA_AWS_S3_ACCESS_KEY_ID"),
+        aws_secret_key=os.getenv("STOCK_DATA_AWS_S3_SECRET_ACCESS_KEY"),
+        region=os.getenv("AWS_REGION", "us-east-1"),
+    )
+    quality_engine = DataQualityEngine()
+
+    trading_calendar = TradingCalendar()
+    expected_latest = trading_calendar.expected_latest_session()
+    expected_window = [
+        d.astype(date) for d in trading_calendar.last_n_sessions(7, expected_latest)
+    ]
+    watermarks = IngestionWatermarks(extractor.s3_client, S3_BUCKET_DESTINATION)
+
+    def process_ticker(ticker: str) -> None:
+        report = extractor.ingest_ticker(
+            ticker,
+            S3_BUCKET_DESTINATION,
+            run_id=args.run_id,
+            expected_dates=expected_window,
+            quality_engine=quality_engine,
+            watermarks=watermarks,
+        )
+        if report is None:
+            # up to date or no bars yet, no API call to pace
+            return
+        if report.has_errors:
+            raise DataQualityError(f"{ticker} failed data quality checks")
+        # pause between tickers to prevent throttle and API pull failure
+        time.sleep(15)
+
+    lease_manager = ShardLeaseManager(
+        extractor.s3_client,
+        S3_BUCKET_DESTINATION,
+        run_id=args.run_id,
+        worker_id=args.worker_id,
+        lease_seconds=args.lease_seconds,
+    )
+    shards = make_shards(load_ticker_universe(args.universe_csv), args.num_shards)
+    runner = ShardedRunner(lease_manager, shards, process_ticker)
+    runner.run()
+    if runner.failed:
+        logger.error(f"💥 Tickers failed on {args.worker_id}: {runner.failed}")
+        print(
+            f"💥 Tickers failed on {args.worker_id}: {runner.failed}"
+        )  # for development
+        exit(1)
@@ -0,0 +1,188 @@
+import json
+import logging
+import os
+import uuid
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Iterator, List, Tuple
+
+import pyarrow as pa
+
+logger = logging.getLogger(__name__)
+
+# Local spool for validated batches, override with STOCK_DATA_SPOOL_DIR
+DEFAULT_SPOOL_DIR = Path(
+    os.getenv(
+        "STOCK_DATA_SPOOL_DIR",
+        Path.home() / ".cache" / "stock_data_pipeline" / "spool",
+    )
+)
+
+
+# Completed spools are kept this long for correlation.py and replays
+SPOOL_RETENTION_DAYS = 7
+
+
+def new_run_id() -> str:
+    # the random suffix keeps two runs started in the same second apart
+    return f"{datetime.now():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+
+
+def with_ingested_at(table: pa.Table, ingested_at: datetime | None = None) -> pa.Table:
+    """Adds the ingested_at column (as varchar, Snowflake does the timestamp cast)."""
+    ingested_at = str(ingested_at or datetime.now())
+    return table.append_column(
+        "ingested_at", pa.array([ingested_at] * table.num_rows, pa.string())
+    )
+
+
+class ArrowSpool:
+    """
+    Append-only Arrow IPC spool of the validated batches of one ingestion run.
+
+    Each ticker is written as one record batch in the (uncompressed) IPC stream
+    format and flushed right away, so the spool survives a crash up to the last
+    complete batch. Reading memory-maps the file: the tables handed to the upload
+    step point straight into the page cache, nothing is copied or re-parsed.
+
+        {spool_dir}/{run_id}.arrows          the record batches
+        {spool_dir}/{run_id}.manifest.json   run date, symbols already uploaded and
+                                             when the run completed
+    """
+
+    def __init__(self, run_id: str | None = None, spool_dir: Path | str | None = None):
+        self.run_id = run_id or new_run_id()
+        self.spool_dir = Path(spool_dir or DEFAULT_SPOOL_DIR)
+        self.path = self.spool_dir / f"{self.run_id}.arrows"
+        self.manifest_path = self.spool_dir / f"{self.run_id}.manifest.json"
+        self._sink = None
+        self._writer = None
+
+    @classmethod
+    def open_existing(
+        cls, run_id: str, spool_dir: Path | str | None = None
+    ) -> "ArrowSpool":
+        """Opens the spool of an earlier run, e.g. to replay its uploads."""
+        spool = cls(run_id=run_id, spool_dir=spool_dir)
+        if not spool.path.exists():
+            raise FileNotFoundError(f"No spool found for run {run_id} at {spool.path}")
+        return spool
+
+    def _read_manifest(self) -> dict:
+        if not self.manifest_path.exists():
+            return {
+                "run_id": self.run_id,
+                "run_date": date.today().isoformat(),
+                "uploaded": [],
+            }
+        with open(self.manifest_path) as f:
+            return json.load(f)
+
+    def _write_manifest(self, manifest: dict) -> None:
+        tmp_path = self.manifest_path.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f)
+        # atomic rename, a crash never leaves a half written manifest
+        os.replace(tmp_path, self.manifest_path)
+
+    @property
+    def run_date(self) -> date:
+        """Date the run started, used for the S3 keys so a replay writes the same keys."""
+        return date.fromisoformat(self._read_manifest()["run_date"])
+
+    def append(self, table: pa.Table) -> None:
+        """Spools one validated ticker batch."""
+        if self._writer is None:
+            self.spool_dir.mkdir(parents=True, exist_ok=True)
+            self._write_manifest(self._read_manifest())
+            self._sink = pa.OSFile(str(self.path), "wb")
+            self._writer = pa.ipc.new_stream(self._sink, table.schema)
+        self._writer.write_table(table, max_chunksize=None)
+        self._sink.flush()
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._sink.close()
+            self._writer = None
+            self._sink = None
+
+    def read(self) -> pa.Table:
+        """Memory-maps the spool and returns every batch as one zero-copy table."""
+        source = pa.memory_map(str(self.path), "r")
+        return pa.ipc.open_stream(source).read_all()
+
+    def batches(self) -> Iterator[Tuple[str, pa.Table]]:
+        """Yields (symbol, table) per spooled ticker batch, zero-copy from the mmap."""
+        source = pa.memory_map(str(self.path), "r")
+        reader = pa.ipc.open_stream(source)
+        while True:
+            try:
+                batch = reader.read_next_batch()
+            except StopIteration:
+                break
+            except (pa.ArrowInvalid, OSError) as e:
+                # a run that crashed mid-write leaves a truncated last batch
+                logger.warning(f"⚠️ Spool {self.path} is truncated: {e}")
+                break
+            yield batch.column("symbol")[0].as_py(), pa.Table.from_batches([batch])
+
+    def uploaded_symbols(self) -> List[str]:
+        return self._read_manifest()["uploaded"]
+
+    def mark_uploaded(self, symbol: str) -> None:
+        manifest = self._read_manifest()
+        if symbol not in manifest["uploaded"]:
+            manifest["uploaded"].append(symbol)
+            self._write_manifest(manifest)
+
+    def mark_complete(self) -> None:
+        """Every batch is in S3 (and Iceberg), the spool may be pruned later on."""
+        manifest = self._read_manifest()
+        manifest["completed_at"] = datetime.now().isoformat()
+        self._write_manifest(manifest)
+
+    @property
+    def completed_at(self) -> datetime | None:
+        completed_at = self._read_manifest().get("completed_at")
+        return datetime.fromisoformat(completed_at) if completed_at else None
+
+    def remove(self) -> None:
+        self.close()
+        self.path.unlink(missing_ok=True)
+        self.manifest_path.unlink(missing_ok=True)
+
+    def pending_batches(self) -> Iterator[Tuple[str, pa.Table]]:
+        """Spooled batches whose upload has not succeeded yet."""
+        uploaded = set(self.uploaded_symbols())
+        for symbol, table in self.batches():
+            if symbol not in uploaded:
+                yield symbol, table
+
+
+def prune_completed_spools(
+    spool_dir: Path | str | None = None,
+    retention_days: int = SPOOL_RETENTION_DAYS,
+    now: datetime | None = None,
+) -> List[str]:
+    """
+    Removes the spools of runs that completed more than retention_days ago.
+
+    Spools of runs that never completed are kept, they are needed to replay the
+    upload with --replay-run.
+
+    Returns:
+        List[str]: Run ids of the removed spools.
+    """
+    spool_dir = Path(spool_dir or DEFAULT_SPOOL_DIR)
+    cutoff = (now or datetime.now()) - timedelta(days=retention_days)
+    removed = []
+    for manifest_path in sorted(spool_dir.glob("*.manifest.json")):
+        spool = ArrowSpool(manifest_path.name.removesuffix(".manifest.json"), spool_dir)
+        completed_at = spool.completed_at
+        if completed_at is not None and completed_at < cutoff:
+            spool.remove()
+            removed.append(spool.run_id)
+    if removed:
+        logger.info(f"🧹 Pruned {len(removed)} completed spool(s) from {spool_dir}")
+    return removed
@@ -0,0 +1,146 @@
+import logging
+from abc import ABC, abstractmethod
+from datetime import date
+from typing import List
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+from pydantic import BaseModel
+
+from scripts.data_quality import (
+    DataQualityEngine,
+    TickerQualityReport,
+    records_to_table,
+)
+from scripts.ingestion_state import IngestionWatermarks
+from scripts.profiling import NullProfiler
+from scripts.quarantine import RowQuarantine
+from scripts.spool import ArrowSpool, with_ingested_at
+
+logger = logging.getLogger(__name__)
+
+
+class TickerIngestion(ABC):
+    """
+    The per-ticker flow shared by every extractor, the sharded runner and the DAG:
+
+        watermark check -> fetch -> validate / quarantine -> data quality
+            -> quarantine upload -> spool, or upload + watermark
+
+    Extractors provide the window-specific fetch, validation and S3 upload.
+    """
+
+    @abstractmethod
+    def fetch_window(self, symbol: str) -> dict:
+        """Raw provider payload covering the extractor's window."""
+
+    @abstractmethod
+    def validate_window(
+        self,
+        symbol: str,
+        raw_data: dict,
+        expected_dates: List[date],
+        quarantine: RowQuarantine,
+    ) -> List[BaseModel]:
+        """Validated rows of the window, rejected rows go to the quarantine."""
+
+    @abstractmethod
+    def upload_table_to_s3(
+        self,
+        table: pa.Table,
+        s3_bucket: str | None = None,
+        run_date: date | None = None,
+    ) -> None: ...
+
+    def ingest_ticker(
+        self,
+        symbol: str,
+        s3_bucket: str,
+        run_id: str,
+        expected_dates: List[date],
+        quality_engine: DataQualityEngine,
+        watermarks: IngestionWatermarks | None = None,
+        spool: ArrowSpool | None = None,
+        profiler=None,
+    ) -> TickerQualityReport | None:
+        """
+        Runs one ticker through the pipeline.
+
+        Args:
+            symbol (str): The stock ticker (e.g., 'AAPL').
+            s3_bucket (str): Destination bucket (quarantine, data and watermarks).
+            run_id (str): Ingestion run id, names the quarantine file.
+            expected_dates (List[date]): Trading days of the window, oldest first.
+            quality_engine (DataQualityEngine): Checks the batch before it leaves.
+            watermarks (IngestionWatermarks | None): Skips the API call when the
+                latest expected session is already ingested, and is advanced after
+                a direct upload. None ingests unconditionally (e.g. a backfill).
+            spool (ArrowSpool | None): Spool the batch for a later upload (the
+                caller uploads and sets the watermark), otherwise upload right away.
+            profiler (RunProfiler | None): Stage timings (fetch, validate, ...).
+
+        Returns:
+            TickerQualityReport | None: The quality report, None when there was
+                nothing to ingest. A report with errors was not spooled / uploaded.
+        """
+        profiler = profiler or NullProfiler()
+        expected_latest = expected_dates[-1]
+
+        # Skip the API call when the latest trading day is already in S3
+        if watermarks is not None and watermarks.is_up_to_date(symbol, expected_latest):
+            logger.info(f"⏭️ {symbol} already has {expected_latest}, skipping.")
+            print(f"⏭️ {symbol} already has {expected_latest}, skipping.")
+            return None
+
+        with profiler.stage("fetch"):
+            raw_json = self.fetch_window(symbol)
+
+        # Rows failing validation are quarantined, the good ones go on
+        quarantine = RowQuarantine(symbol)
+        with profiler.stage("validate"):
+            validated_records = self.validate_window(
+                symbol, raw_json, expected_dates, quarantine
+            )
+        if not validated_records and not quarantine:
+            logger.warning(f"⚠️ No bars for the expected window of {symbol} yet.")
+            print(f"⚠️ No bars for the expected window of {symbol} yet.")
+            return None
+
+        # OHLC bounds, volume, jumps, gaps, quarantine rate: bad data never reaches S3
+        with profiler.stage("data_quality"):
+            table = records_to_table(validated_records)
+            report = quality_engine.run(
+                symbol=symbol,
+                table=table,
+                expected_dates=np.array(expected_dates, dtype="datetime64[D]"),
+                quarantined_dates=quarantine.dates,
+            )
+
+        # Keep the rejected rows and their raw payload for inspection
+        with profiler.stage("quarantine"):
+            quarantine.upload_to_s3(self.s3_client, s3_bucket, run_id=run_id)
+
+        if report.has_errors:
+            logger.error(
+                f"💥 {symbol} failed checks: {[r.check for r in report.errors]}"
+            )
+            print(
+                f"💥 {symbol} failed checks: {[r.check for r in report.errors]}"
+            )  # for development
+            return report
+        if table.num_rows == 0:
+            return report
+
+        table = with_ingested_at(table)
+        if spool is not None:
+            with profiler.stage("spool"):
+                spool.append(table)
+            return report
+
+        with profiler.stage("upload"):
+            self.upload_table_to_s3(table, s3_bucket=s3_bucket)
+        if watermarks is not None:
+            watermarks.set(symbol, pc.max(table["date"]).as_py())
+        logger.info(f"✅ Pipeline complete. Data for {symbol} is now in S3.")
+        return report
@@ -0,0 +1,238 @@
+import hashlib
+import json
+import logging
+import os
+from datetime import date, datetime, time, timedelta
+from pathlib import Path
+from typing import Dict
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+EXCHANGE_TZ = ZoneInfo("America/New_York")
+REGULAR_CLOSE = time(16, 0)
+EARLY_CLOSE = time(13, 0)
+
+# Local cache for the precomputed calendar, override with TRADING_CALENDAR_CACHE_DIR
+DEFAULT_CACHE_DIR = Path(
+    os.getenv(
+        "TRADING_CALENDAR_CACHE_DIR",
+        Path.home() / ".cache" / "stock_data_pipeline",
+    )
+)
+
+# One-off NYSE closures that no holiday rule can derive (weather, national mourning)
+SPECIAL_CLOSURES = {
+    date(2001, 9, 11): "September 11 attacks",
+    date(2001, 9, 12): "September 11 attacks",
+    date(2001, 9, 13): "September 11 attacks",
+    date(2001, 9, 14): "September 11 attacks",
+    date(2004, 6, 11): "National Day of Mourning (Ronald Reagan)",
+    date(2007, 1, 2): "National Day of Mourning (Gerald Ford)",
+    date(2012, 10, 29): "Hurricane Sandy",
+    date(2012, 10, 30): "Hurricane Sandy",
+    date(2018, 12, 5): "National Day of Mourning (George H.W. Bush)",
+    date(2025, 1, 9): "National Day of Mourning (Jimmy Carter)",
+}
+
+
+# Bump whenever a holiday or early-close rule changes, cached calendars built
+# with older rules are then ignored (SPECIAL_CLOSURES edits are picked up alone)
+RULES_VERSION = 2
+
+
+def rules_fingerprint() -> str:
+    """Short hash of the calendar rules, part of the cache file name."""
+    rules = {
+        "version": RULES_VERSION,
+        "special_closures": sorted(d.isoformat() for d in SPECIAL_CLOSURES),
+    }
+    return hashlib.sha256(json.dumps(rules).encode()).hexdigest()[:12]
+
+
+def _easter_sunday(year: int) -> date:
+    """Anonymous Gregorian computus, used to derive Good Friday."""
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    m = (32 + 2 * e + 2 * i - h - k) % 7
+    n = (a + 11 * h + 22 * m) // 451
+    month, day = divmod(h + m - 7 * n + 114, 31)
+    return date(year, month, day + 1)
+
+
+def _nth_weekday(year: int, month: int, weekday: int, n: int) -> date:
+    """n-th weekday (Mon=0) of a month, n=-1 returns the last one."""
+    if n > 0:
+        first = date(year, month, 1)
+        return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+    last = date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+
+def _observed(holiday: date) -> date:
+    # Saturday holidays move to Friday, Sunday holidays move to Monday
+    if holiday.weekday() == 5:
+        return holiday - timedelta(days=1)
+    if holiday.weekday() == 6:
+        return holiday + timedelta(days=1)
+    return holiday
+
+
+def nyse_holidays(year: int) -> Dict[date, str]:
+    """Returns the full-day NYSE holidays (as observed) for one year."""
+    holidays = {
+        _nth_weekday(year, 1, 0, 3): "Martin Luther King Jr. Day",
+        _nth_weekday(year, 2, 0, 3): "Presidents' Day",
+        _easter_sunday(year) - timedelta(days=2): "Good Friday",
+        _nth_weekday(year, 5, 0, -1): "Memorial Day",
+        _observed(date(year, 7, 4)): "Independence Day",
+        _nth_weekday(year, 9, 0, 1): "Labor Day",
+        _nth_weekday(year, 11, 3, 4): "Thanksgiving Day",
+        _observed(date(year, 12, 25)): "Christmas Day",
+    }
+    # NYSE does not close on Dec 31 when New Year's Day falls on a Saturday
+    new_year = date(year, 1, 1)
+    if new_year.weekday() != 5:
+        holidays[_observed(new_year)] = "New Year's Day"
+    if year >= 2022:
+        holidays[_observed(date(year, 6, 19))] = "Juneteenth"
+    for closure, name in SPECIAL_CLOSURES.items():
+        if closure.year == year:
+            holidays[closure] = name
+    return holidays
+
+
+def nyse_early_closes(year: int) -> Dict[date, time]:
+    """Returns the 1 p.m. early-close sessions for one year."""
+    holidays = nyse_holidays(year)
+    candidates = [
+        # the day before Independence Day (a holiday itself when the 4th is a Saturday)
+        date(year, 7, 3),
+        # the day after Thanksgiving
+        _nth_weekday(year, 11, 3, 4) + timedelta(days=1),
+        # Christmas Eve
+        date(year, 12, 24),
+    ]
+    return {d: EARLY_CLOSE for d in candidates if d.weekday() < 5 and d not in holidays}
+
+
+class TradingCalendar:
+    """
+    Precomputed NYSE trading calendar (sessions, holidays and early closes).
+
+    The calendar is computed once for a range of years and cached locally as JSON,
+    so every extractor run and DAG parse is a file read plus NumPy lookups.
+    """
+
+    def __init__(
+        self,
+        start_year: int = 2000,
+        end_year: int | None = None,
+        cache_dir: Path | str | None = DEFAULT_CACHE_DIR,
+    ):
+        self.start_year = start_year
+        self.end_year = end_year or date.today().year + 1
+        self.cache_path = (
+            Path(cache_dir)
+            / f"xnys_{self.start_year}_{self.end_year}_{rules_fingerprint()}.json"
+            if cache_dir is not None
+            else None
+        )
+
+        payload = self._load_cache()
+        if payload is None:
+            payload = self._build()
+            self._write_cache(payload)
+
+        self.sessions = np.array(payload["sessions"], dtype="datetime64[D]")
+        self.holidays = {
+            date.fromisoformat(d): name for d, name in payload["holidays"].items()
+        }
+        self.early_closes = {
+            date.fromisoformat(d): time.fromisoformat(t)
+            for d, t in payload["early_closes"].items()
+        }
+
+    def _build(self) -> dict:
+        holidays: Dict[date, str] = {}
+        early_closes: Dict[date, time] = {}
+        for year in range(self.start_year, self.end_year + 1):
+            holidays.update(nyse_holidays(year))
+            early_closes.update(nyse_early_closes(year))
+
+        days = np.arange(
+            np.datetime64(f"{self.start_year}-01-01"),
+            np.datetime64(f"{self.end_year + 1}-01-01"),
+            dtype="datetime64[D]",
+        )
+        sessions = days[
+            np.is_busday(days, holidays=np.array(list(holidays), dtype="datetime64[D]"))
+        ]
+        return {
+            "sessions": [str(d) for d in sessions],
+            "holidays": {d.isoformat(): name for d, name in sorted(holidays.items())},
+            "early_closes": {
+                d.isoformat(): t.isoformat() for d, t in sorted(early_closes.items())
+            },
+        }
+
+    def _load_cache(self) -> dict | None:
+        if self.cache_path is None or not self.cache_path.exists():
+            return None
+        with open(self.cache_path) as f:
+            return json.load(f)
+
+    def _write_cache(self, payload: dict) -> None:
+        if self.cache_path is None:
+            return
+        try:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.cache_path, "w") as f:
+                json.dump(payload, f)
+            logger.info(f"✅ Trading calendar cached at {self.cache_path}")
+        except OSError as e:
+            # a read-only worker can still use the in-memory calendar
+            logger.warning(f"⚠️ Could not cache trading calendar: {e}")
+
+    def is_trading_day(self, day: date) -> bool:
+        idx = np.searchsorted(self.sessions, np.datetime64(day, "D"))
+        return idx < len(self.sessions) and self.sessions[idx] == np.datetime64(
+            day, "D"
+        )
+
+    def session_close(self, day: date) -> datetime:
+        """Exchange close time (timezone aware) for a trading day."""
+        close = self.early_closes.get(day, REGULAR_CLOSE)
+        return datetime.combine(day, close, tzinfo=EXCHANGE_TZ)
+
+    def sessions_in_range(self, start: date, end: date) -> np.ndarray:
+        """Every trading day between start and end, both inclusive."""
+        lo = np.searchsorted(self.sessions, np.datetime64(start, "D"), side="left")
+        hi = np.searchsorted(self.sessions, np.datetime64(end, "D"), side="right")
+        return self.sessions[lo:hi]
+
+    def last_n_sessions(self, n: int, end: date) -> np.ndarray:
+        """The n most recent trading days on or before end, oldest first."""
+        hi = np.searchsorted(self.sessions, np.datetime64(end, "D"), side="right")
+        return self.sessions[max(hi - n, 0) : hi]
+
+    def expected_latest_session(self, now: datetime | None = None) -> date:
+        """
+        Latest trading day whose bar should exist at `now`.
+
+        A session only counts once the exchange has closed, so a run at 10 a.m. on
+        a Tuesday expects Monday's bar, and a run on a Saturday expects Friday's.
+        """
+        now = (now or datetime.now(EXCHANGE_TZ)).astimezone(EXCHANGE_TZ)
+        recent = self.last_n_sessions(2, now.date())
+        latest = recent[-1].astype(date)
+        if latest == now.date() and now < self.session_close(latest):
+            latest = recent[-2].astype(date)
+        return latest
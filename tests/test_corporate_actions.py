@@ -0,0 +1,243 @@
+from datetime import date
+
+import numpy as np
+import pyarrow as pa
+import pytest
+from moto import mock_aws
+
+from scripts.corporate_actions import (
+    ACTIONS_SCHEMA,
+    AdjustedPriceStore,
+    CorporateActionStore,
+    adjust_prices,
+    parse_adjusted_payload,
+    update_symbol,
+)
+from scripts.ingest_last7days_stock_data import StockExtractor
+
+
+def adjusted_bar(close, split="1.0", dividend="0.0"):
+    return {
+        "1. open": str(close),
+        "2. high": str(close + 1),
+        "3. low": str(close - 1),
+        "4. close": str(close),
+        "5. adjusted close": str(close),
+        "6. volume": "1000",
+        "7. dividend amount": dividend,
+        "8. split coefficient": split,
+    }
+
+
+def payload(bars):
+    return {"Time Series (Daily)": bars}
+
+
+@pytest.fixture
+def stores():
+    with mock_aws():
+        extractor = StockExtractor(
+            api_key="test_key",
+            aws_access_key="testing",
+            aws_secret_key="testing",
+            region="us-east-1",
+        )
+        extractor.s3_client.create_bucket(Bucket="test-bucket")
+        yield (
+            extractor.s3_client,
+            CorporateActionStore(extractor.s3_client, "test-bucket"),
+            AdjustedPriceStore(extractor.s3_client, "test-bucket"),
+        )
+
+
+def test_parse_keeps_only_sessions_with_actions():
+    bars, actions = parse_adjusted_payload(
+        "TSLA",
+        payload(
+            {
+                "2022-08-24": adjusted_bar(900.0),
+                "2022-08-25": adjusted_bar(300.0, split="3.0"),
+                "2022-08-26": adjusted_bar(290.0, dividend="0.5"),
+            }
+        ),
+    )
+
+    assert bars.num_rows == 3
+    assert bars.column_names == [
+        "symbol",
+        "date",
+        "open_price",
+        "high_price",
+        "low_price",
+        "close_price",
+        "volume",
+    ]
+    assert actions.schema == ACTIONS_SCHEMA
+    assert actions.to_pylist() == [
+        {
+            "symbol": "TSLA",
+            "ex_date": date(2022, 8, 25),
+            "split_coefficient": 3.0,
+            "dividend_amount": 0.0,
+            "prev_close": 900.0,
+        },
+        {
+            "symbol": "TSLA",
+            "ex_date": date(2022, 8, 26),
+            "split_coefficient": 1.0,
+            "dividend_amount": 0.5,
+            "prev_close": 300.0,
+        },
+    ]
+
+
+def test_cumulative_factors_back_adjust_splits_and_dividends():
+    bars, actions = parse_adjusted_payload(
+        "TSLA",
+        payload(
+            {
+                "2022-08-24": adjusted_bar(900.0),
+                "2022-08-25": adjusted_bar(300.0, split="3.0"),
+                "2022-08-26": adjusted_bar(290.0, dividend="3.0"),
+                "2022-08-29": adjusted_bar(280.0),
+            }
+        ),
+    )
+    adjusted = adjust_prices(bars, actions)
+
+    dividend_factor = 1 - 3.0 / 300.0
+    np.testing.assert_allclose(
+        adjusted["adjustment_factor"].to_numpy(),
+        [dividend_factor / 3, dividend_factor, 1.0, 1.0],
+    )
+    np.testing.assert_allclose(
+        adjusted["adjusted_close_price"].to_numpy(),
+        [300 * dividend_factor, 300 * dividend_factor, 290, 280],
+    )
+    assert adjusted["adjusted_volume"].to_pylist() == [3000, 1000, 1000, 1000]
+    # raw prices are kept for later re-adjustments
+    assert adjusted["close_price"].to_pylist() == [900.0, 300.0, 290.0, 280.0]
+
+
+def test_new_action_rewrites_only_the_affected_partitions(stores):
+    s3_client, action_store, price_store = stores
+    history = {
+        f"{year}-06-01": adjusted_bar(100.0 + year - 2020) for year in range(2020, 2024)
+    }
+    update_symbol("TSLA", payload(history), action_store, price_store)
+    update_symbol("AAPL", payload(history), action_store, price_store)
+
+    def etags(symbol):
+        return {
+            year: s3_client.head_object(
+                Bucket="test-bucket", Key=f"adjusted/stocks/{symbol}/{year}.parquet"
+            )["ETag"]
+            for year in price_store.years(symbol)
+        }
+
+    before = {s: etags(s) for s in ("TSLA", "AAPL")}
+
+    # a 2:1 split in 2022 arrives with the latest bars
+    summary = update_symbol(
+        "TSLA",
+        payload(
+            {
+                "2022-06-01": adjusted_bar(102.0),
+                "2022-06-02": adjusted_bar(51.0, split="2.0"),
+            }
+        ),
+        action_store,
+        price_store,
+    )
+
+    assert summary == {
+        "new_actions": 1,
+        "upserted_years": [2022],
+        "readjusted_years": [2020, 2021],
+    }
+    after = etags("TSLA")
+    assert after[2023] == before["TSLA"][2023]
+    assert all(after[y] != before["TSLA"][y] for y in (2020, 2021, 2022))
+    assert etags("AAPL") == before["AAPL"]
+
+    old = price_store.read("TSLA", 2020)
+    assert old["adjusted_close_price"].to_pylist() == [50.0]
+    assert old["close_price"].to_pylist() == [100.0]
+    partition_2022 = price_store.read("TSLA", 2022)
+    assert partition_2022["adjusted_close_price"].to_pylist() == [51.0, 51.0]
+
+
+def test_known_actions_do_not_trigger_a_readjustment(stores):
+    s3_client, action_store, price_store = stores
+    bars = {
+        "2023-06-01": adjusted_bar(100.0),
+        "2023-06-02": adjusted_bar(50.0, split="2.0"),
+    }
+    update_symbol("TSLA", payload(bars), action_store, price_store)
+    summary = update_symbol("TSLA", payload(bars), action_store, price_store)
+
+    assert summary["new_actions"] == 0
+    assert summary["readjusted_years"] == []
+    assert action_store.load("TSLA").num_rows == 1
+    # the price COPY INTO loads everything under raw/
+    listing = s3_client.list_objects_v2(Bucket="test-bucket", Prefix="raw/")
+    assert "Contents" not in listing
+
+
+def test_action_at_the_edge_of_a_slid_window_keeps_its_prev_close(stores):
+    _, action_store, price_store = stores
+    update_symbol(
+        "AAPL",
+        payload(
+            {
+                "2023-06-01": adjusted_bar(100.0),
+                "2023-06-02": adjusted_bar(98.0, dividend="2.0"),
+                "2023-06-05": adjusted_bar(99.0),
+            }
+        ),
+        action_store,
+        price_store,
+    )
+    before = price_store.read("AAPL", 2023)
+
+    # the compact window moved on, the ex-date is now its oldest session
+    summary = update_symbol(
+        "AAPL",
+        payload(
+            {
+                "2023-06-02": adjusted_bar(98.0, dividend="2.0"),
+                "2023-06-05": adjusted_bar(99.0),
+                "2023-06-06": adjusted_bar(101.0),
+            }
+        ),
+        action_store,
+        price_store,
+    )
+
+    assert summary["new_actions"] == 0
+    assert summary["readjusted_years"] == []
+    assert action_store.load("AAPL")["prev_close"].to_pylist() == [100.0]
+    after = price_store.read("AAPL", 2023)
+    assert after["adjustment_factor"].to_pylist()[0] == pytest.approx(0.98)
+    assert (
+        after["adjusted_close_price"].to_pylist()[0]
+        == before["adjusted_close_price"].to_pylist()[0]
+    )
+
+
+def test_empty_actions_leave_prices_unadjusted():
+    bars = pa.table(
+        {
+            "symbol": ["AAPL"],
+            "date": pa.array([date(2026, 1, 5)]),
+            "open_price": [1.0],
+            "high_price": [2.0],
+            "low_price": [0.5],
+            "close_price": [1.5],
+            "volume": [10],
+        }
+    )
+    adjusted = adjust_prices(bars, ACTIONS_SCHEMA.empty_table())
+
+    assert adjusted["adjusted_close_price"].to_pylist() == [1.5]
+    assert adjusted["adjustment_factor"].to_pylist() == [1.0]
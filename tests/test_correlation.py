@@ -0,0 +1,223 @@
+import time
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from scripts.corporate_actions import ACTIONS_SCHEMA
+from scripts.correlation import CorrelationEngine
+
+
+def make_closes(num_days, num_symbols, seed=0, missing=0.0):
+    """Daily closes (days x symbols) of correlated random walks, NaN = no bar."""
+    rng = np.random.default_rng(seed)
+    market = rng.normal(0, 0.01, (num_days, 1))
+    returns = market + rng.normal(0, 0.01, (num_days, num_symbols))
+    closes = 100 * np.cumprod(1 + returns, axis=0)
+    closes[rng.random(closes.shape) < missing] = np.nan
+    return closes
+
+
+def feed(engine, closes, start=0):
+    symbols = [f"S{i:03d}" for i in range(closes.shape[1])]
+    days = pd.bdate_range("2024-01-01", periods=start + len(closes))[start:]
+    for day, row in zip(days, closes):
+        present = ~np.isnan(row)
+        engine.update(
+            day.date(), [s for s, p in zip(symbols, present) if p], row[present]
+        )
+    return symbols
+
+
+def reference_returns(closes):
+    # a return only exists when both sessions have a close
+    return pd.DataFrame(closes).pct_change(fill_method=None).iloc[1:]
+
+
+def test_fixed_window_matches_pairwise_complete_history():
+    closes = make_closes(150, 6, missing=0.1)
+    engine = CorrelationEngine(window=40)
+    feed(engine, closes)
+
+    expected = reference_returns(closes).iloc[-40:]
+    _, corr = engine.correlation("fixed", min_periods=5)
+    _, cov = engine.covariance("fixed", min_periods=5)
+
+    np.testing.assert_allclose(corr, expected.corr(min_periods=5).to_numpy(), atol=1e-9)
+    np.testing.assert_allclose(cov, expected.cov(min_periods=5).to_numpy(), atol=1e-12)
+
+
+def test_exponential_window_matches_ewm():
+    closes = make_closes(200, 5)
+    engine = CorrelationEngine(halflife=20)
+    feed(engine, closes)
+
+    returns = reference_returns(closes)
+    expected = returns.ewm(halflife=20).corr().iloc[-5:].to_numpy()
+    _, corr = engine.correlation("ew")
+
+    np.testing.assert_allclose(corr, expected, atol=1e-9)
+
+
+def test_state_round_trips_and_keeps_updating(tmp_path):
+    closes = make_closes(120, 8, missing=0.05)
+    straight = CorrelationEngine(window=30)
+    feed(straight, closes)
+
+    resumed = CorrelationEngine(window=30)
+    feed(resumed, closes[:70])
+    resumed.save(tmp_path / "state.npz")
+    resumed = CorrelationEngine.load(tmp_path / "state.npz")
+    feed(resumed, closes[70:], start=70)
+
+    for window in ("ew", "fixed"):
+        np.testing.assert_allclose(
+            resumed.correlation(window)[1], straight.correlation(window)[1], atol=1e-9
+        )
+
+
+def test_update_from_table_skips_days_already_folded_in():
+    table = pa.table(
+        {
+            "symbol": ["AAPL", "MSFT", "AAPL", "MSFT", "AAPL", "MSFT"],
+            "date": pa.array([date(2026, 1, d) for d in (5, 5, 6, 6, 7, 7)]),
+            "close_price": [100.0, 200.0, 101.0, 202.0, 100.0, 199.0],
+        }
+    )
+    engine = CorrelationEngine()
+
+    assert engine.update_from_table(table) == 3
+    assert engine.update_from_table(table) == 0
+    assert engine.windows["fixed"].moments.count[0, 1] == 2
+
+
+def closes_table(closes, symbols, start=0):
+    days = pd.bdate_range("2026-01-05", periods=start + len(closes))[start:]
+    rows = [
+        (symbol, day.date(), close)
+        for day, row in zip(days, closes)
+        for symbol, close in zip(symbols, row)
+        if not np.isnan(close)
+    ]
+    symbol, day, close = zip(*rows)
+    return pa.table(
+        {"symbol": list(symbol), "date": pa.array(day), "close_price": list(close)}
+    )
+
+
+def test_days_missing_a_symbol_wait_for_its_closes(tmp_path):
+    closes = make_closes(10, 3)
+    symbols = ["AAPL", "MSFT", "TSLA"]
+    straight = CorrelationEngine()
+    straight.update_from_table(closes_table(closes, symbols))
+
+    engine = CorrelationEngine()
+    assert engine.update_from_table(closes_table(closes[:5], symbols)) == 5
+    # TSLA failed in this run, its days stay pending across a save / load
+    partial = closes[5:8].copy()
+    partial[:, 2] = np.nan
+    assert engine.update_from_table(closes_table(partial, symbols, start=5)) == 0
+    engine.save(tmp_path / "state.npz")
+    engine = CorrelationEngine.load(tmp_path / "state.npz")
+    assert engine.pending.num_rows == 6
+
+    # the next run brings TSLA's missing closes along with the new days
+    assert engine.update_from_table(closes_table(closes[5:], symbols, start=5)) == 5
+    assert engine.pending.num_rows == 0
+    for window in ("ew", "fixed"):
+        np.testing.assert_allclose(
+            engine.windows[window].moments.cross,
+            straight.windows[window].moments.cross,
+        )
+
+
+def test_symbol_that_stops_reporting_stalls_only_once(tmp_path):
+    closes = make_closes(10, 3)
+    closes[3:, 2] = np.nan  # TSLA stops reporting after day 2
+    symbols = ["AAPL", "MSFT", "TSLA"]
+    engine = CorrelationEngine(max_pending_days=3)
+    engine.update_from_table(closes_table(closes[:3], symbols))
+
+    added = [
+        engine.update_from_table(closes_table(closes[day : day + 1], symbols, day))
+        for day in range(3, 8)
+    ]
+    # days 3-5 waited for TSLA, day 6 gave up on it and folded every pending day
+    assert added == [0, 0, 0, 4, 1]
+    assert engine.inactive == {"TSLA"}
+
+    engine.save(tmp_path / "state.npz")
+    engine = CorrelationEngine.load(tmp_path / "state.npz")
+    assert engine.update_from_table(closes_table(closes[8:9], symbols, 8)) == 1
+    assert engine.pending.num_rows == 0
+
+
+def test_days_without_a_dropped_symbol_fold_in_the_same_call():
+    closes = make_closes(10, 3)
+    symbols = ["AAPL", "MSFT", "TSLA"]
+    engine = CorrelationEngine(max_pending_days=3)
+    engine.update_from_table(closes_table(closes[:3], symbols))
+
+    # TSLA left the ticker universe, later runs only bring AAPL and MSFT
+    later = closes_table(closes[3:, :2], symbols[:2], start=3)
+    assert engine.update_from_table(later, expected=symbols[:2]) == 7
+    assert engine.pending.num_rows == 0
+
+    # without the universe, a batch past max_pending_days still folds it all
+    engine = CorrelationEngine(max_pending_days=3)
+    engine.update_from_table(closes_table(closes[:3], symbols))
+    assert engine.update_from_table(later) == 7
+
+
+def test_splits_and_dividends_are_not_returns():
+    table = pa.table(
+        {
+            "symbol": ["TSLA", "KO", "TSLA", "KO", "TSLA", "KO"],
+            "date": pa.array([date(2026, 1, d) for d in (5, 5, 6, 6, 7, 7)]),
+            "close_price": [900.0, 50.0, 306.0, 49.5, 303.0, 50.0],
+        }
+    )
+    actions = pa.table(
+        {
+            "symbol": ["TSLA", "KO"],
+            "ex_date": pa.array([date(2026, 1, 6)] * 2),
+            "split_coefficient": [3.0, 1.0],
+            "dividend_amount": [0.0, 0.5],
+            "prev_close": [900.0, 50.0],
+        },
+        schema=ACTIONS_SCHEMA,
+    )
+    engine = CorrelationEngine()
+    engine.update_from_table(table, actions)
+
+    first_day = engine.windows["fixed"].buffer[0]
+    # 900 -> 306 after a 3:1 split is +2%, 50 -> 49.5 after a 0.5 dividend is 0%
+    np.testing.assert_allclose(first_day, [306 / 300 - 1, 0.0], atol=1e-12)
+
+
+def test_new_symbols_join_the_universe():
+    engine = CorrelationEngine()
+    engine.update(date(2026, 1, 5), ["AAPL"], np.array([100.0]))
+    engine.update(date(2026, 1, 6), ["AAPL", "MSFT"], np.array([101.0, 200.0]))
+    returns = engine.update(
+        date(2026, 1, 7), ["AAPL", "MSFT"], np.array([102.0, 210.0])
+    )
+
+    assert engine.symbols == ["AAPL", "MSFT"]
+    np.testing.assert_allclose(returns, [102 / 101 - 1, 0.05])
+    assert engine.windows["fixed"].moments.count.tolist() == [[2, 1], [1, 1]]
+
+
+def test_matrix_for_500_symbols_comes_from_the_statistics():
+    engine = CorrelationEngine()
+    feed(engine, make_closes(30, 500))
+
+    start = time.perf_counter()
+    symbols, corr = engine.correlation("ew", min_periods=20)
+    elapsed = time.perf_counter() - start
+
+    assert corr.shape == (500, 500)
+    np.testing.assert_allclose(np.diag(corr), 1.0)
+    # no history rescan: a few element-wise operations on 500 x 500 matrices
+    assert elapsed < 0.5
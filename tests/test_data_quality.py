@@ -0,0 +1,88 @@
+import numpy as np
+import pyarrow as pa
+
+from scripts.data_quality import (
+    DataQualityEngine,
+    DataQualityThresholds,
+    expected_trading_days,
+)
+
+
+def make_table(rows):
+    """Builds a columnar batch with the DailyStockData columns."""
+    return pa.Table.from_pylist(
+        [
+            {
+                "symbol": "AAPL",
+                "date": np.datetime64(d).astype(object),
+                "open_price": o,
+                "high_price": h,
+                "low_price": lo,
+                "close_price": c,
+                "volume": v,
+            }
+            for d, o, h, lo, c, v in rows
+        ]
+    )
+
+
+def test_clean_batch_passes_every_check():
+    table = make_table(
+        [
+            ("2026-01-05", 100.0, 110.0, 95.0, 105.0, 500),
+            ("2026-01-06", 105.0, 108.0, 101.0, 107.0, 600),
+            ("2026-01-07", 107.0, 109.0, 104.0, 106.0, 700),
+        ]
+    )
+    report = DataQualityEngine().run(symbol="AAPL", table=table)
+
+    assert report.row_count == 3
+    assert all(r.passed for r in report.results)
+    assert not report.has_errors
+
+
+def test_bad_rows_are_flagged():
+    table = make_table(
+        [
+            # close above high
+            ("2026-01-05", 100.0, 110.0, 95.0, 120.0, 500),
+            ("2026-01-06", 105.0, 108.0, 101.0, 107.0, -1),
+            # duplicate date with a 90% jump, and 2026-01-07 is missing
+            ("2026-01-06", 10.0, 12.0, 9.0, 11.0, 100),
+            ("2026-01-08", 11.0, 12.0, 10.0, 11.5, 100),
+        ]
+    )
+    report = DataQualityEngine().run(symbol="AAPL", table=table)
+    results = {r.check: r for r in report.results}
+
+    assert results["ohlc_bounds"].failed_rows == 1
+    assert results["ohlc_bounds"].sample_dates == ["2026-01-05"]
+    assert results["non_negative_volume"].failed_rows == 1
+    assert results["duplicate_dates"].failed_rows == 1
+    assert results["price_jump"].failed_rows == 1
+    assert results["missing_trading_days"].sample_dates == ["2026-01-07"]
+    assert report.has_errors
+    # jumps and gaps only warn by default
+    assert {r.check for r in report.warnings} == {"price_jump", "missing_trading_days"}
+
+
+def test_thresholds_are_configurable():
+    table = make_table(
+        [
+            ("2026-01-05", 100.0, 110.0, 95.0, 100.0, 500),
+            ("2026-01-06", 100.0, 111.0, 99.0, 110.0, 500),
+        ]
+    )
+    engine = DataQualityEngine(
+        DataQualityThresholds(max_daily_move=0.05, price_jump_severity="error")
+    )
+    report = engine.run(symbol="AAPL", table=table)
+
+    assert [r.check for r in report.errors] == ["price_jump"]
+
+
+def test_expected_trading_days_skips_weekends_and_holidays():
+    days = expected_trading_days(
+        np.datetime64("2026-01-01"), np.datetime64("2026-01-06"), ["2026-01-01"]
+    )
+    assert [str(d) for d in days] == ["2026-01-02", "2026-01-05", "2026-01-06"]
@@ -0,0 +1,124 @@
+import boto3
+import pytest
+
+pytest.importorskip("pyiceberg")
+pytest.importorskip("pyiceberg_core")
+
+from pyiceberg.catalog.sql import SqlCatalog  # noqa: E402
+
+from scripts.data_quality import records_to_table  # noqa: E402
+from scripts.iceberg_sink import IcebergSink  # noqa: E402
+from scripts.ingest_last7days_stock_data import DailyStockData  # noqa: E402
+from scripts.spool import with_ingested_at  # noqa: E402
+
+
+def make_batch(symbol, dates):
+    records = [
+        DailyStockData(
+            symbol=symbol,
+            date=d,
+            open_price=100.0,
+            high_price=101.0,
+            low_price=99.0,
+            close_price=100.5,
+            volume=1000,
+        )
+        for d in dates
+    ]
+    return with_ingested_at(records_to_table(records))
+
+
+@pytest.fixture
+def sink(tmp_path):
+    catalog = SqlCatalog(
+        "test",
+        uri=f"sqlite:///{tmp_path}/catalog.db",
+        warehouse=f"file://{tmp_path}/warehouse",
+    )
+    return IcebergSink(catalog, "bronze.stock_prices")
+
+
+def test_run_is_one_atomic_append_partitioned_by_month(sink):
+    snapshot_id = sink.append_run(
+        "run-1",
+        [
+            make_batch("AAPL", ["2026-01-29", "2026-02-02"]),
+            make_batch("MSFT", ["2026-01-29"]),
+        ],
+    )
+
+    assert [s.snapshot_id for s in sink.table.snapshots()] == [snapshot_id]
+    files = sink.files_added_since(None)
+    assert sorted(f.split("/")[-2] for f in files) == [
+        "date_month=2026-01",
+        "date_month=2026-02",
+    ]
+    assert sink.read_since(None).num_rows == 3
+
+
+def test_replayed_run_is_not_committed_twice(sink):
+    first = sink.append_run("run-1", [make_batch("AAPL", ["2026-01-29"])])
+    again = sink.append_run("run-1", [make_batch("AAPL", ["2026-01-29"])])
+
+    assert again == first
+    assert len(sink.table.snapshots()) == 1
+
+
+def test_read_since_returns_only_the_delta(sink):
+    first = sink.append_run("run-1", [make_batch("AAPL", ["2026-01-29"])])
+    second = sink.append_run(
+        "run-2",
+        [make_batch("AAPL", ["2026-01-30"]), make_batch("MSFT", ["2026-01-30"])],
+    )
+
+    delta = sink.read_since(first)
+    assert sorted(delta["symbol"].to_pylist()) == ["AAPL", "MSFT"]
+    assert {d.isoformat() for d in delta["date"].to_pylist()} == {"2026-01-30"}
+
+    assert sink.files_added_since(second) == []
+    assert sink.read_since(second).num_rows == 0
+
+
+def test_unknown_snapshot_is_rejected(sink):
+    sink.append_run("run-1", [make_batch("AAPL", ["2026-01-29"])])
+
+    with pytest.raises(ValueError, match="not an ancestor"):
+        sink.files_added_since(12345)
+
+
+def test_s3_warehouse_round_trips_through_a_moto_server(tmp_path):
+    moto_server = pytest.importorskip("moto.server")
+    server = moto_server.ThreadedMotoServer(port=0)
+    server.start()
+    try:
+        host, port = server.get_host_and_port()
+        endpoint = f"http://{host}:{port}"
+        boto3.client(
+            "s3",
+            endpoint_url=endpoint,
+            aws_access_key_id="testing",
+            aws_secret_access_key="testing",
+            region_name="us-east-1",
+        ).create_bucket(Bucket="warehouse")
+
+        catalog = SqlCatalog(
+            "test",
+            uri=f"sqlite:///{tmp_path}/catalog.db",
+            warehouse="s3://warehouse/iceberg",
+            **{
+                "s3.endpoint": endpoint,
+                "s3.access-key-id": "testing",
+                "s3.secret-access-key": "testing",
+                "s3.region": "us-east-1",
+            },
+        )
+        sink = IcebergSink(catalog, "bronze.stock_prices")
+        first = sink.append_run("run-1", [make_batch("AAPL", ["2026-01-29"])])
+        sink.append_run("run-2", [make_batch("MSFT", ["2026-01-30"])])
+
+        assert all(
+            f.startswith("s3://warehouse/") for f in sink.files_added_since(None)
+        )
+        assert sink.read_since(first)["symbol"].to_pylist() == ["MSFT"]
+    finally:
+        server.stop()
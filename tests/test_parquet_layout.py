@@ -0,0 +1,68 @@
+import io
+
+import pyarrow.parquet as pq
+import pytest
+
+from scripts.benchmark_parquet_layout import make_dataset, run_benchmark
+from scripts.parquet_layout import ParquetLayout, encode_parquet, supports_bloom_filters
+
+
+@pytest.fixture(scope="module")
+def dataset():
+    return make_dataset(num_symbols=10, start="2022-01-01", end="2025-12-31")
+
+
+def test_files_are_sorted_with_statistics_and_page_index(dataset):
+    files = encode_parquet(dataset, ParquetLayout(row_group_size=256))
+
+    assert len(files) == 1
+    parquet_file = pq.ParquetFile(io.BytesIO(files[0]))
+    metadata = parquet_file.metadata
+    assert metadata.num_row_groups == -(-dataset.num_rows // 256)
+
+    row_group = metadata.row_group(0)
+    assert [c.column_index for c in row_group.sorting_columns] == [0, 1]
+    symbol_stats = row_group.column(0).statistics
+    assert symbol_stats.has_min_max
+    assert symbol_stats.min == symbol_stats.max == "T000"
+    assert row_group.column(1).has_offset_index
+    assert row_group.column(1).has_column_index
+
+    table = parquet_file.read()
+    assert table.num_rows == dataset.num_rows
+    assert table["symbol"].to_pylist() == sorted(table["symbol"].to_pylist())
+
+
+def test_files_are_split_at_the_target_size(dataset):
+    files = encode_parquet(
+        dataset, ParquetLayout(row_group_size=256, target_file_bytes=100_000)
+    )
+
+    assert len(files) > 1
+    assert all(len(f) < 100_000 + 50_000 for f in files[:-1])
+    rows = sum(pq.ParquetFile(io.BytesIO(f)).metadata.num_rows for f in files)
+    assert rows == dataset.num_rows
+
+
+@pytest.mark.skipif(
+    not supports_bloom_filters(), reason="pyarrow without bloom filters"
+)
+def test_bloom_filters_are_optional(dataset):
+    plain = encode_parquet(dataset)[0]
+    with_bloom = encode_parquet(
+        dataset, ParquetLayout(bloom_filter_columns=["symbol"])
+    )[0]
+
+    assert len(with_bloom) > len(plain)
+
+
+def test_selective_queries_read_fewer_bytes(dataset):
+    results = run_benchmark(dataset, ParquetLayout(row_group_size=128))
+    baseline, optimized = results["baseline"], results["optimized"]
+
+    queries = [m for m in baseline if m != "file_bytes" and not m.endswith(" rows")]
+    assert len(queries) == 2
+    for query in queries:
+        # same answer, fewer bytes fetched
+        assert optimized[f"{query} rows"] == baseline[f"{query} rows"] > 0
+        assert optimized[query] < baseline[query] / 2
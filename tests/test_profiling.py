@@ -0,0 +1,80 @@
+import json
+import re
+import threading
+import time
+
+import pytest
+
+from scripts.profiling import RunProfiler
+
+
+def busy(seconds):
+    deadline = time.perf_counter() + seconds
+    total = 0
+    while time.perf_counter() < deadline:
+        total += sum(range(100))
+    return total
+
+
+def test_profiler_writes_folded_stacks_per_stage(tmp_path):
+    profiler = RunProfiler("run-1", profile_dir=tmp_path, interval=0.002)
+    with profiler:
+        with profiler.stage("validate"):
+            busy(0.1)
+        with profiler.stage("upload"):
+            payload = [bytearray(1024) for _ in range(2000)]
+            busy(0.05)
+
+    run_dir = tmp_path / "run-1"
+    folded = (run_dir / "validate.folded").read_text().splitlines()
+    assert folded
+    # flamegraph.pl / speedscope format: frame;frame;frame <count>
+    assert all(re.fullmatch(r"\S.*;.* \d+", line) for line in folded)
+    assert any("busy (test_profiling.py" in line for line in folded)
+
+    all_folded = (run_dir / "all.folded").read_text()
+    assert any(line.startswith("upload;") for line in all_folded.splitlines())
+
+    stages = json.loads((run_dir / "stages.json").read_text())["stages"]
+    assert stages["validate"]["calls"] == 1
+    assert stages["validate"]["samples"] > 0
+    assert stages["upload"]["allocated_bytes"] >= 2000 * 1024
+
+    # the payload is still alive, its line is the top allocation site
+    allocations = (run_dir / "allocations.txt").read_text().splitlines()
+    assert "test_profiling.py" in allocations[0]
+    assert len(payload) == 2000
+
+
+def test_profiler_without_allocation_tracking(tmp_path):
+    with RunProfiler("run-2", profile_dir=tmp_path, trace_allocations=False) as p:
+        with p.stage("fetch"):
+            busy(0.05)
+
+    assert (tmp_path / "run-2" / "fetch.folded").exists()
+    assert not (tmp_path / "run-2" / "allocations.txt").exists()
+
+
+@pytest.mark.parametrize("wall_clock", [False, True])
+def test_idle_threads_are_only_sampled_on_the_wall_clock(tmp_path, wall_clock):
+    release = threading.Event()
+    idle = threading.Thread(target=release.wait, name="idle-pool")
+    idle.start()
+    profiler = RunProfiler(
+        "run-3",
+        profile_dir=tmp_path,
+        interval=0.002,
+        trace_allocations=False,
+        wall_clock=wall_clock,
+    )
+    with profiler:
+        with profiler.stage("validate"):
+            busy(0.1)
+    release.set()
+    idle.join()
+
+    folded = (tmp_path / "run-3" / "validate.folded").read_text()
+    assert "busy (test_profiling.py" in folded
+    assert ("idle-pool;" in folded) == wall_clock
+    stages = json.loads((tmp_path / "run-3" / "stages.json").read_text())
+    assert stages["sampling"] == ("wall_clock" if wall_clock else "cpu")
@@ -0,0 +1,214 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from scripts.ingest_last7days_stock_data import DailyStockData
+from scripts.providers import (
+    AlphaVantageProvider,
+    CircuitBreaker,
+    CircuitOpenError,
+    HedgedFetcher,
+    LocalDropProvider,
+    ProviderError,
+    ProviderThrottledError,
+    StockDataProvider,
+)
+
+BAR = {
+    "1. open": "100",
+    "2. high": "110",
+    "3. low": "90",
+    "4. close": "105",
+    "5. volume": "500",
+}
+
+
+class StandInServer:
+    """Local Alpha Vantage stand-in with a configurable delay and payload."""
+
+    def __init__(self, payload, delay=0.0):
+        self.payload = payload
+        self.delay = delay
+        self.calls = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.calls += 1
+                time.sleep(server.delay)
+                body = json.dumps(server.payload).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}/query"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+
+
+@pytest.fixture
+def servers():
+    started = []
+
+    def start(payload, delay=0.0):
+        server = StandInServer(payload, delay)
+        started.append(server)
+        return server
+
+    yield start
+    for server in started:
+        server.close()
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_000.0
+
+    def __call__(self):
+        return self.now
+
+
+def provider(server, name):
+    return AlphaVantageProvider(api_key="test", base_url=server.url, name=name)
+
+
+def test_hedge_fires_backup_after_deadline(servers):
+    slow = servers({"Time Series (Daily)": {"2026-01-09": BAR}}, delay=1.0)
+    fast = servers({"Time Series (Daily)": {"2026-01-10": BAR}})
+    fetcher = HedgedFetcher(
+        [provider(slow, "primary"), provider(fast, "backup")], hedge_after=0.1
+    )
+
+    start = time.perf_counter()
+    payload = fetcher.fetch_daily("AAPL")
+
+    assert time.perf_counter() - start < 0.8
+    assert list(payload["Time Series (Daily)"]) == ["2026-01-10"]
+    assert slow.calls == 1 and fast.calls == 1
+
+
+def test_throttled_primary_fails_over_and_opens_circuit(servers):
+    throttled = servers({"Note": "Thank you for using Alpha Vantage!"})
+    backup = servers({"Time Series (Daily)": {"2026-01-10": BAR}})
+    fetcher = HedgedFetcher(
+        [provider(throttled, "primary"), provider(backup, "backup")],
+        failure_threshold=2,
+    )
+
+    for _ in range(3):
+        payload = fetcher.fetch_daily("AAPL")
+        assert "2026-01-10" in payload["Time Series (Daily)"]
+
+    # the third call skipped the primary because its circuit was open
+    assert throttled.calls == 2
+    assert fetcher.breakers["primary"].state == "open"
+
+
+def test_all_providers_failing(servers):
+    throttled = servers({"Information": "rate limit"})
+    with pytest.raises(ProviderThrottledError):
+        provider(throttled, "primary").fetch_daily("AAPL")
+
+    fetcher = HedgedFetcher([provider(throttled, "primary")], failure_threshold=1)
+    with pytest.raises(ProviderError):
+        fetcher.fetch_daily("AAPL")
+    with pytest.raises(CircuitOpenError):
+        fetcher.fetch_daily("AAPL")
+
+
+def test_unexpected_provider_errors_fail_over_and_count(servers, tmp_path):
+    # a drop file without a date column used to escape as a bare KeyError
+    pq.write_table(pa.table({"close": [105.0]}), tmp_path / "AAPL.parquet")
+    (tmp_path / "MSFT.csv").write_text("date,open\n2026-01-09,100,oops,extra\n")
+    backup = servers({"Time Series (Daily)": {"2026-01-10": BAR}})
+    fetcher = HedgedFetcher(
+        [LocalDropProvider(tmp_path, name="drop"), provider(backup, "av")],
+        failure_threshold=2,
+    )
+
+    for symbol in ("AAPL", "MSFT"):
+        assert "2026-01-10" in fetcher.fetch_daily(symbol)["Time Series (Daily)"]
+    assert fetcher.breakers["drop"].state == "open"
+
+    class BrokenProvider(StockDataProvider):
+        name = "broken"
+
+        def fetch_daily(self, symbol, outputsize="compact"):
+            raise KeyError("date")
+
+    fetcher = HedgedFetcher([BrokenProvider(), provider(backup, "av")])
+    assert "2026-01-10" in fetcher.fetch_daily("AAPL")["Time Series (Daily)"]
+    assert fetcher.breakers["broken"].failures == 1
+
+
+def test_provider_without_fetch_daily_cannot_be_built():
+    class IncompleteProvider(StockDataProvider):
+        name = "incomplete"
+
+    with pytest.raises(TypeError, match="fetch_daily"):
+        IncompleteProvider()
+
+
+def test_half_open_breaker_lets_a_single_trial_through():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=10, clock=clock)
+    breaker.record_failure()
+    assert not breaker.allow()
+
+    clock.now += 10
+    assert breaker.allow()
+    assert not breaker.allow() and not breaker.available()
+
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.allow() and breaker.allow()
+
+
+def test_local_drop_normalizes_to_daily_stock_data(tmp_path):
+    pq.write_table(
+        pa.table(
+            {
+                "date": ["2026-01-09", "2026-01-12"],
+                "open": [100.0, 101.0],
+                "high": [110.0, 111.0],
+                "low": [90.0, 91.0],
+                "close": [105.0, 106.0],
+                "volume": [500, 600],
+            }
+        ),
+        tmp_path / "MSFT.parquet",
+    )
+    payload = LocalDropProvider(tmp_path).fetch_daily("MSFT")
+    records = [
+        DailyStockData(symbol="MSFT", date=d, **metrics)
+        for d, metrics in payload["Time Series (Daily)"].items()
+    ]
+
+    assert {r.date.isoformat() for r in records} == {"2026-01-09", "2026-01-12"}
+    assert records[0].close_price in (105.0, 106.0)
+    with pytest.raises(ProviderError):
+        LocalDropProvider(tmp_path).fetch_daily("AAPL")
+
+
+def test_adjusted_data_skips_providers_without_it(servers, tmp_path):
+    adjusted = servers({"Time Series (Daily)": {"2026-01-10": BAR}})
+    fetcher = HedgedFetcher([LocalDropProvider(tmp_path), provider(adjusted, "av")])
+
+    payload = fetcher.fetch_daily_adjusted("AAPL")
+
+    assert list(payload["Time Series (Daily)"]) == ["2026-01-10"]
+    with pytest.raises(ProviderError, match="does not serve adjusted data"):
+        LocalDropProvider(tmp_path).fetch_daily_adjusted("AAPL")
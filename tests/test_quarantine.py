@@ -0,0 +1,168 @@
+import io
+import json
+from datetime import date
+
+import pyarrow.parquet as pq
+import pytest
+from moto import mock_aws
+from pydantic import ValidationError
+
+from scripts.data_quality import (
+    DataQualityEngine,
+    DataQualityThresholds,
+    RunQualityReport,
+    records_to_table,
+)
+from scripts.ingest_historical_stock_data import (
+    StockExtractor as HistoricalStockExtractor,
+)
+from scripts.ingest_last7days_stock_data import StockExtractor
+from scripts.quarantine import RowQuarantine
+
+
+def bar(price):
+    return {
+        "1. open": str(price),
+        "2. high": str(price + 1),
+        "3. low": str(max(price - 1, 0)),
+        "4. close": str(price),
+        "5. volume": "1000",
+    }
+
+
+RAW_DATA = {
+    "Time Series (Daily)": {
+        "2026-01-05": bar(100),
+        "2026-01-06": bar(101),
+        # API glitch: zero price
+        "2026-01-07": bar(0),
+        "2026-01-08": bar(102),
+        "2026-01-09": bar(103),
+    }
+}
+
+
+@pytest.fixture
+def extractor():
+    with mock_aws():
+        extractor = StockExtractor(
+            api_key="test_key",
+            aws_access_key="testing",
+            aws_secret_key="testing",
+            region="us-east-1",
+        )
+        extractor.s3_client.create_bucket(Bucket="test-bucket")
+        yield extractor
+
+
+def test_bad_row_is_quarantined_and_good_rows_go_on(extractor):
+    quarantine = RowQuarantine("AAPL")
+    records = extractor.validate_and_process_7_days(
+        symbol="AAPL", raw_data=RAW_DATA, quarantine=quarantine
+    )
+
+    assert [r.date.isoformat() for r in records] == [
+        "2026-01-09",
+        "2026-01-08",
+        "2026-01-06",
+        "2026-01-05",
+    ]
+    assert quarantine.dates == ["2026-01-07"]
+    row = quarantine.rows[0]
+    assert json.loads(row.raw_payload) == bar(0)
+    assert "Stock prices must be greater than zero" in row.error
+
+
+def test_without_quarantine_the_first_bad_row_raises(extractor):
+    with pytest.raises(ValidationError):
+        extractor.validate_and_process_7_days(symbol="AAPL", raw_data=RAW_DATA)
+
+
+@mock_aws
+def test_malformed_date_key_is_quarantined_in_the_history():
+    extractor = HistoricalStockExtractor(
+        api_key="test_key",
+        aws_access_key="testing",
+        aws_secret_key="testing",
+        region="us-east-1",
+    )
+    raw_data = {"Time Series (Daily)": {"2026-01-05": bar(100), "2026-13-45": bar(101)}}
+
+    quarantine = RowQuarantine("AAPL")
+    records = extractor.validate_year_to_date_history(
+        "AAPL", "2026-01-01", "2026-01-31", raw_data, quarantine=quarantine
+    )
+
+    assert [r.date.isoformat() for r in records] == ["2026-01-05"]
+    assert quarantine.dates == ["2026-13-45"]
+    with pytest.raises(ValueError):
+        extractor.validate_year_to_date_history(
+            "AAPL", "2026-01-01", "2026-01-31", raw_data
+        )
+
+
+def test_quarantine_rate_decides_whether_the_ticker_fails(extractor):
+    quarantine = RowQuarantine("AAPL")
+    records = extractor.validate_and_process_7_days(
+        symbol="AAPL", raw_data=RAW_DATA, quarantine=quarantine
+    )
+    table = records_to_table(records)
+
+    # 1 of 5 rows (20%) is within the default threshold
+    report = DataQualityEngine().run("AAPL", table, quarantined_dates=quarantine.dates)
+    assert not report.has_errors
+    # the quarantined day is also missing from the load
+    assert {r.check for r in report.warnings} == {
+        "quarantined_rows",
+        "missing_trading_days",
+    }
+
+    strict = DataQualityEngine(DataQualityThresholds(max_quarantine_rate=0.1))
+    report = strict.run("AAPL", table, quarantined_dates=quarantine.dates)
+    assert [r.check for r in report.errors] == ["quarantined_rows"]
+
+    run_report = RunQualityReport()
+    run_report.add(report)
+    assert "quarantined_rows=1" in run_report.summary()
+
+
+def test_every_row_quarantined_fails_the_ticker():
+    quarantine = RowQuarantine("AAPL")
+    quarantine.add("2026-01-07", bar(0), ValueError("zero price"))
+
+    report = DataQualityEngine().run(
+        "AAPL", records_to_table([]), quarantined_dates=quarantine.dates
+    )
+    assert report.has_errors
+
+
+def test_quarantine_is_written_to_s3_with_payload_and_reason(extractor):
+    quarantine = RowQuarantine("AAPL")
+    extractor.validate_and_process_7_days(
+        symbol="AAPL", raw_data=RAW_DATA, quarantine=quarantine
+    )
+
+    key = quarantine.upload_to_s3(
+        extractor.s3_client,
+        "test-bucket",
+        run_id="20260109T220000",
+        run_date=date(2026, 1, 9),
+    )
+
+    assert key == "quarantine/stocks/AAPL/2026/1/2026-01-09_20260109T220000.parquet"
+    body = extractor.s3_client.get_object(Bucket="test-bucket", Key=key)["Body"]
+    table = pq.read_table(io.BytesIO(body.read()))
+    assert table.column_names == [
+        "symbol",
+        "date",
+        "raw_payload",
+        "error",
+        "quarantined_at",
+    ]
+    assert table["date"].to_pylist() == ["2026-01-07"]
+
+    # nothing quarantined, nothing written
+    assert (
+        RowQuarantine("MSFT").upload_to_s3(extractor.s3_client, "test-bucket", "r")
+        is None
+    )
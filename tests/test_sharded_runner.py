@@ -0,0 +1,157 @@
+import threading
+from collections import Counter
+
+import boto3
+import pytest
+from moto import mock_aws
+
+from scripts.sharded_runner import (
+    LeaseLostError,
+    ShardedRunner,
+    ShardLeaseManager,
+    load_ticker_universe,
+    make_shards,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def s3_client():
+    with mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket="test-bucket")
+        yield client
+
+
+def make_manager(s3_client, worker_id, clock=None):
+    return ShardLeaseManager(
+        s3_client,
+        "test-bucket",
+        run_id="2026-01-16",
+        worker_id=worker_id,
+        lease_seconds=60,
+        **({"clock": clock} if clock else {}),
+    )
+
+
+def test_universe_and_shards():
+    tickers = load_ticker_universe()
+    assert "AAPL" in tickers and "N/A" not in tickers
+    shards = make_shards(tickers, 4)
+    assert len(shards) == 4
+    assert sorted(t for shard in shards for t in shard) == tickers
+
+
+def test_workers_process_every_symbol_exactly_once(s3_client):
+    tickers = load_ticker_universe()
+    shards = make_shards(tickers, 8)
+    counts = Counter()
+    lock = threading.Lock()
+
+    def process(ticker):
+        with lock:
+            counts[ticker] += 1
+
+    workers = [
+        ShardedRunner(
+            make_manager(s3_client, f"worker-{i}"), shards, process, poll_seconds=0.05
+        )
+        for i in range(3)
+    ]
+    threads = [threading.Thread(target=w.run) for w in workers]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert sorted(counts) == tickers
+    assert set(counts.values()) == {1}
+
+
+def test_expired_lease_is_taken_over_and_resumed(s3_client):
+    clock = FakeClock()
+    shards = [["AAPL", "MSFT", "TSLA"]]
+    dead = make_manager(s3_client, "dead-worker", clock)
+    alive = make_manager(s3_client, "alive-worker", clock)
+    dead.publish_plan(shards)
+
+    # the dead worker processed AAPL, then stopped renewing
+    lease = dead.try_acquire(0)
+    lease.completed.append("AAPL")
+    dead.renew(lease)
+    assert alive.try_acquire(0) is None
+
+    clock.now += 61
+    processed = ShardedRunner(alive, shards, lambda t: None).run()
+    assert processed == ["MSFT", "TSLA"]
+    assert alive.is_done(0)
+
+    # the old owner can no longer write to the shard
+    with pytest.raises(LeaseLostError):
+        dead.renew(lease)
+
+
+def test_plan_is_shared_between_workers(s3_client):
+    first = make_manager(s3_client, "a").publish_plan([["AAPL"], ["MSFT"]])
+    second = make_manager(s3_client, "b").publish_plan([["TSLA"]])
+    assert first == second == [["AAPL"], ["MSFT"]]
+
+
+def test_failing_ticker_is_recorded_and_the_shard_completes(s3_client):
+    shards = [["AAPL", "BAD", "MSFT"]]
+    processed = []
+
+    def process(ticker):
+        if ticker == "BAD":
+            raise ValueError("no data")
+        processed.append(ticker)
+
+    manager = make_manager(s3_client, "worker")
+    runner = ShardedRunner(manager, shards, process)
+    assert runner.run() == ["AAPL", "MSFT"]
+    assert runner.failed == {"BAD": "no data"}
+    assert manager.is_done(0)
+
+    done, _ = manager._get(manager._done_key(0))
+    assert done["completed"] == ["AAPL", "MSFT"]
+    assert done["failed"] == {"BAD": "no data"}
+
+
+def test_takeover_skips_tickers_the_dead_worker_failed_on(s3_client):
+    clock = FakeClock()
+    shards = [["AAPL", "BAD", "MSFT"]]
+    dead = make_manager(s3_client, "dead-worker", clock)
+    alive = make_manager(s3_client, "alive-worker", clock)
+    dead.publish_plan(shards)
+
+    lease = dead.try_acquire(0)
+    lease.completed.append("AAPL")
+    lease.failed["BAD"] = "no data"
+    dead.renew(lease)
+
+    clock.now += 61
+    assert ShardedRunner(alive, shards, lambda t: None).run() == ["MSFT"]
+
+
+def test_claim_is_released_when_the_shard_finished_during_the_claim(s3_client):
+    owner = make_manager(s3_client, "owner")
+    owner.publish_plan([["AAPL"]])
+    owner.complete(owner.try_acquire(0))
+
+    # the late worker read the done marker just before the owner wrote it
+    late = make_manager(s3_client, "late")
+    stale_checks = [False]
+    real_is_done = late.is_done
+    late.is_done = lambda shard_id: (
+        stale_checks.pop() if stale_checks else real_is_done(shard_id)
+    )
+
+    assert late.try_acquire(0) is None
+    assert late._get(late._lease_key(0)) is None
@@ -0,0 +1,117 @@
+from datetime import datetime, timedelta
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+from moto import mock_aws
+
+from scripts.data_quality import records_to_table
+from scripts.ingest_last7days_stock_data import DailyStockData, StockExtractor
+from scripts.spool import (
+    ArrowSpool,
+    new_run_id,
+    prune_completed_spools,
+    with_ingested_at,
+)
+
+
+def make_batch(symbol, closes):
+    records = [
+        DailyStockData(
+            symbol=symbol,
+            date=f"2026-01-{day + 5:02d}",
+            open_price=close,
+            high_price=close + 1,
+            low_price=close - 1,
+            close_price=close,
+            volume=100,
+        )
+        for day, close in enumerate(closes)
+    ]
+    return with_ingested_at(records_to_table(records))
+
+
+@pytest.fixture
+def spool(tmp_path):
+    spool = ArrowSpool(run_id="20260116T220000", spool_dir=tmp_path)
+    spool.append(make_batch("AAPL", [100.0, 101.0]))
+    spool.append(make_batch("MSFT", [200.0, 201.0, 202.0]))
+    spool.close()
+    return spool
+
+
+def test_spool_reads_back_zero_copy(spool):
+    allocated = pa.total_allocated_bytes()
+    table = spool.read()
+
+    # buffers point into the memory map, nothing is allocated by the reader
+    assert pa.total_allocated_bytes() == allocated
+    assert table.num_rows == 5
+    assert [symbol for symbol, _ in spool.batches()] == ["AAPL", "MSFT"]
+
+
+def test_pending_batches_skip_uploaded_symbols(spool, tmp_path):
+    spool.mark_uploaded("AAPL")
+
+    reopened = ArrowSpool.open_existing("20260116T220000", spool_dir=tmp_path)
+    assert [symbol for symbol, _ in reopened.pending_batches()] == ["MSFT"]
+
+    with pytest.raises(FileNotFoundError):
+        ArrowSpool.open_existing("missing-run", spool_dir=tmp_path)
+
+
+def test_truncated_spool_keeps_complete_batches(spool):
+    size = spool.path.stat().st_size
+    with open(spool.path, "r+b") as f:
+        f.truncate(size - 40)
+
+    assert [symbol for symbol, _ in spool.batches()] == ["AAPL"]
+
+
+@mock_aws
+def test_replay_uploads_from_spool(spool):
+    extractor = StockExtractor(
+        api_key="test_key",
+        aws_access_key="testing",
+        aws_secret_key="testing",
+        region="us-east-1",
+    )
+    extractor.s3_client.create_bucket(Bucket="test-bucket")
+
+    for symbol, table in spool.pending_batches():
+        extractor.upload_table_to_s3(
+            table, s3_bucket="test-bucket", run_date=spool.run_date
+        )
+        spool.mark_uploaded(symbol)
+
+    assert list(spool.pending_batches()) == []
+    key = f"raw/stocks/MSFT/{spool.run_date.year}/{spool.run_date.month}/{spool.run_date}_7day_window.parquet"
+    body = extractor.s3_client.get_object(Bucket="test-bucket", Key=key)["Body"].read()
+    uploaded = pq.read_table(pa.BufferReader(body))
+    assert uploaded.num_rows == 3
+    assert "ingested_at" in uploaded.column_names
+
+
+def test_runs_started_in_the_same_second_get_their_own_spool():
+    assert len({new_run_id() for _ in range(100)}) == 100
+
+
+def test_only_completed_spools_past_retention_are_pruned(tmp_path):
+    for run_id in ("completed", "crashed"):
+        spool = ArrowSpool(run_id=run_id, spool_dir=tmp_path)
+        spool.append(make_batch("AAPL", [100.0]))
+        spool.close()
+    ArrowSpool.open_existing("completed", spool_dir=tmp_path).mark_complete()
+
+    in_3_days = datetime.now() + timedelta(days=3)
+    assert prune_completed_spools(tmp_path, retention_days=7, now=in_3_days) == []
+
+    in_8_days = datetime.now() + timedelta(days=8)
+    assert prune_completed_spools(tmp_path, retention_days=7, now=in_8_days) == [
+        "completed"
+    ]
+    # the run that never completed stays around for --replay-run
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        "crashed.arrows",
+        "crashed.manifest.json",
+    ]
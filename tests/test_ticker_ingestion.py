@@ -0,0 +1,128 @@
+from datetime import date
+
+import pytest
+from moto import mock_aws
+
+from scripts.data_quality import DataQualityEngine
+from scripts.ingest_last7days_stock_data import StockExtractor
+from scripts.ingestion_state import IngestionWatermarks
+from scripts.spool import ArrowSpool
+
+WINDOW = [date(2026, 1, d) for d in (5, 6, 7, 8, 9)]
+
+
+def bar(price):
+    return {
+        "1. open": str(price),
+        "2. high": str(price + 1),
+        "3. low": str(price - 1),
+        "4. close": str(price),
+        "5. volume": "1000",
+    }
+
+
+def payload(prices):
+    return {
+        "Time Series (Daily)": {
+            d.isoformat(): bar(price) for d, price in zip(WINDOW, prices)
+        }
+    }
+
+
+@pytest.fixture
+def extractor():
+    with mock_aws():
+        extractor = StockExtractor(
+            api_key="test_key",
+            aws_access_key="testing",
+            aws_secret_key="testing",
+            region="us-east-1",
+        )
+        extractor.s3_client.create_bucket(Bucket="test-bucket")
+        yield extractor
+
+
+def stub_fetch(extractor, monkeypatch, raw_data):
+    calls = []
+
+    def fetch(symbol):
+        calls.append(symbol)
+        return raw_data
+
+    monkeypatch.setattr(extractor, "fetch_past_7_days_daily_data", fetch)
+    return calls
+
+
+def keys(extractor, prefix):
+    listing = extractor.s3_client.list_objects_v2(Bucket="test-bucket", Prefix=prefix)
+    return [obj["Key"] for obj in listing.get("Contents", [])]
+
+
+def ingest(extractor, watermarks, **kwargs):
+    return extractor.ingest_ticker(
+        "AAPL",
+        "test-bucket",
+        run_id="20260109T220000",
+        expected_dates=WINDOW,
+        quality_engine=DataQualityEngine(),
+        watermarks=watermarks,
+        **kwargs,
+    )
+
+
+def test_upload_advances_the_watermark(extractor, monkeypatch):
+    stub_fetch(extractor, monkeypatch, payload([100, 101, 102, 103, 104]))
+    watermarks = IngestionWatermarks(extractor.s3_client, "test-bucket")
+
+    report = ingest(extractor, watermarks)
+
+    assert not report.has_errors
+    assert keys(extractor, "raw/stocks/AAPL/") != []
+    assert watermarks.get("AAPL") == date(2026, 1, 9)
+
+
+def test_up_to_date_ticker_is_not_fetched(extractor, monkeypatch):
+    calls = stub_fetch(extractor, monkeypatch, payload([100] * 5))
+    watermarks = IngestionWatermarks(extractor.s3_client, "test-bucket")
+    watermarks.set("AAPL", date(2026, 1, 9))
+
+    assert ingest(extractor, watermarks) is None
+    assert calls == []
+
+
+def test_empty_window_uploads_nothing(extractor, monkeypatch):
+    # the API has no bars for the expected sessions yet
+    stub_fetch(extractor, monkeypatch, {"Time Series (Daily)": {}})
+    watermarks = IngestionWatermarks(extractor.s3_client, "test-bucket")
+
+    assert ingest(extractor, watermarks) is None
+    assert keys(extractor, "raw/") == []
+    assert watermarks.get("AAPL") is None
+
+
+def test_failed_checks_keep_the_batch_out_of_s3(extractor, monkeypatch):
+    # two of five rows quarantined is above the default quarantine rate
+    stub_fetch(extractor, monkeypatch, payload([100, 0, 0, 103, 104]))
+    watermarks = IngestionWatermarks(extractor.s3_client, "test-bucket")
+
+    report = ingest(extractor, watermarks)
+
+    assert report.has_errors
+    assert keys(extractor, "raw/") == []
+    assert len(keys(extractor, "quarantine/stocks/AAPL/")) == 1
+    assert watermarks.get("AAPL") is None
+
+
+def test_spooled_batch_leaves_upload_and_watermark_to_the_caller(
+    extractor, monkeypatch, tmp_path
+):
+    stub_fetch(extractor, monkeypatch, payload([100, 101, 102, 103, 104]))
+    watermarks = IngestionWatermarks(extractor.s3_client, "test-bucket")
+    spool = ArrowSpool("20260109T220000", spool_dir=tmp_path)
+
+    ingest(extractor, watermarks, spool=spool)
+    spool.close()
+
+    assert spool.read().num_rows == 5
+    assert keys(extractor, "raw/") == []
+    assert watermarks.get("AAPL") is None
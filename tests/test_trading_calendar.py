@@ -0,0 +1,106 @@
+from datetime import date, datetime
+
+import pytest
+from moto import mock_aws
+import boto3
+
+from scripts.ingestion_state import IngestionWatermarks
+from scripts import trading_calendar
+from scripts.trading_calendar import EXCHANGE_TZ, TradingCalendar, nyse_holidays
+
+
+@pytest.fixture
+def calendar(tmp_path):
+    return TradingCalendar(start_year=2024, end_year=2026, cache_dir=tmp_path)
+
+
+def test_nyse_holidays_2026():
+    holidays = nyse_holidays(2026)
+    assert date(2026, 1, 1) in holidays
+    assert date(2026, 1, 19) in holidays  # MLK Day
+    assert date(2026, 4, 3) in holidays  # Good Friday
+    assert date(2026, 6, 19) in holidays  # Juneteenth
+    # July 4th 2026 is a Saturday, observed on Friday the 3rd
+    assert holidays[date(2026, 7, 3)] == "Independence Day"
+    assert date(2026, 11, 26) in holidays  # Thanksgiving
+    assert date(2026, 12, 25) in holidays
+
+
+def test_calendar_is_cached_locally(tmp_path, calendar):
+    assert calendar.cache_path.exists()
+    cached = TradingCalendar(start_year=2024, end_year=2026, cache_dir=tmp_path)
+    assert (cached.sessions == calendar.sessions).all()
+    assert cached.early_closes == calendar.early_closes
+
+
+def test_special_closures_since_2000(tmp_path):
+    calendar = TradingCalendar(start_year=2000, end_year=2008, cache_dir=tmp_path)
+    for closed in (
+        date(2001, 9, 11),
+        date(2001, 9, 14),
+        date(2004, 6, 11),
+        date(2007, 1, 2),
+    ):
+        assert not calendar.is_trading_day(closed)
+    assert calendar.is_trading_day(date(2001, 9, 17))
+
+
+def test_cache_is_rebuilt_when_the_rules_change(tmp_path, calendar, monkeypatch):
+    monkeypatch.setitem(
+        trading_calendar.SPECIAL_CLOSURES, date(2026, 3, 2), "Test closure"
+    )
+    rebuilt = TradingCalendar(start_year=2024, end_year=2026, cache_dir=tmp_path)
+
+    assert rebuilt.cache_path != calendar.cache_path
+    assert not rebuilt.is_trading_day(date(2026, 3, 2))
+    assert calendar.is_trading_day(date(2026, 3, 2))
+
+
+def test_sessions_skip_weekends_and_holidays(calendar):
+    assert not calendar.is_trading_day(date(2026, 1, 3))  # Saturday
+    assert not calendar.is_trading_day(date(2026, 1, 19))  # MLK Day
+    assert calendar.is_trading_day(date(2026, 1, 20))
+
+    sessions = calendar.sessions_in_range(date(2026, 1, 15), date(2026, 1, 21))
+    assert [str(d) for d in sessions] == [
+        "2026-01-15",
+        "2026-01-16",
+        "2026-01-20",
+        "2026-01-21",
+    ]
+    assert [str(d) for d in calendar.last_n_sessions(2, date(2026, 1, 19))] == [
+        "2026-01-15",
+        "2026-01-16",
+    ]
+
+
+def test_expected_latest_session_respects_close_and_early_close(calendar):
+    # Saturday and Monday holiday both expect Friday's bar
+    saturday = datetime(2026, 1, 17, 12, 0, tzinfo=EXCHANGE_TZ)
+    mlk_day = datetime(2026, 1, 19, 18, 0, tzinfo=EXCHANGE_TZ)
+    assert calendar.expected_latest_session(saturday) == date(2026, 1, 16)
+    assert calendar.expected_latest_session(mlk_day) == date(2026, 1, 16)
+
+    # before the close the previous session is the latest one
+    tuesday_morning = datetime(2026, 1, 20, 10, 0, tzinfo=EXCHANGE_TZ)
+    assert calendar.expected_latest_session(tuesday_morning) == date(2026, 1, 16)
+
+    # Black Friday closes at 1 p.m.
+    assert calendar.early_closes[date(2026, 11, 27)].hour == 13
+    black_friday = datetime(2026, 11, 27, 14, 0, tzinfo=EXCHANGE_TZ)
+    assert calendar.expected_latest_session(black_friday) == date(2026, 11, 27)
+
+
+@mock_aws
+def test_watermarks_skip_up_to_date_symbols():
+    s3_client = boto3.client("s3", region_name="us-east-1")
+    s3_client.create_bucket(Bucket="test-bucket")
+    watermarks = IngestionWatermarks(s3_client, "test-bucket")
+
+    assert watermarks.get("AAPL") is None
+    assert not watermarks.is_up_to_date("AAPL", date(2026, 1, 16))
+
+    watermarks.set("AAPL", date(2026, 1, 16))
+    assert watermarks.get("AAPL") == date(2026, 1, 16)
+    assert watermarks.is_up_to_date("AAPL", date(2026, 1, 16))
+    assert not watermarks.is_up_to_date("AAPL", date(2026, 1, 20))